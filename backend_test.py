@@ -4,39 +4,119 @@ Firebase Functions Smoke Test Suite
 Comprehensive testing for Firebase Functions endpoints and Firestore security rules
 """
 
+import argparse
 import os
-import json
 import re
 import sys
-import subprocess
 from pathlib import Path
 
-class FirebaseProjectTester:
-    def __init__(self, project_path="/app"):
-        self.project_path = Path(project_path)
-        self.functions_path = self.project_path / "functions"
-        self.src_path = self.functions_path / "src"
-        self.tests_run = 0
-        self.tests_passed = 0
-        self.issues = []
-        self.warnings = []
-
-    def log_test(self, name, passed, message=""):
-        """Log test result"""
-        self.tests_run += 1
-        if passed:
-            self.tests_passed += 1
-            print(f"✅ {name}: PASSED")
-        else:
-            print(f"❌ {name}: FAILED - {message}")
-            self.issues.append(f"{name}: {message}")
-        if message and passed:
-            print(f"   ℹ️  {message}")
-
-    def log_warning(self, message):
-        """Log warning"""
-        print(f"⚠️  WARNING: {message}")
-        self.warnings.append(message)
+from deploy_checks import ProjectSnapshot, ResultCache, RulesSyntaxError
+from deploy_checks.bundle import ClientGraph, format_bundle_table
+from deploy_checks.coldstart import RequireGraph, export_weights, parse_probe, probe_command
+from deploy_checks.config import CONFIG_FILE, ConfigError, load_config
+from deploy_checks.lockfile import load_lockfile, lockfile_drift
+from deploy_checks.messages import (
+    REFERENCE_LOCALE,
+    CatalogError,
+    catalog_parity,
+    format_payload_table,
+    load_catalogs,
+    message_usages,
+    missing_keys,
+    payload_bytes,
+    route_payloads,
+    unused_keys,
+)
+from deploy_checks.pagination import assess, by_function, fold_helpers, format_risk_table
+from deploy_checks.queries import extract_queries, index_coverage, load_indexes
+from deploy_checks.registry import SUBPROCESS, Check, GitDiffError, changed_files
+from deploy_checks.report import ResultStream, format_profile
+from deploy_checks.rules_cost import RulesCostError, analyze_rules, format_cost_table
+from deploy_checks.rules_diff import changed_rule_paths
+from deploy_checks.scanner import SourceScanner
+from deploy_checks.storage_paths import cross_check, format_coverage_table, load_storage_trie, rule_path, storage_paths
+from deploy_checks.validator import Validator
+from deploy_checks.watch import WatchSession, open_watcher
+from deploy_checks.writes import WriteIndex, format_write_table
+
+class FirebaseProjectTester(Validator):
+    # Sources scanned for Firestore queries
+    QUERY_SOURCES = ["functions/src/**/*.ts", "src/lib/firebase/get-*-data.ts"]
+
+    # Sources whose Cloud Storage call sites are checked against storage.rules
+    STORAGE_SOURCES = [
+        "functions/src/storage.ts", "functions/src/policy-attachments.ts", "src/app/expenses/ReceiptUploader.tsx"
+    ]
+
+    # Patterns matched in one pass over the TypeScript sources, as (name, regex, roots)
+    SOURCE_PATTERNS = [
+        ("html_entity", r"&(?:gt|lt|amp|quot|apos);", ["functions/src"]),
+        ("module_import", r"""\bfrom\s*["']([^"']+)["']""", ["functions/src"]),
+    ]
+
+    # Checks in run order, with the files each one reads
+    CHECKS = [
+        Check("test_project_structure", [
+            "functions", "functions/src", "functions/package.json", "functions/tsconfig.json",
+            "firestore.rules", "storage.rules"
+        ]),
+        Check("test_package_dependencies", ["functions/package.json"]),
+        Check("test_html_entities", ["functions/src/**/*.ts"]),
+        Check("test_callable_functions_exist", ["functions/lib/**/*.js", "functions/src/**/*.ts"]),
+        Check("test_firestore_security_rules", ["firestore.rules"]),
+        Check("test_firestore_rules_read_cost", ["firestore.rules"]),
+        Check("test_firestore_index_coverage", ["firestore.indexes.json"] + QUERY_SOURCES),
+        Check("test_unbounded_queries", ["deploy-checks.json", "functions/src/**/*.ts"]),
+        Check("test_write_amplification", ["deploy-checks.json", "functions/src/**/*.ts"]),
+        Check("test_storage_rules_alignment", ["storage.rules"] + STORAGE_SOURCES),
+        Check("test_typescript_imports", ["functions/package.json", "functions/src/**/*.ts"]),
+        Check("test_package_lockfile_sync", [
+            "package.json", "package-lock.json", "functions/package.json", "functions/package-lock.json"
+        ]),
+        Check("test_function_signatures", ["functions/src/*.ts"]),
+        # node_modules/.package-lock.json is npm's record of what is installed, so the
+        # verdicts follow the installed packages, not just the declared ones
+        Check("test_cold_start_weight", [
+            "functions/lib/**/*.js", "functions/package.json", "functions/package-lock.json",
+            "functions/node_modules/.package-lock.json"
+        ], SUBPROCESS),
+        Check("test_client_bundle_weight", [
+            "src/**/*.ts", "src/**/*.tsx", "tsconfig.json", "package.json", "package-lock.json",
+            "node_modules/.package-lock.json"
+        ]),
+        Check("test_message_catalogs", ["messages/*.json", "src/**/*.ts", "src/**/*.tsx", "tsconfig.json"]),
+        Check("test_deployment_readiness", ["functions/lib/index.js", "functions/src/index.ts", "firebase.json"]),
+    ]
+
+    # Firestore allows 10 get()/exists() calls per single-document request
+    RULES_READ_BUDGET = 10
+
+    # Lockfile mismatches listed before the rest are summarized as a count
+    LOCKFILE_DRIFT_SHOWN = 10
+
+    # Unused message keys listed before the rest are summarized as a count
+    UNUSED_MESSAGES_SHOWN = 10
+
+    # On-disk size of the code a function instance may load at cold start; firebase-admin alone is ~50 MB
+    COLD_START_BUDGET_MB = 64
+
+    # Client JavaScript a route may ship, in KB on disk before tree-shaking and minification
+    CLIENT_BUNDLE_BUDGET_KB = 1024
+
+    def __init__(self, project_path="/app", snapshot=None, commands=None, cache=None,
+                 rules_read_budget=None, cold_start_budget=None, client_bundle_budget=None, results=None):
+        super().__init__(project_path, snapshot, commands, cache, results)
+        # An explicit 0 is a budget too
+        self.rules_read_budget = self.RULES_READ_BUDGET if rules_read_budget is None else rules_read_budget
+        self.cold_start_budget = self.COLD_START_BUDGET_MB if cold_start_budget is None else cold_start_budget
+        self.client_bundle_budget = (self.CLIENT_BUNDLE_BUDGET_KB if client_bundle_budget is None
+                                     else client_bundle_budget)
+        self._source_matches = None
+
+    def cache_settings(self):
+        """Settings that change check verdicts, folded into result cache keys"""
+        return {"rules_read_budget": self.rules_read_budget, "cold_start_budget": self.cold_start_budget,
+                "client_bundle_budget": self.client_bundle_budget}
 
     def test_project_structure(self):
         """Test 1: Verify project structure exists"""
@@ -49,7 +129,7 @@ class FirebaseProjectTester:
             self.project_path / "storage.rules"
         ]
         
-        missing = [p for p in required_paths if not p.exists()]
+        missing = [p.relative_to(self.project_path).as_posix() for p in required_paths if not p.exists()]
         self.log_test(
             "Project Structure", 
             len(missing) == 0,
@@ -63,8 +143,7 @@ class FirebaseProjectTester:
             self.log_test("Package Dependencies", False, "package.json not found")
             return
 
-        with open(package_json) as f:
-            package_data = json.load(f)
+        package_data = self.snapshot.json(package_json)
 
         deps = package_data.get("dependencies", {})
         dev_deps = package_data.get("devDependencies", {})
@@ -91,17 +170,27 @@ class FirebaseProjectTester:
         luxon_exists = "luxon" in deps
         self.log_test("Luxon Dependency", luxon_exists, "Required for attendance.ts DateTime handling")
 
+    def source_matches(self, name):
+        """Matches of a SOURCE_PATTERNS entry; all patterns are scanned together on first use"""
+        if self._source_matches is None:
+            scanner = SourceScanner(self.snapshot)
+            for pattern_name, pattern, roots in self.SOURCE_PATTERNS:
+                scanner.register(pattern_name, pattern, roots)
+            self._source_matches = scanner.scan()
+        return self._source_matches[name]
+
+    def _source_name(self, match):
+        """File name relative to functions/src, as shown in check messages"""
+        return match.path.relative_to(self.src_path).as_posix()
+
     def test_html_entities(self):
         """Test 3: Check for HTML entities in TypeScript files"""
-        html_entities = ["&gt;", "&lt;", "&amp;", "&quot;", "&apos;"]
         found_entities = []
         
-        for ts_file in self.src_path.glob("*.ts"):
-            with open(ts_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                for entity in html_entities:
-                    if entity in content:
-                        found_entities.append(f"{ts_file.name}: {entity}")
+        for match in self.source_matches("html_entity"):
+            entry = f"{self._source_name(match)}: {match.text}"
+            if entry not in found_entities:
+                found_entities.append(entry)
         
         self.log_test(
             "HTML Entities Check",
@@ -117,27 +206,8 @@ class FirebaseProjectTester:
             self.log_test("Compiled Functions", False, "lib/index.js not found - run 'npm run build' in functions/")
             return
 
-        with open(compiled_index) as f:
-            compiled_content = f.read()
-
-        # Required callable functions from review request
-        required_callables = [
-            "getUserProfile",
-            "setUserRoleByEmail", 
-            "setManagerForEmployeeByEmail",
-            "clockIn", "clockOut",
-            "applyLeave", "approveLeave", "declineLeave", "returnToWork", "approveReturnToWork",
-            "acknowledgeAnnouncement",
-            "generatePersonalDocUploadUrl", "generatePersonalDocDownloadUrl",
-            "aiGenerate"
-        ]
-
-        missing_callables = []
-        for func in required_callables:
-            # Check if function is exported in compiled JS
-            export_pattern = f'exports.{func}'
-            if export_pattern not in compiled_content:
-                missing_callables.append(func)
+        # Everything src/index.ts exports must be in the compiled entry point
+        missing_callables = self.export_index.missing_from_build()
 
         self.log_test(
             "Required Callable Functions",
@@ -145,52 +215,17 @@ class FirebaseProjectTester:
             f"Missing callables: {missing_callables}" if missing_callables else "All required callable functions found"
         )
 
-        # Verify functions use https.onCall pattern
-        source_index = self.src_path / "index.ts"
-        if source_index.exists():
-            with open(source_index) as f:
-                source_content = f.read()
-            
-            # Check that functions are properly structured as callable functions
-            for func in required_callables:
-                if func in source_content:
-                    # Find the actual function file and check if it uses https.onCall
-                    self._verify_callable_structure(func)
-
-    def _verify_callable_structure(self, func_name):
-        """Verify a function uses the correct https.onCall structure"""
-        # Map function names to their likely source files
-        func_file_map = {
-            "getUserProfile": "get-user-profile.ts",
-            "setUserRoleByEmail": "admin.ts",
-            "setManagerForEmployeeByEmail": "admin.ts", 
-            "clockIn": "attendance.ts",
-            "clockOut": "attendance.ts",
-            "applyLeave": "leave.ts",
-            "approveLeave": "leave.ts",
-            "declineLeave": "leave.ts",
-            "returnToWork": "leave.ts",
-            "approveReturnToWork": "leave.ts",
-            "acknowledgeAnnouncement": "announcements.ts",
-            "generatePersonalDocUploadUrl": "storage.ts",
-            "generatePersonalDocDownloadUrl": "storage.ts",
-            "aiGenerate": "ai.ts"
-        }
-        
-        file_name = func_file_map.get(func_name)
-        if not file_name:
-            return
-            
-        func_file = self.src_path / file_name
-        if not func_file.exists():
-            return
-            
-        with open(func_file) as f:
-            content = f.read()
-            
-        # Check if function uses https.onCall
-        if f"{func_name} = functions.https.onCall" not in content:
-            self.warnings.append(f"{func_name} may not be properly structured as callable function")
+        stale_exports = self.export_index.stale_in_build()
+        if stale_exports:
+            self.log_warning(f"lib/index.js still exports functions removed from src/index.ts: {stale_exports}")
+
+        orphaned = self.export_index.orphaned_outputs()
+        if orphaned:
+            self.log_warning(f"Compiled modules in lib/ without a TypeScript source: {orphaned}")
+
+        # Verify each re-export resolves to a module that declares it
+        for func, module in self.export_index.unresolved():
+            self.log_warning(f"{func} is exported from {module} in index.ts but not declared there", quiet=True)
 
     def test_firestore_security_rules(self):
         """Test 5: Verify Firestore security rules for required collections"""
@@ -199,8 +234,11 @@ class FirebaseProjectTester:
             self.log_test("Firestore Rules", False, "firestore.rules not found")
             return
 
-        with open(rules_file) as f:
-            content = f.read()
+        try:
+            rules = self.snapshot.rules(rules_file)
+        except RulesSyntaxError as e:
+            self.log_test("Firestore Security Rules", False, f"firestore.rules does not parse: {e}")
+            return
 
         # Required collections from review request
         required_collections = [
@@ -208,9 +246,9 @@ class FirebaseProjectTester:
         ]
 
         # Check for basic structure
-        has_rules_version = "rules_version = '2';" in content
-        has_service_declaration = "service cloud.firestore" in content
-        has_match_databases = "match /databases/{database}/documents" in content
+        has_rules_version = rules.version == "2"
+        has_service_declaration = rules.service("cloud.firestore") is not None
+        has_match_databases = bool(rules.find_matches("/databases/{database}/documents"))
 
         syntax_issues = []
         if not has_rules_version:
@@ -224,41 +262,40 @@ class FirebaseProjectTester:
         collection_issues = []
         
         # Users collection
-        if "match /users/{userId}" not in content:
+        users = rules.find_matches("/users/{userId}")
+        if not users:
             collection_issues.append("Missing users collection rules")
         else:
             # Check for proper access controls
-            if "isOwner(userId)" not in content and "request.auth.uid == userId" not in content:
+            conditions = " ".join(a.condition for allows in users[0].allows.values() for a in allows)
+            if "isOwner(userId)" not in conditions and "request.auth.uid == userId" not in conditions:
                 collection_issues.append("Users collection missing owner access control")
-            if "hasRole('Admin')" not in content:
+            if "hasRole('Admin')" not in conditions:
                 collection_issues.append("Users collection missing admin access control")
 
         # Leave requests collection  
-        if "match /leaveRequests/{requestId}" not in content:
+        if not rules.find_matches("/leaveRequests/{requestId}"):
             collection_issues.append("Missing leaveRequests collection rules")
 
         # Leave balances collection
-        if "match /leaveBalances/{userId}" not in content:
+        if not rules.find_matches("/leaveBalances/{userId}"):
             collection_issues.append("Missing leaveBalances collection rules")
 
         # Announcements collection
-        if "match /announcements/{id}" not in content:
+        if not rules.find_matches("/announcements/{id}"):
             collection_issues.append("Missing announcements collection rules")
 
         # Personal documents (can be subcollection under users)
-        has_personal_docs = ("match /personalDocuments/{docId}" in content or 
-                           "match /users/{userId}/personalDocuments/{docId}" in content)
+        has_personal_docs = bool(rules.find_matches("/personalDocuments/{docId}") or
+                                 rules.find_matches("/users/{userId}/personalDocuments/{docId}"))
         if not has_personal_docs:
             collection_issues.append("Missing personalDocuments collection rules")
 
         # Check for authentication functions
-        auth_functions = ["isAuthenticated()", "getUserData()", "hasRole(", "isOwner("]
-        missing_auth_functions = []
-        for func in auth_functions:
-            if func not in content:
-                missing_auth_functions.append(func)
+        auth_functions = ["isAuthenticated", "getUserData", "hasRole", "isOwner"]
+        missing_auth_functions = [f for f in auth_functions if f not in rules.functions]
 
-        all_issues = syntax_issues + collection_issues + [f"Missing auth function: {f}" for f in missing_auth_functions]
+        all_issues = syntax_issues + collection_issues + [f"Missing auth function: {f}()" for f in missing_auth_functions]
 
         self.log_test(
             "Firestore Security Rules",
@@ -266,54 +303,198 @@ class FirebaseProjectTester:
             f"Issues: {all_issues}" if all_issues else "Firestore rules properly configured for all required collections"
         )
 
+    def test_firestore_rules_read_cost(self):
+        """Test 11: Bound the document reads charged by security rule evaluation"""
+        rules_file = self.project_path / "firestore.rules"
+        if not rules_file.exists():
+            self.log_test("Rules Read Cost", False, "firestore.rules not found")
+            return
+
+        try:
+            rules = self.snapshot.rules(rules_file)
+            costs = analyze_rules(rules)
+        except (RulesSyntaxError, RulesCostError) as e:
+            self.log_test("Rules Read Cost", False, f"firestore.rules could not be analyzed: {e}")
+            return
+
+        budget = self.rules_read_budget
+        # Report paths relative to the top-level /databases/{db}/documents match
+        root = next((b.full_path for b in rules.matches.values() if b.parent is None), "")
+        for line in format_cost_table(costs, root):
+            self.log_info(line)
+
+        def short(path):
+            return path[len(root):] if root and path.startswith(root + "/") else path
+
+        over_budget = [f"{short(c.path)} {c.operation} ({c.deduplicated} reads)" for c in costs if c.deduplicated > budget]
+        for cost in costs:
+            if cost.worst_case > budget >= cost.deduplicated:
+                self.log_warning(
+                    f"{short(cost.path)} {cost.operation} calls get()/exists() {cost.worst_case} times "
+                    f"(only {cost.deduplicated} distinct documents)"
+                )
+
+        worst = max((c.deduplicated for c in costs), default=0)
+        self.log_test(
+            "Rules Read Cost",
+            len(over_budget) == 0,
+            f"Over budget of {budget} reads: {over_budget}" if over_budget
+            else f"At most {worst} document reads per rule evaluation (budget {budget})"
+        )
+
+    def test_firestore_index_coverage(self):
+        """Test 12: Verify every composite query has a matching index in firestore.indexes.json"""
+        indexes_file = self.project_path / "firestore.indexes.json"
+        indexes = []
+        if indexes_file.exists():
+            try:
+                indexes = load_indexes(self.snapshot.json(indexes_file))
+            except (ValueError, KeyError) as e:
+                self.log_test("Firestore Index Coverage", False, f"firestore.indexes.json is invalid: {e}")
+                return
+
+        queries = self.load_queries(self.QUERY_SOURCES)
+        missing, unused = index_coverage(queries, indexes)
+        for index in unused:
+            self.log_warning(f"Unused composite index {index.describe()} (still paid for on every write)")
+
+        missing_messages = [
+            f"{index.describe()} needed by {', '.join(q.location for q in users)}" for index, users in missing
+        ]
+        self.log_test(
+            "Firestore Index Coverage",
+            len(missing) == 0,
+            f"Missing indexes: {missing_messages}" if missing
+            else f"{len(queries)} queries covered by {len(indexes)} declared composite indexes"
+        )
+
+    def load_queries(self, patterns):
+        """Firestore queries executed in the sources matching patterns, parsed once per file"""
+        queries = []
+        for pattern in patterns:
+            for source in self.snapshot.glob(pattern):
+                rel = source.relative_to(self.project_path).as_posix()
+                queries.extend(self.snapshot.parsed(source, "queries", lambda text, rel=rel: extract_queries(rel, text)))
+        return queries
+
+    def test_unbounded_queries(self):
+        """Test 14: Size Firestore reads without limit(), cursors or stream() against expected cardinalities"""
+        try:
+            config = load_config(self.snapshot)
+        except ConfigError as e:
+            self.log_test("Unbounded Queries", False, str(e))
+            return
+
+        risks = assess(self.load_queries(["functions/src/**/*.ts"]), config)
+        fold_helpers(risks, WriteIndex(self.snapshot, config).callers())
+        if risks:
+            for line in format_risk_table(risks):
+                self.log_info(line)
+        for risk in risks:
+            if risk.level == "unknown":
+                self.log_warning(f"{risk.query.location} reads all of {risk.query.collection}, which has no expected "
+                                 f"size in {CONFIG_FILE}", quiet=True)
+
+        memory = config["function_memory_mb"]
+        high = []
+        for function, (level, heap, seconds, items) in sorted(by_function(risks).items()):
+            summary = f"{function} (~{heap / 2 ** 20:.0f} MB heap of {memory} MB, ~{seconds:.1f}s reading)"
+            if level == "high":
+                high.append(summary)
+            elif level == "medium":
+                self.log_warning(f"Unbounded reads in {summary}: {', '.join(r.query.location for r in items)}")
+
+        self.log_test(
+            "Unbounded Queries",
+            len(high) == 0,
+            f"Full-collection reads risk OOM or timeouts: {high}" if high
+            else f"{len(risks)} unbounded reads, none sized as high risk"
+        )
+
+    def test_write_amplification(self):
+        """Test 15: Count Firestore writes per call and check batch/transaction commits against the write limit"""
+        try:
+            config = load_config(self.snapshot)
+        except ConfigError as e:
+            self.log_test("Write Amplification", False, str(e))
+            return
+
+        profiles = WriteIndex(self.snapshot, config).exported_profiles(set(self.export_index.source))
+        if profiles:
+            for line in format_write_table(profiles):
+                self.log_info(line)
+
+        budget = config["writes_per_call_budget"]
+        limit = config["batch_write_limit"]
+        oversized = []
+        for profile in profiles:
+            for kind, scope, writes, sites in profile.over_limit():
+                size = f"~{writes:,}" if writes is not None else "an unbounded number of"
+                oversized.append(f"{profile.name} {kind} commits {size} writes (limit {limit}) "
+                                 f"at {sites[0].location}")
+            if profile.minimum > budget:
+                self.log_warning(f"{profile.name} writes ~{profile.minimum:,} documents per call "
+                                 f"(budget {budget} in {CONFIG_FILE})")
+            direct = profile.unbatched()
+            if len(direct) > 1:
+                self.log_warning(f"{profile.name} makes {len(direct)} separate writes that could share one batch: "
+                                 f"{', '.join(site.location for site in direct)}", quiet=True)
+
+        self.log_test(
+            "Write Amplification",
+            len(oversized) == 0,
+            f"Commits over the Firestore write limit: {oversized}" if oversized
+            else f"{len(profiles)} writing functions, every commit within {limit} writes"
+        )
+
     def test_storage_rules_alignment(self):
-        """Test 6: Check storage rules alignment with signed URL functions"""
+        """Test 6: Check storage rules cover every path the storage call sites read or write"""
         storage_rules = self.project_path / "storage.rules"
-        storage_ts = self.src_path / "storage.ts"
-        
-        if not storage_rules.exists() or not storage_ts.exists():
-            self.log_test("Storage Rules Alignment", False, "Missing storage.rules or storage.ts")
+        if not storage_rules.exists():
+            self.log_test("Storage Rules Alignment", False, "Missing storage.rules")
             return
 
-        with open(storage_rules) as f:
-            rules_content = f.read()
-        
-        with open(storage_ts) as f:
-            ts_content = f.read()
+        try:
+            trie = load_storage_trie(self.snapshot, storage_rules)
+        except RulesSyntaxError as e:
+            self.log_test("Storage Rules Alignment", False, f"storage.rules does not parse: {e}")
+            return
 
-        # Check path alignment
-        rules_has_personal_docs = "/personal-documents/{userId}/{docId}/{fileName}" in rules_content
-        ts_has_matching_path = "personal-documents/${uid}/${docId}/${fileName}" in ts_content
-        
-        # Check access control alignment - storage rules use direct auth checks
-        rules_has_auth_check = "request.auth != null" in rules_content
-        rules_has_owner_check = "request.auth.uid == userId" in rules_content
-        
-        # TypeScript functions handle access control via signed URLs and Firestore checks
-        ts_has_access_check = "isManagerOf(caller, userId)" in ts_content and "isAdmin(claims)" in ts_content
-
-        alignment_issues = []
-        if not (rules_has_personal_docs and ts_has_matching_path):
-            alignment_issues.append("Path structure mismatch between rules and functions")
-        if not (rules_has_auth_check and rules_has_owner_check):
-            alignment_issues.append("Missing authentication checks in storage rules")
-        if not ts_has_access_check:
-            alignment_issues.append("Missing access control checks in storage functions")
-
-        # Note: Storage rules intentionally deny reads since access is via signed URLs
-        if "allow read: if false" in rules_content:
-            self.log_test(
-                "Storage Rules Alignment",
-                len(alignment_issues) == 0,
-                f"Issues: {alignment_issues}" if alignment_issues else "Storage rules properly configured for signed URL access pattern"
-            )
-        else:
-            alignment_issues.append("Storage rules should deny direct reads (signed URLs used instead)")
-            self.log_test(
-                "Storage Rules Alignment",
-                len(alignment_issues) == 0,
-                f"Issues: {alignment_issues}"
-            )
+        paths = []
+        for pattern in self.STORAGE_SOURCES:
+            for path in self.snapshot.glob(pattern):
+                rel = path.relative_to(self.project_path).as_posix()
+                paths += self.snapshot.parsed(path, "storage-paths", lambda text, rel=rel: storage_paths(rel, text))
+        if not paths:
+            self.log_test("Storage Rules Alignment", False, "No storage call sites found")
+            return
+
+        coverage, unused = cross_check(trie, paths)
+        for line in format_coverage_table(coverage):
+            self.log_info(line)
+
+        issues = []
+        for entry in coverage:
+            if entry.denied:
+                issues.append(f"{entry.path.operation} of {entry.path.template} ({entry.path.location}) is not granted by any rule")
+            elif not entry.path.client and entry.path.resolved and not entry.granted:
+                self.log_info(f"Admin SDK {entry.path.operation} of {entry.path.template} ({entry.path.location}) "
+                              "bypasses storage.rules")
+            elif not entry.path.resolved:
+                self.log_warning(f"Storage path at {entry.path.location} is built at runtime ({entry.path.template}); rules not checked")
+            # Paths are per-user or per-resource, so a granting rule must look at the caller
+            for block in entry.granted:
+                if not any("request.auth" in a.condition for allows in block.allows.values() for a in allows):
+                    issues.append(f"{rule_path(block)} grants {entry.path.operation} without checking request.auth")
+        for block in unused:
+            self.log_warning(f"Storage rule {rule_path(block)} (line {block.line}) matches no path the code uses")
+
+        resolved = sum(1 for entry in coverage if entry.path.resolved)
+        self.log_test(
+            "Storage Rules Alignment",
+            len(issues) == 0,
+            f"Issues: {issues}" if issues else f"All {resolved} storage paths are granted by storage.rules or use the Admin SDK"
+        )
 
     def test_typescript_imports(self):
         """Test 7: Check TypeScript imports for missing dependencies"""
@@ -321,32 +502,31 @@ class FirebaseProjectTester:
         package_json = self.functions_path / "package.json"
         available_deps = set()
         if package_json.exists():
-            with open(package_json) as f:
-                package_data = json.load(f)
+            package_data = self.snapshot.json(package_json)
             available_deps.update(package_data.get("dependencies", {}).keys())
             available_deps.update(package_data.get("devDependencies", {}).keys())
 
         import_issues = []
-        
-        for ts_file in self.src_path.glob("*.ts"):
-            with open(ts_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
+        imports = {}
+        for match in self.source_matches("module_import"):
+            imports.setdefault(self._source_name(match), set()).add(match.groups[0])
+
+        for file_name, modules in imports.items():
             # Check for uuid import
-            if 'from "uuid"' in content and "uuid" not in available_deps:
-                import_issues.append(f"{ts_file.name}: imports uuid but dependency missing")
+            if "uuid" in modules and "uuid" not in available_deps:
+                import_issues.append(f"{file_name}: imports uuid but dependency missing")
             
             # Check for googleapis import - should be in dependencies for runtime
-            if 'from "googleapis"' in content:
+            if "googleapis" in modules:
                 if "googleapis" not in package_data.get("dependencies", {}):
                     if "googleapis" in package_data.get("devDependencies", {}):
-                        import_issues.append(f"{ts_file.name}: googleapis should be in dependencies, not devDependencies")
+                        import_issues.append(f"{file_name}: googleapis should be in dependencies, not devDependencies")
                     else:
-                        import_issues.append(f"{ts_file.name}: imports googleapis but dependency missing")
+                        import_issues.append(f"{file_name}: imports googleapis but dependency missing")
             
             # Check for luxon import
-            if 'from "luxon"' in content and "luxon" not in available_deps:
-                import_issues.append(f"{ts_file.name}: imports luxon but dependency missing")
+            if "luxon" in modules and "luxon" not in available_deps:
+                import_issues.append(f"{file_name}: imports luxon but dependency missing")
 
         self.log_test(
             "TypeScript Imports",
@@ -355,73 +535,44 @@ class FirebaseProjectTester:
         )
 
     def test_package_lockfile_sync(self):
-        """Test 8: Check package.json lockfile synchronization for CI"""
-        # Test root package.json
-        root_package = self.project_path / "package.json"
-        root_lock = self.project_path / "package-lock.json"
-        
-        # Test functions package.json  
-        func_package = self.functions_path / "package.json"
-        func_lock = self.functions_path / "package-lock.json"
-
+        """Test 8: Check package.json and package-lock.json agree, as `npm ci` requires"""
         lockfile_issues = []
-
-        # Check if lockfiles exist
-        if root_package.exists() and not root_lock.exists():
-            lockfile_issues.append("Root package-lock.json missing")
-        if func_package.exists() and not func_lock.exists():
-            lockfile_issues.append("Functions package-lock.json missing")
-
-        # Test npm ci dry-run for both directories
-        if root_package.exists() and root_lock.exists():
-            try:
-                result = subprocess.run(
-                    ["npm", "ci", "--dry-run"], 
-                    cwd=self.project_path, 
-                    capture_output=True, 
-                    text=True,
-                    timeout=30
-                )
-                if result.returncode != 0:
-                    lockfile_issues.append(f"Root npm ci dry-run failed: {result.stderr[:200]}")
-            except (subprocess.TimeoutExpired, subprocess.SubprocessError) as e:
-                lockfile_issues.append(f"Root npm ci test failed: {str(e)[:100]}")
-
-        if func_package.exists() and func_lock.exists():
+        closures = []
+        for label, directory in (("Root", self.project_path), ("Functions", self.functions_path)):
+            package_json = directory / "package.json"
+            package_lock = directory / "package-lock.json"
+            if not package_json.exists():
+                continue
+            if not package_lock.exists():
+                lockfile_issues.append(f"{label} package-lock.json missing")
+                continue
             try:
-                result = subprocess.run(
-                    ["npm", "ci", "--dry-run"], 
-                    cwd=self.functions_path, 
-                    capture_output=True, 
-                    text=True,
-                    timeout=30
-                )
-                if result.returncode != 0:
-                    lockfile_issues.append(f"Functions npm ci dry-run failed: {result.stderr[:200]}")
-            except (subprocess.TimeoutExpired, subprocess.SubprocessError) as e:
-                lockfile_issues.append(f"Functions npm ci test failed: {str(e)[:100]}")
+                manifest = self.snapshot.json(package_json)
+                lock = load_lockfile(self.snapshot, package_lock)
+            except ValueError as e:
+                lockfile_issues.append(f"{label} lockfile unreadable: {e}")
+                continue
+            drift = lockfile_drift(manifest, lock)
+            lockfile_issues += [f"{label}: {message}" for message in drift[:self.LOCKFILE_DRIFT_SHOWN]]
+            if len(drift) > self.LOCKFILE_DRIFT_SHOWN:
+                lockfile_issues.append(f"{label}: {len(drift) - self.LOCKFILE_DRIFT_SHOWN} more mismatches")
+            closures.append(f"{label}: {len(lock.production_closure())} production packages")
 
         self.log_test(
             "Package Lockfile Sync",
             len(lockfile_issues) == 0,
-            f"Issues: {lockfile_issues}" if lockfile_issues else "Package lockfiles are synchronized for CI"
+            f"Issues: {lockfile_issues}" if lockfile_issues
+            else f"Package lockfiles are synchronized for CI ({', '.join(closures)})"
         )
 
-    def run_all_tests(self):
-        """Run all tests"""
+    def run_all_tests(self, names=None):
+        """Run all tests (or only the named ones)"""
         print("🔥 Firebase Functions Deployment Readiness Test")
         print("=" * 50)
-        
-        self.test_project_structure()
-        self.test_package_dependencies()
-        self.test_html_entities()
-        self.test_callable_functions_exist()
-        self.test_firestore_security_rules()
-        self.test_storage_rules_alignment()
-        self.test_typescript_imports()
-        self.test_package_lockfile_sync()
-        self.test_function_signatures()
-        self.test_deployment_readiness()
+        if names is not None and len(names) < len(self.CHECKS):
+            print(f"⏭️  Running {len(names)} of {len(self.CHECKS)} checks; the others read no changed files")
+
+        self.run_checks(names)
         
         print("\n" + "=" * 50)
         print(f"📊 Test Results: {self.tests_passed}/{self.tests_run} passed")
@@ -464,8 +615,7 @@ class FirebaseProjectTester:
                 signature_issues.append(f"Missing file: {file_name}")
                 continue
                 
-            with open(file_path) as f:
-                content = f.read()
+            content = self.snapshot.text(file_path)
             
             for func_name in functions:
                 # Check if function is properly exported and uses https.onCall
@@ -487,6 +637,154 @@ class FirebaseProjectTester:
             f"Issues: {signature_issues}" if signature_issues else "All functions properly structured for https.onCall"
         )
 
+    def test_cold_start_weight(self):
+        """Test 13: Attribute cold-start dependency weight and require() time to each exported function"""
+        lib_path = self.functions_path / "lib"
+        entry = lib_path / "index.js"
+        if not entry.exists():
+            self.log_test("Cold Start Weight", False, "Compiled output (lib/index.js) not found - run 'npm run build'")
+            return
+
+        graph = RequireGraph(self.snapshot)
+        weights = export_weights(graph, self.export_index.compiled, lib_path)
+        eager = graph.weight(entry)
+
+        # One fresh node process per module, run one at a time so the timings do not contend
+        measured = {}
+        for path in [entry] + sorted({w.path for w in weights}):
+            key = f"cold-start:{path}"
+            result = self.commands.result(key, probe_command(path, initialize=path != entry), lib_path, 60)
+            if result.error is not None:
+                self._cacheable = False
+            probe = parse_probe(result)
+            if probe is None or probe.get("error"):
+                reason = probe["error"] if probe else (result.error or result.stderr.strip()[-200:])
+                self.log_warning(f"Could not measure require() of {path.name}: {reason}", quiet=True)
+                continue
+            measured[path] = probe
+        for weight in weights:
+            weight.measured = measured.get(weight.path)
+
+        budget = self.cold_start_budget * 1e6
+        index_probe = measured.get(entry)
+        timing = f", {index_probe['ms']:.0f} ms to require()" if index_probe else ""
+        self.log_info(f"lib/index.js loads {eager / 1e6:.1f} MB of dependencies eagerly{timing}")
+        self.log_info(f"{'Export':<38} {'Closure':>10} {'require()':>24}  Heaviest packages")
+        for weight in sorted(weights, key=lambda w: (-w.size, w.export)):
+            probe = weight.measured
+            timing = f"{probe['ms']:7.0f} ms {probe['modules']:5d} modules" if probe else f"{'n/a':>24}"
+            self.log_info(f"{weight.export:<38} {weight.size / 1e6:7.1f} MB {timing}  "
+                          f"{', '.join(weight.heaviest(graph))}")
+
+        # Every instance loads index.js, so each export pays the eager closure, not just its own
+        heavy = [w for w in weights if w.size > budget]
+        for weight in heavy:
+            self.log_warning(f"{weight.export} ({weight.module}) needs {weight.size / 1e6:.1f} MB on its own, "
+                             f"mostly {', '.join(weight.heaviest(graph))}")
+        penalized = [w.export for w in weights if w.size <= budget < eager]
+        if penalized:
+            self.log_test(
+                "Cold Start Weight",
+                False,
+                f"lib/index.js eagerly loads {eager / 1e6:.1f} MB (budget {self.cold_start_budget} MB) for every "
+                f"function; {len(penalized)} exports would stay within budget if loaded on their own: {penalized}"
+            )
+        else:
+            self.log_test(
+                "Cold Start Weight",
+                len(heavy) == 0,
+                f"Over budget of {self.cold_start_budget} MB: {[w.export for w in heavy]}" if heavy
+                else f"Cold-start closure {eager / 1e6:.1f} MB within budget of {self.cold_start_budget} MB"
+            )
+
+    def test_client_bundle_weight(self):
+        """Test 16: Attribute the client JavaScript of each Next.js route and check it against the budget"""
+        graph = ClientGraph(self.snapshot)
+        bundles = [graph.bundle(page) for page in graph.pages()]
+        if not bundles:
+            self.log_test("Client Bundle Weight", False, "No page.tsx routes found under src/app")
+            return
+        missing = sorted(set().union(*(bundle.missing for bundle in bundles)))
+        if missing:
+            # Installing packages does not change the check inputs, so a partial size must not be replayed
+            self._cacheable = False
+
+        for line in format_bundle_table(bundles, graph.packages):
+            self.log_info(line)
+        if missing and not (self.project_path / "node_modules").is_dir():
+            self.log_warning("node_modules not found - client packages are not sized; run 'npm ci' to size them")
+        elif missing:
+            self.log_warning(f"Client code imports packages that are not installed, not sized: {missing}")
+
+        budget = self.client_bundle_budget * 1e3
+        heavy = []
+        for bundle in sorted(bundles, key=lambda b: -b.size):
+            if bundle.size > budget:
+                packages = ", ".join(name for name, _ in bundle.heaviest(graph.packages))
+                heavy.append(f"{bundle.route} {bundle.size / 1e3:,.0f} KB ({packages})")
+        largest = max(bundle.size for bundle in bundles)
+        self.log_test(
+            "Client Bundle Weight",
+            len(heavy) == 0,
+            f"Routes over the {self.client_bundle_budget} KB client JS budget: {heavy}" if heavy
+            else f"Largest route ships {largest / 1e3:,.0f} KB of client JS{' without packages' if missing else ''}, "
+                 f"within {self.client_bundle_budget} KB"
+        )
+
+    def test_message_catalogs(self):
+        """Test 17: Check message catalog parity across locales and the messages each route ships"""
+        try:
+            catalogs = load_catalogs(self.snapshot)
+        except CatalogError as e:
+            self.log_test("Message Catalogs", False, str(e))
+            return
+        if REFERENCE_LOCALE not in catalogs:
+            self.log_test("Message Catalogs", False, f"messages/{REFERENCE_LOCALE}.json not found")
+            return
+        reference = catalogs[REFERENCE_LOCALE]
+        issues = [str(gap) for gap in catalog_parity(catalogs)]
+
+        usages = []
+        for path in self.snapshot.glob("src/**/*.ts") + self.snapshot.glob("src/**/*.tsx"):
+            rel = path.relative_to(self.project_path).as_posix()
+            usages.extend(message_usages(rel, self.snapshot.text(path)))
+        issues += [f"{usage.key} used at {usage.location} is not in {REFERENCE_LOCALE}.json"
+                   for usage in missing_keys(reference, usages)]
+        unused = unused_keys(reference, usages)
+        if unused:
+            shown = unused[:self.UNUSED_MESSAGES_SHOWN]
+            more = f" and {len(unused) - len(shown)} more" if len(unused) > len(shown) else ""
+            self.log_warning(f"{len(unused)} message keys are not used in src/: {shown}{more}")
+
+        payloads = route_payloads(ClientGraph(self.snapshot), self.snapshot)
+        if payloads:
+            for line in format_payload_table(payloads, catalogs):
+                self.log_info(line)
+        unwrapped = [payload.route for payload in payloads if payload.usages and payload.provider is None]
+        if unwrapped:
+            self.log_warning(f"Client components call useTranslations with no NextIntlClientProvider above them "
+                             f"(fails at runtime) on {len(unwrapped)} routes: {unwrapped}")
+        # Routes under the same provider usually waste the same bytes; one warning per (provider, excess)
+        oversized = {}
+        for payload in payloads:
+            if payload.provider is None:
+                continue
+            excess = max(payload_bytes(catalog, payload.shipped(catalog)) - payload_bytes(catalog, payload.needed(catalog))
+                         for catalog in catalogs.values())
+            if excess > 0:
+                oversized.setdefault((payload.provider, excess), []).append(payload.route)
+        for (provider, excess), routes in sorted(oversized.items()):
+            self.log_warning(f"{len(routes)} routes ship up to {excess} B of messages their client components do not "
+                             f"use (pick the namespaces they need in {provider}): {sorted(routes)}")
+
+        keys = len(reference)
+        self.log_test(
+            "Message Catalogs",
+            len(issues) == 0,
+            f"Issues: {issues}" if issues
+            else f"{len(catalogs)} locales with the same {keys} keys and placeholders; every used key exists"
+        )
+
     def test_deployment_readiness(self):
         """Test 10: Overall deployment readiness check"""
         deployment_issues = []
@@ -497,19 +795,14 @@ class FirebaseProjectTester:
             deployment_issues.append("Compiled output (lib/index.js) not found - run 'npm run build'")
         else:
             # Check for critical missing exports in compiled output
-            with open(compiled_index) as f:
-                compiled_content = f.read()
-            
-            critical_exports = ["getUserProfile", "clockIn", "clockOut", "applyLeave", "aiGenerate"]
-            missing_critical = [exp for exp in critical_exports if f"exports.{exp}" not in compiled_content]
+            missing_critical = self.export_index.missing_from_build()
             if missing_critical:
                 deployment_issues.append(f"Missing critical exports in compiled output: {missing_critical}")
 
         # Check firebase.json configuration
         firebase_json = self.project_path / "firebase.json"
         if firebase_json.exists():
-            with open(firebase_json) as f:
-                firebase_config = json.load(f)
+            firebase_config = self.snapshot.json(firebase_json)
             
             if "functions" not in firebase_config:
                 deployment_issues.append("firebase.json missing functions configuration")
@@ -531,8 +824,58 @@ class FirebaseProjectTester:
         )
 
 def main():
-    tester = FirebaseProjectTester()
-    success = tester.run_all_tests()
+    parser = argparse.ArgumentParser(description="Firebase Functions deployment readiness checks")
+    parser.add_argument("--project", default="/app", help="project root to validate")
+    parser.add_argument("--cache-dir", help="result cache directory (default: <project>/.deploy-checks-cache)")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and do not update the result cache")
+    parser.add_argument("--ndjson", help="append one JSON line per finished check to this file")
+    parser.add_argument("--junit", help="write a JUnit XML report to this file")
+    parser.add_argument("--profile", action="store_true", help="print the slowest checks")
+    parser.add_argument("--changed-since", metavar="REV",
+                        help="only run the checks whose inputs differ from this git revision")
+    parser.add_argument("--watch", action="store_true", help="stay running and re-run the checks affected by each change")
+    parser.add_argument("--poll", type=float, metavar="SECONDS",
+                        help="with --watch, poll for changes at this interval instead of using inotify")
+    parser.add_argument("--rules-read-budget", type=int,
+                        help=f"max distinct documents a rule evaluation may read (default {FirebaseProjectTester.RULES_READ_BUDGET})")
+    parser.add_argument("--cold-start-budget", type=int,
+                        help=f"max MB of dependencies a function may load at cold start (default {FirebaseProjectTester.COLD_START_BUDGET_MB})")
+    parser.add_argument("--client-bundle-budget", type=int,
+                        help=f"max KB of client JavaScript a route may ship (default {FirebaseProjectTester.CLIENT_BUNDLE_BUDGET_KB})")
+    args = parser.parse_args()
+
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(args.cache_dir or Path(args.project) / ".deploy-checks-cache")
+    changed = rule_paths = None
+    if args.changed_since:
+        if args.watch:
+            parser.error("--watch cannot be combined with --changed-since")
+        try:
+            changed = changed_files(args.project, args.changed_since)
+            rule_paths = changed_rule_paths(args.project, args.changed_since, changed)
+        except GitDiffError as e:
+            parser.error(str(e))
+    if args.watch:
+        if args.ndjson or args.junit or args.profile:
+            parser.error("--watch cannot be combined with --ndjson, --junit or --profile")
+        session = WatchSession(ProjectSnapshot(args.project), [("backend", lambda snapshot, commands: FirebaseProjectTester(
+            args.project, snapshot=snapshot, commands=commands, cache=cache, rules_read_budget=args.rules_read_budget,
+            cold_start_budget=args.cold_start_budget, client_bundle_budget=args.client_bundle_budget))], cache)
+        return session.loop(open_watcher(args.project, session.patterns(), args.poll))
+    results = None
+    if args.ndjson or args.junit or args.profile:
+        results = ResultStream("backend", args.ndjson, args.junit)
+    tester = FirebaseProjectTester(args.project, cache=cache, rules_read_budget=args.rules_read_budget,
+                                    cold_start_budget=args.cold_start_budget, client_bundle_budget=args.client_bundle_budget,
+                                    results=results)
+    success = tester.run_all_tests(tester.select_checks(changed, rule_paths))
+    if results is not None:
+        results.close()
+        if args.profile:
+            print("\n⏱️  Slowest checks:")
+            for line in format_profile(results.records):
+                print(f"   {line}")
     return 0 if success else 1
 
 if __name__ == "__main__":
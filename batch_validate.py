@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Batch Validation
+Runs the deploy gate suites over many project checkouts (tenant forks,
+release branches, git worktrees) on a process pool sized to the available
+cores, and aggregates the verdicts into one report. Workers share the
+result cache, so a check whose inputs are identical in two checkouts runs
+once, and an ArtifactStore, so a lockfile or rules file with the same
+content is parsed once across all of them.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from deploy_checks import ArtifactStore, CommandPool, ProjectSnapshot, ResultCache
+from deploy_gate import SUITES
+
+# Stored parses unused for this long are pruned at the start of a batch
+ARTIFACT_MAX_AGE = 7 * 24 * 3600
+
+# Issues listed in the summary before the rest are counted, and the width they are cut to
+SHARED_ISSUES_SHOWN = 15
+ISSUE_WIDTH = 200
+
+_artifacts = None
+
+
+def _init_worker(artifact_dir):
+    global _artifacts
+    _artifacts = ArtifactStore(artifact_dir)
+
+
+def validate_project(project, suites, cache_dir, cache_entries):
+    """Run the selected suites on one checkout; returns a JSON-serializable outcome"""
+    started = time.monotonic()
+    artifacts = _artifacts if _artifacts is not None else ArtifactStore()
+    hits, misses = artifacts.hits, artifacts.misses
+    snapshot = ProjectSnapshot(project, artifacts=artifacts)
+    commands = CommandPool()
+    cache = ResultCache(cache_dir, max_entries=cache_entries) if cache_dir else None
+    outcome = {"project": project, "suites": {}, "error": None}
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        for suite, validator_class, method in SUITES:
+            if suite not in suites:
+                continue
+            try:
+                validator = validator_class(project, snapshot=snapshot, commands=commands, cache=cache)
+                passed = getattr(validator, method)()
+            except Exception as e:
+                outcome["error"] = f"{suite}: {type(e).__name__}: {e}"
+                break
+            outcome["suites"][suite] = {
+                "passed": passed,
+                "tests_run": validator.tests_run,
+                "tests_passed": validator.tests_passed,
+                "issues": list(validator.issues),
+                "warnings": list(validator.warnings),
+            }
+            print()
+    outcome["elapsed"] = time.monotonic() - started
+    outcome["artifacts_reused"] = artifacts.hits - hits
+    outcome["artifacts_parsed"] = artifacts.misses - misses
+    outcome["output"] = log.getvalue()
+    return outcome
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def git_worktrees(repo):
+    """Paths of the non-bare worktrees of a git repository"""
+    proc = subprocess.run(["git", "worktree", "list", "--porcelain"], cwd=repo,
+                          capture_output=True, text=True, timeout=60)
+    if proc.returncode != 0:
+        raise RuntimeError(f"git worktree list failed in {repo}: {proc.stderr.strip() or proc.returncode}")
+    paths = []
+    path = None
+    for line in proc.stdout.splitlines() + [""]:
+        if line.startswith("worktree "):
+            path = line[len("worktree "):]
+        elif line == "bare":
+            path = None
+        elif not line and path is not None:
+            paths.append(path)
+            path = None
+    return paths
+
+
+def read_project_list(list_file):
+    """Project paths listed one per line (blank lines and # comments ignored)"""
+    base = Path(list_file).resolve().parent
+    paths = []
+    for line in Path(list_file).read_text(encoding="utf-8").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            paths.append(str(base / line) if not Path(line).is_absolute() else line)
+    return paths
+
+
+def format_batch_table(outcomes, suites):
+    """One row per project: passed/run per suite and wall time"""
+    header = ("Project",) + tuple(suites) + ("Time",)
+    rows = []
+    for outcome in outcomes:
+        cells = [outcome["project"]]
+        for suite in suites:
+            result = outcome["suites"].get(suite)
+            if result is None:
+                cells.append("error" if outcome["error"] else "-")
+            else:
+                mark = "✓" if result["passed"] else "✗"
+                cells.append(f"{mark} {result['tests_passed']}/{result['tests_run']}")
+        cells.append(f"{outcome['elapsed']:.1f}s")
+        rows.append(tuple(cells))
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+    return [
+        "  ".join(f"{value:<{widths[i]}}" if i == 0 else f"{value:>{widths[i]}}" for i, value in enumerate(row))
+        for row in [header] + rows
+    ]
+
+
+def shared_issues(outcomes):
+    """[(project count, 'suite: issue')] most widespread first"""
+    counts = {}
+    for outcome in outcomes:
+        for suite, result in outcome["suites"].items():
+            for issue in set(result["issues"]):
+                key = f"{suite}: {issue}"
+                counts[key] = counts.get(key, 0) + 1
+    return sorted(((count, issue) for issue, count in counts.items()), key=lambda item: (-item[0], item[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate many project checkouts in parallel")
+    parser.add_argument("projects", nargs="*", help="project roots to validate")
+    parser.add_argument("--list", dest="list_file", help="file with one project root per line")
+    parser.add_argument("--worktrees", metavar="REPO", action="append",
+                        help="validate every worktree of this git repository (repeatable)")
+    parser.add_argument("--suite", action="append", choices=[suite for suite, _, _ in SUITES],
+                        help="suite to run (repeatable; default: all)")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: available cores)")
+    parser.add_argument("--cache-dir", default=".deploy-checks-cache",
+                        help="result and artifact cache shared by all projects (default: ./.deploy-checks-cache)")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and do not update the caches")
+    parser.add_argument("--report", help="write the aggregated results (with each project's output) to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="print each project's full output")
+    args = parser.parse_args()
+
+    projects = list(args.projects)
+    try:
+        if args.list_file:
+            projects += read_project_list(args.list_file)
+        for repo in args.worktrees or []:
+            projects += git_worktrees(repo)
+    except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+        parser.error(str(e))
+    projects = list(dict.fromkeys(str(Path(p).resolve()) for p in projects))
+    if not projects:
+        parser.error("no projects given")
+    missing = [p for p in projects if not Path(p).is_dir()]
+    if missing:
+        parser.error(f"not a directory: {', '.join(missing)}")
+
+    suites = [suite for suite, _, _ in SUITES if not args.suite or suite in args.suite]
+    jobs = max(1, min(args.jobs or available_cores(), len(projects)))
+    cache_dir = artifact_dir = None
+    if not args.no_cache:
+        cache_dir = Path(args.cache_dir).resolve()
+        artifact_dir = cache_dir / "artifacts"
+        ArtifactStore(artifact_dir).prune(ARTIFACT_MAX_AGE)
+    # Room for every project's verdicts, so one batch does not evict another's
+    cache_entries = max(256, len(projects) * sum(len(cls.CHECKS) for _, cls, _ in SUITES))
+
+    print(f"📦 Batch validation: {len(projects)} projects, {jobs} workers")
+    started = time.monotonic()
+    outcomes = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(artifact_dir,)) as pool:
+        futures = {pool.submit(validate_project, project, suites, cache_dir, cache_entries): project
+                   for project in projects}
+        for future in as_completed(futures):
+            try:
+                outcome = future.result()
+            except Exception as e:
+                outcome = {"project": futures[future], "suites": {}, "error": f"{type(e).__name__}: {e}",
+                           "elapsed": 0.0, "artifacts_reused": 0, "artifacts_parsed": 0, "output": ""}
+            ok = outcome["error"] is None and all(r["passed"] for r in outcome["suites"].values())
+            print(f"   {'✅' if ok else '❌'} {outcome['project']} ({outcome['elapsed']:.1f}s)")
+            if args.verbose:
+                print(outcome["output"])
+            outcomes.append(outcome)
+    elapsed = time.monotonic() - started
+
+    outcomes.sort(key=lambda outcome: projects.index(outcome["project"]))
+    print()
+    for line in format_batch_table(outcomes, suites):
+        print(f"   {line}")
+    errors = [outcome for outcome in outcomes if outcome["error"]]
+    if errors:
+        print("\n💥 Projects that could not be validated:")
+        for outcome in errors:
+            print(f"   • {outcome['project']}: {outcome['error']}")
+    issues = shared_issues(outcomes)
+    if issues:
+        print("\n🚨 Issues by number of projects:")
+        for count, issue in issues[:SHARED_ISSUES_SHOWN]:
+            if len(issue) > ISSUE_WIDTH:
+                issue = issue[:ISSUE_WIDTH - 1] + "…"
+            print(f"   {count:>3} × {issue}")
+        if len(issues) > SHARED_ISSUES_SHOWN:
+            print(f"   ... and {len(issues) - SHARED_ISSUES_SHOWN} more")
+    reused = sum(outcome["artifacts_reused"] for outcome in outcomes)
+    parsed = sum(outcome["artifacts_parsed"] for outcome in outcomes)
+    serial = sum(outcome["elapsed"] for outcome in outcomes)
+    print(f"\n🧩 Artifacts: {parsed} parsed, {reused} reused from other projects")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"elapsed": elapsed, "jobs": jobs, "projects": outcomes}, f, indent=2)
+
+    failed = [o for o in outcomes if o["error"] or not all(r["passed"] for r in o["suites"].values())]
+    summary = f"{len(projects) - len(failed)}/{len(projects)} projects passed in {elapsed:.1f}s ({serial:.1f}s of work)"
+    if failed:
+        print(f"❌ {summary}")
+        return 1
+    print(f"✅ {summary}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Clock-in/Clock-out Contention Load Test
+Simulates a shift-start thundering herd: thousands of employees calling
+clockInV2 within a short ramp (and optionally clockOutV2 afterwards) while
+notifications increment unreadNotifications on the same user documents.
+Runs against the Functions + Firestore emulators, or against the built-in
+stand-in server when no emulator URL is given.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from deploy_checks.load import CallableTarget, LoadReport
+from deploy_checks.standin import StandInServer, StandInStore
+
+
+class ClockLoadTest:
+    def __init__(self, target, employees=2000, ramp=60.0, concurrency=500, clock_out_after=None,
+                 notification_rate=0.0, seed=0):
+        self.target = target
+        self.employees = employees
+        self.ramp = ramp
+        self.concurrency = concurrency
+        self.clock_out_after = clock_out_after
+        self.notification_rate = notification_rate
+        self.rng = random.Random(seed)
+        self.uids = [f"loadtest-{i:06d}" for i in range(employees)]
+        self.report = LoadReport()
+
+    async def seed(self):
+        """Create a clocked-out profile for every simulated employee"""
+        await self.target.seed_users(self.uids)
+
+    async def run(self):
+        """Release every employee at a random offset within the ramp and wait for all of them"""
+        in_flight = asyncio.Semaphore(self.concurrency)
+        offsets = sorted((self.rng.uniform(0, self.ramp), uid) for uid in self.uids)
+        self.report.started = time.perf_counter()
+        done = asyncio.Event()
+        notifier = asyncio.create_task(self._notifications(done))
+        try:
+            await asyncio.gather(*(self._employee(uid, offset, in_flight) for offset, uid in offsets))
+        finally:
+            done.set()
+            await notifier
+            self.report.finished = time.perf_counter()
+        return self.report
+
+    async def _employee(self, uid, offset, in_flight):
+        await asyncio.sleep(offset)
+        async with in_flight:
+            result = await self.target.call("clockInV2", uid)
+        self.report.add(result)
+        if self.clock_out_after is None or not result.ok:
+            return
+        await asyncio.sleep(self.clock_out_after)
+        async with in_flight:
+            self.report.add(await self.target.call("clockOutV2", uid))
+
+    async def _notifications(self, done):
+        """sendNotification() traffic: unreadNotifications increments on random employees' user docs"""
+        if self.notification_rate <= 0:
+            return
+        pending = set()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        issued = 0
+        while not done.is_set():
+            # Issue whatever is due since the last tick, so the rate holds despite timer granularity
+            due = int((loop.time() - started) * self.notification_rate)
+            for _ in range(due - issued):
+                task = asyncio.create_task(self.target.notify(self.rng.choice(self.uids)))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            self.report.notifications += due - issued
+            issued = due
+            try:
+                await asyncio.wait_for(done.wait(), 0.01)
+            except asyncio.TimeoutError:
+                pass
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def run_load_test(args):
+    server = None
+    if args.functions_url:
+        target = CallableTarget(args.functions_url, args.firestore_url, args.project, args.region,
+                                args.concurrency, args.timeout)
+        print(f"🎯 Target: {args.functions_url} (Firestore {args.firestore_url})")
+    else:
+        store = StandInStore(latency=args.standin_latency / 1000, seed=args.seed)
+        server = await StandInServer(store, max_attempts=args.max_attempts).start()
+        target = CallableTarget(server.url, server.url, args.project, args.region, args.concurrency, args.timeout)
+        print(f"🎯 Target: local stand-in at {server.url} ({args.standin_latency:g} ms per RPC)")
+
+    test = ClockLoadTest(target, args.employees, args.ramp, args.concurrency, args.clock_out_after,
+                         args.notification_rate, args.seed)
+    try:
+        await test.seed()
+        print(f"👥 {args.employees} employees clocking in over {args.ramp:g}s, "
+              f"{args.concurrency} concurrent calls max, {args.notification_rate:g} notifications/s")
+        report = await test.run()
+    finally:
+        target.close()
+        if server is not None:
+            await server.close()
+
+    print("\n" + "=" * 50)
+    for line in report.format():
+        print(f"   {line}")
+    if server is not None:
+        print(f"   stand-in: {server.store.commits} commits, {server.store.conflicts} transaction conflicts")
+
+    clock_in = report.summary("clockInV2")
+    failed = clock_in["calls"] - clock_in["ok"]
+    if args.max_p99 is not None and clock_in["p99"] * 1000 > args.max_p99:
+        print(f"\n❌ clockInV2 p99 {clock_in['p99'] * 1000:.1f} ms exceeds budget of {args.max_p99:g} ms")
+        return 1
+    if failed:
+        print(f"\n❌ {failed} clockInV2 calls failed")
+        return 1
+    print("\n✅ All clock-ins succeeded")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shift-start clock-in/out contention load test")
+    parser.add_argument("--employees", type=int, default=2000, help="simulated employees")
+    parser.add_argument("--ramp", type=float, default=60.0, help="seconds over which clock-ins arrive")
+    parser.add_argument("--concurrency", type=int, default=500, help="max calls in flight (connection pool size)")
+    parser.add_argument("--clock-out-after", type=float, help="clock each employee out this many seconds later")
+    parser.add_argument("--notification-rate", type=float, default=0.0,
+                        help="unreadNotifications increments per second on random users")
+    parser.add_argument("--functions-url", help="Functions emulator, e.g. http://127.0.0.1:5001 (default: stand-in)")
+    parser.add_argument("--firestore-url", default="http://127.0.0.1:8080", help="Firestore emulator")
+    parser.add_argument("--project", default="demo-project", help="project id the emulators run")
+    parser.add_argument("--region", default="us-central1", help="functions region")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-call timeout in seconds")
+    parser.add_argument("--standin-latency", type=float, default=2.0, help="stand-in latency per RPC in ms")
+    parser.add_argument("--max-attempts", type=int, default=5, help="stand-in transaction attempts before aborting")
+    parser.add_argument("--max-p99", type=float, help="fail when clockInV2 p99 latency exceeds this many ms")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+    return asyncio.run(run_load_test(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,12 @@
+"""
+Deploy Checks
+Shared building blocks for the pre-deploy validator scripts
+(backend_test.py and expense_claims_test.py)
+"""
+
+from .cache import ResultCache
+from .commands import CommandPool, CommandResult
+from .rules import RulesSyntaxError, parse_rules
+from .snapshot import ArtifactStore, ProjectSnapshot
+
+__all__ = ["ArtifactStore", "CommandPool", "CommandResult", "ProjectSnapshot", "ResultCache", "RulesSyntaxError", "parse_rules"]
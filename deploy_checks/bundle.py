@@ -0,0 +1,351 @@
+"""
+Client Bundle Weight
+Attributes the JavaScript each Next.js route ships to the browser. The
+static import graph of src/** is walked from every route's page.tsx and
+the layouts, templates, loading and error boundaries around it. Modules
+are server components until a "use client" file is reached; everything a
+client module imports is client code. Package imports from client code
+are followed through node_modules file by file, resolved the way a
+browser bundler does ("exports" browser/import conditions, then the
+"browser", "module" and "main" fields), so a route is charged for the
+package modules it can reach rather than for whole package directories.
+Sizes are bytes on disk before tree-shaking, minification and
+compression. Dynamic import() is a separate chunk and is not followed.
+React, React DOM and Next.js are shared by every route and left out.
+"""
+
+import os
+import re
+from pathlib import Path
+
+from .coldstart import PackageIndex, package_name
+from .ts_source import string_value, tokenize_ts
+
+# Extensions tried, in order, for an import of a source module without one
+SOURCE_EXTENSIONS = (".tsx", ".ts", ".jsx", ".js", ".mjs")
+PACKAGE_EXTENSIONS = (".js", ".mjs", ".cjs", ".json")
+
+# Files of each app/ segment that wrap the page below them
+ROUTE_FILES = ("layout", "template", "loading", "error")
+
+# Framework runtime every route loads regardless of its own code
+FRAMEWORK_PACKAGES = {"react", "react-dom", "next", "scheduler"}
+
+# package.json "exports" conditions a client bundle matches
+CLIENT_CONDITIONS = ("browser", "import", "module", "default")
+
+# Static imports, re-exports and require() calls in package code
+_PACKAGE_IMPORT_RE = re.compile(r"""
+    \b(?:import|export)\s*(?:[\w$*{}\s,]+?\s*from\s*)?(["'])([^"'\n]+)\1
+  | \brequire\s*\(\s*(["'])([^"'\n]+)\3\s*\)
+""", re.VERBOSE)
+
+
+class SourceModule:
+    def __init__(self, client, imports):
+        # Whether the module starts with a "use client" directive
+        self.client = client
+        self.imports = imports
+
+
+def source_module(text):
+    """Directive and statically imported specifiers of a TypeScript/TSX module (type-only imports skipped)"""
+    tokens = tokenize_ts(text)
+    client = False
+    for tok in tokens:
+        # Directives are leading string statements
+        if tok.kind != "string" and tok.value != ";":
+            break
+        if string_value(tok) == "use client":
+            client = True
+    imports = []
+    count = len(tokens)
+    for i, tok in enumerate(tokens):
+        if tok.kind != "ident" or tok.value not in ("import", "export") or i + 1 >= count:
+            continue
+        if i and tokens[i - 1].value in (".", "?."):
+            continue
+        following = tokens[i + 1]
+        if following.value == "(":
+            continue
+        if following.value == "type" and i + 2 < count and tokens[i + 2].value not in (",", "from", "="):
+            continue
+        if tok.value == "import" and string_value(following) is not None:
+            imports.append(string_value(following))
+            continue
+        if tok.value == "export" and following.value not in ("{", "*"):
+            continue
+        j = i + 1
+        while j + 1 < count and tokens[j].value != ";" and tokens[j].depth >= tok.depth:
+            if tokens[j].value == "from" and tokens[j].depth == tok.depth:
+                if string_value(tokens[j + 1]) is not None:
+                    imports.append(string_value(tokens[j + 1]))
+                break
+            j += 1
+    return SourceModule(client, imports)
+
+
+def package_imports(text):
+    """Specifiers a package module imports, re-exports or require()s"""
+    return [m.group(2) or m.group(4) for m in _PACKAGE_IMPORT_RE.finditer(text)]
+
+
+def tsconfig_aliases(snapshot, rel_path="tsconfig.json"):
+    """{prefix: directory} of the `paths` wildcards in tsconfig.json, e.g. {"@/": <project>/src}"""
+    aliases = {}
+    try:
+        options = snapshot.json(rel_path).get("compilerOptions") or {}
+    except (OSError, ValueError):
+        options = {}
+    base = snapshot.path(options.get("baseUrl") or ".")
+    for pattern, targets in (options.get("paths") or {}).items():
+        if pattern.endswith("/*") and targets and targets[0].endswith("/*"):
+            aliases[pattern[:-1]] = base / targets[0][:-2]
+    return aliases or {"@/": snapshot.path("src")}
+
+
+def _file(base, extensions):
+    """base itself, base plus an extension or base/index plus an extension, whichever is a file"""
+    candidates = [base] + [base.with_name(base.name + ext) for ext in extensions]
+    candidates += [base / f"index{ext}" for ext in extensions]
+    for candidate in candidates:
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def _condition(target):
+    """Path an "exports" target selects under CLIENT_CONDITIONS, or None"""
+    if isinstance(target, str):
+        return target
+    if isinstance(target, list):
+        for option in target:
+            resolved = _condition(option)
+            if resolved is not None:
+                return resolved
+        return None
+    if isinstance(target, dict):
+        for key, value in target.items():
+            if key in CLIENT_CONDITIONS:
+                resolved = _condition(value)
+                if resolved is not None:
+                    return resolved
+    return None
+
+
+def _export_target(exports, subpath):
+    if not isinstance(exports, dict) or not any(key.startswith(".") for key in exports):
+        return _condition(exports) if subpath == "." else None
+    if subpath in exports:
+        return _condition(exports[subpath])
+    for key, value in exports.items():
+        if "*" not in key:
+            continue
+        prefix, suffix = key.split("*", 1)
+        if subpath.startswith(prefix) and subpath.endswith(suffix) and len(subpath) >= len(prefix) + len(suffix):
+            target = _condition(value)
+            if target is not None:
+                return target.replace("*", subpath[len(prefix):len(subpath) - len(suffix)])
+    return None
+
+
+def package_dir(path):
+    """Directory of the installed package a node_modules file belongs to"""
+    parts = path.parts
+    index = len(parts) - 1 - parts[::-1].index("node_modules")
+    length = 3 if parts[index + 1].startswith("@") else 2
+    return Path(*parts[:index + length])
+
+
+class RouteBundle:
+    """Client code of one route: local modules and reachable package files"""
+
+    def __init__(self, route, page):
+        self.route = route
+        self.page = page
+        self.local = set()
+        self.package_files = set()
+        # Packages imported from client code that are not installed
+        self.missing = set()
+
+    @property
+    def local_size(self):
+        return sum(path.stat().st_size for path in self.local)
+
+    def packages(self):
+        """{package directory: bytes of its files this route reaches}"""
+        sizes = {}
+        for path in self.package_files:
+            directory = package_dir(path)
+            sizes[directory] = sizes.get(directory, 0) + path.stat().st_size
+        return sizes
+
+    @property
+    def size(self):
+        return self.local_size + sum(self.packages().values())
+
+    def heaviest(self, index, count=3):
+        """(name, bytes) of the largest packages in the bundle"""
+        ranked = sorted(self.packages().items(), key=lambda item: -item[1])
+        return [(index.name(directory), size) for directory, size in ranked[:count]]
+
+    def __repr__(self):
+        return f"RouteBundle({self.route}: {self.size / 1e3:.0f} KB)"
+
+
+class ClientGraph:
+    """Import graph of the Next.js sources with client/server boundaries and package resolution"""
+
+    def __init__(self, snapshot, app_dir="src/app"):
+        self.snapshot = snapshot
+        self.app_path = snapshot.path(app_dir)
+        self.aliases = tsconfig_aliases(snapshot)
+        self.packages = PackageIndex(snapshot.project_path)
+        self._closures = {}
+
+    def resolve_local(self, specifier, from_file):
+        """Source file an aliased or relative import refers to, or None"""
+        for prefix, directory in self.aliases.items():
+            if specifier.startswith(prefix):
+                return _file(directory / specifier[len(prefix):], SOURCE_EXTENSIONS)
+        if specifier.startswith("."):
+            return _file(Path(os.path.normpath(from_file.parent / specifier)), SOURCE_EXTENSIONS)
+        return None
+
+    def package_entry(self, directory, subpath):
+        """Module a client bundle loads for `name/subpath`, or None"""
+        manifest = self.packages.manifest(directory)
+        exports = manifest.get("exports")
+        if exports is not None:
+            target = _export_target(exports, subpath)
+            return _file(directory / target, PACKAGE_EXTENSIONS) if target else None
+        if subpath != ".":
+            return _file(directory / subpath, PACKAGE_EXTENSIONS)
+        browser = manifest.get("browser")
+        for field in (browser if isinstance(browser, str) else None, manifest.get("module"), manifest.get("main")):
+            if isinstance(field, str):
+                resolved = _file(directory / field, PACKAGE_EXTENSIONS)
+                if resolved is not None:
+                    return resolved
+        return _file(directory / "index", PACKAGE_EXTENSIONS)
+
+    def resolve_package(self, specifier, from_dir):
+        """(package name, entry file or None); the name is None for framework packages and builtins"""
+        name = package_name(specifier)
+        if name is None or name in FRAMEWORK_PACKAGES:
+            return None, None
+        directory = self.packages.resolve(name, from_dir)
+        if directory is None:
+            return name, None
+        return name, self.package_entry(directory, "." + specifier[len(name):])
+
+    def package_closure(self, entry):
+        """Package files reachable from a package module, memoized per entry"""
+        cached = self._closures.get(entry)
+        if cached is not None:
+            return cached
+        files = set()
+        stack = [entry]
+        while stack:
+            current = stack.pop()
+            if current in files:
+                continue
+            files.add(current)
+            if current.suffix == ".json":
+                continue
+            browser = self.packages.manifest(package_dir(current)).get("browser")
+            remap = browser if isinstance(browser, dict) else {}
+            for specifier in self.snapshot.parsed(current, "js-imports", package_imports):
+                if remap.get(specifier) is False:
+                    continue
+                if specifier.startswith("."):
+                    target = _file(Path(os.path.normpath(current.parent / specifier)), PACKAGE_EXTENSIONS)
+                    if target is not None:
+                        key = "./" + target.relative_to(package_dir(current)).as_posix()
+                        if remap.get(key) is False:
+                            continue
+                        if isinstance(remap.get(key), str):
+                            target = _file(package_dir(current) / remap[key], PACKAGE_EXTENSIONS)
+                    if target is not None and target not in files:
+                        stack.append(target)
+                    continue
+                _, target = self.resolve_package(specifier, current.parent)
+                if target is None:
+                    continue
+                if target in self._closures:
+                    files.update(self._closures[target])
+                elif target not in files:
+                    stack.append(target)
+        cached = self._closures[entry] = frozenset(files)
+        return cached
+
+    def pages(self):
+        """page.tsx/jsx files under the app directory, sorted"""
+        return sorted(path for ext in SOURCE_EXTENSIONS for path in self.app_path.rglob(f"page{ext}"))
+
+    def route(self, page):
+        """URL path of a page, with route groups dropped: src/app/manager/approvals/page.tsx -> /manager/approvals"""
+        parts = [part for part in page.parent.relative_to(self.app_path).parts
+                 if not (part.startswith("(") and part.endswith(")"))]
+        return "/" + "/".join(parts)
+
+    def boundaries(self, page):
+        """Layouts, templates, loading and error files from the app root down to the page, then the page"""
+        files = []
+        directory = self.app_path
+        for part in (None,) + page.parent.relative_to(self.app_path).parts:
+            if part is not None:
+                directory = directory / part
+            for name in ROUTE_FILES:
+                found = _file(directory / name, SOURCE_EXTENSIONS)
+                if found is not None:
+                    files.append(found)
+        return files + [page]
+
+    def bundle(self, page, packages=True):
+        """RouteBundle of one page; packages=False collects the local client modules only"""
+        bundle = RouteBundle(self.route(page), page)
+        # file -> whether it has been walked as client code
+        seen = {}
+        stack = [(path, False) for path in self.boundaries(page)]
+        while stack:
+            path, client = stack.pop()
+            module = self.snapshot.parsed(path, "client-imports", source_module)
+            client = client or module.client
+            if path in seen and (seen[path] or not client):
+                continue
+            seen[path] = client
+            if client:
+                bundle.local.add(path)
+            for specifier in module.imports:
+                target = self.resolve_local(specifier, path)
+                if target is not None:
+                    if target.suffix in SOURCE_EXTENSIONS:
+                        stack.append((target, client))
+                    continue
+                if not client or not packages or specifier.startswith("."):
+                    continue
+                name, entry = self.resolve_package(specifier, path.parent)
+                if name is None:
+                    continue
+                if entry is None:
+                    bundle.missing.add(name)
+                    continue
+                bundle.package_files.update(self.package_closure(entry))
+        return bundle
+
+
+def format_bundle_table(bundles, index):
+    """Route, client JS split into local and package bytes, and its heaviest packages"""
+    rows = []
+    for bundle in sorted(bundles, key=lambda b: (-b.size, b.route)):
+        heaviest = ", ".join(f"{name} {size / 1e3:.0f} KB" for name, size in bundle.heaviest(index))
+        rows.append((bundle.route, f"{bundle.size / 1e3:,.0f} KB", f"{bundle.local_size / 1e3:,.0f} KB",
+                     f"{len(bundle.local)}", heaviest))
+    header = ("Route", "Client JS", "Local", "Modules", "Heaviest packages")
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+    return [
+        "  ".join(f"{value:<{widths[i]}}" if i in (0, 4) else f"{value:>{widths[i]}}"
+                  for i, value in enumerate(row)).rstrip()
+        for row in [header] + rows
+    ]
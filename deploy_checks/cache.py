@@ -0,0 +1,163 @@
+"""
+Result Cache
+Persistent, content-addressed cache of check verdicts. A check's key is the
+hash of its declared input files (plus the validator code itself), so a
+check whose inputs are unchanged replays its previous verdict instead of
+running again. Entries are evicted least-recently-used beyond max_entries
+and unconditionally after max_age seconds.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CACHE_FORMAT = 1
+
+
+class ResultCache:
+    def __init__(self, cache_dir, max_entries=256, max_age=30 * 24 * 3600):
+        self.cache_dir = Path(cache_dir)
+        self.results_dir = self.cache_dir / "results"
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._keys = {}
+
+    def key(self, snapshot, name, inputs, salt=""):
+        """Cache key for check name over the files matched by the input patterns"""
+        memo_key = (id(snapshot), name, salt, tuple(inputs))
+        if memo_key in self._keys:
+            return self._keys[memo_key]
+        h = hashlib.sha256(f"{CACHE_FORMAT}\0{salt}\0{name}".encode())
+        for pattern in inputs:
+            h.update(f"\0{pattern}".encode())
+            for path in snapshot.glob(pattern):
+                rel = path.relative_to(snapshot.project_path).as_posix()
+                digest = snapshot.digest(path) if path.is_file() else "dir"
+                h.update(f"\0{rel}={digest}".encode())
+        key = self._keys[memo_key] = h.hexdigest()
+        return key
+
+    def load(self, key):
+        """Recorded events for key, or None on a miss"""
+        entry = self.results_dir / f"{key}.json"
+        try:
+            with open(entry, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if time.time() - data.get("stored_at", 0) > self.max_age:
+            self.misses += 1
+            return None
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        self.hits += 1
+        return data["events"]
+
+    def store(self, key, name, events):
+        """Persist a check's events atomically, then evict stale entries"""
+        try:
+            self.results_dir.mkdir(parents=True, exist_ok=True)
+            payload = {"check": name, "stored_at": time.time(), "events": events}
+            fd, tmp = tempfile.mkstemp(dir=self.results_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp, self.results_dir / f"{key}.json")
+        except OSError:
+            return
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries and the least recently used ones beyond max_entries"""
+        try:
+            entries = [(p.stat().st_mtime, p) for p in self.results_dir.glob("*.json")]
+        except OSError:
+            return
+        now = time.time()
+        entries.sort(reverse=True)
+        for index, (mtime, path) in enumerate(entries):
+            if index >= self.max_entries or now - mtime > self.max_age:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def invalidate(self):
+        """Forget the keys computed for this run (inputs may have changed on disk)"""
+        self._keys.clear()
+
+    def is_cached(self, validator, name):
+        """Whether a check would replay from the cache"""
+        inputs = validator.CHECK_INPUTS.get(name)
+        if inputs is None:
+            return False
+        key = self.key(validator.snapshot, name, inputs, _salt(validator))
+        return (self.results_dir / f"{key}.json").exists()
+
+    def run_check(self, validator, name):
+        """Run validator.<name>(), replaying the cached verdict when its inputs are unchanged"""
+        check = getattr(validator, name)
+        inputs = validator.CHECK_INPUTS.get(name)
+        if inputs is None:
+            check()
+            return
+        key = self.key(validator.snapshot, name, inputs, _salt(validator))
+        events = self.load(key)
+        if events is not None:
+            replay(validator, events)
+            return
+
+        validator._recording = []
+        validator._cacheable = True
+        try:
+            check()
+            if validator._cacheable:
+                self.store(key, name, validator._recording)
+        finally:
+            validator._recording = None
+
+
+def replay(validator, events):
+    """Re-emit recorded log_test/log_warning/log_info calls"""
+    for kind, *args in events:
+        if kind == "test":
+            validator.log_test(*args)
+        elif kind == "warning":
+            validator.log_warning(*args)
+        elif kind == "info":
+            validator.log_info(*args)
+
+
+def _salt(validator):
+    """Code digest plus any settings the validator's verdicts depend on"""
+    settings = getattr(validator, "cache_settings", None)
+    return code_digest(validator) + (json.dumps(settings(), sort_keys=True) if settings else "")
+
+
+_code_digests = {}
+
+
+def code_digest(validator):
+    """Hash of the validator module and this package, so code changes invalidate old verdicts"""
+    module = sys.modules[type(validator).__module__]
+    source = inspect.getsourcefile(module) or ""
+    digest = _code_digests.get(source)
+    if digest is None:
+        h = hashlib.sha256()
+        package_dir = Path(__file__).parent
+        for path in [Path(source)] + sorted(package_dir.glob("*.py")):
+            try:
+                h.update(path.read_bytes())
+            except OSError:
+                pass
+        digest = _code_digests[source] = h.hexdigest()
+    return digest
@@ -0,0 +1,222 @@
+"""
+Cold-start Weight
+Attributes the code a Cloud Functions instance loads at cold start to each
+exported function. The require graph of the compiled entry point is
+followed statically through functions/lib and into node_modules (package
+dependencies resolved the way Node does, nested node_modules first), giving
+each export the on-disk size of its transitive package closure. Optionally
+each entry module is also require()d in a fresh `node` process to measure
+load time and the JavaScript actually loaded.
+"""
+
+import json
+import os
+import posixpath
+from pathlib import Path
+
+from .exports import module_exports
+
+# Loaded in a fresh node process per entry module; prints one JSON line
+PROBE_SCRIPT = r"""
+const Module = require('module');
+const fs = require('fs');
+const entry = process.argv[1];
+// A default app config that top-level admin.storage().bucket() calls accept
+process.env.GCLOUD_PROJECT = process.env.GCLOUD_PROJECT || 'cold-start-probe';
+process.env.FIREBASE_CONFIG = process.env.FIREBASE_CONFIG ||
+  JSON.stringify({ projectId: 'cold-start-probe', storageBucket: 'cold-start-probe.appspot.com' });
+const before = new Set(Object.keys(require.cache));
+const started = process.hrtime.bigint();
+let error = null;
+try {
+  if (process.argv[2] === 'init') {
+    // Modules other than index.js expect index.js to have initialized the default app
+    Module.createRequire(entry)('firebase-admin').initializeApp();
+  }
+  require(entry);
+} catch (e) { error = String((e && e.message) || e); }
+const ms = Number(process.hrtime.bigint() - started) / 1e6;
+const files = Object.keys(require.cache).filter((f) => !before.has(f));
+let bytes = 0;
+for (const f of files) { try { bytes += fs.statSync(f).size; } catch (e) {} }
+console.log(JSON.stringify({ ms, modules: files.length, bytes, error }));
+"""
+
+
+class PackageIndex:
+    """Package resolution and sizes under a node_modules tree"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._sizes = {}
+        self._manifests = {}
+        self._closures = {}
+
+    def resolve(self, name, from_dir):
+        """Directory of package name as seen from from_dir, or None (builtins, missing packages)"""
+        directory = Path(from_dir)
+        while True:
+            candidate = directory / "node_modules" / name
+            if (candidate / "package.json").is_file():
+                return candidate
+            if directory == self.root or directory.parent == directory:
+                return None
+            directory = directory.parent
+
+    def manifest(self, package_dir):
+        manifest = self._manifests.get(package_dir)
+        if manifest is None:
+            try:
+                with open(package_dir / "package.json", encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                manifest = {}
+            self._manifests[package_dir] = manifest
+        return manifest
+
+    def size(self, package_dir):
+        """Bytes on disk of a package, excluding its nested node_modules (counted as packages of their own)"""
+        size = self._sizes.get(package_dir)
+        if size is None:
+            size = 0
+            for directory, subdirs, files in os.walk(package_dir):
+                if "node_modules" in subdirs:
+                    subdirs.remove("node_modules")
+                for name in files:
+                    try:
+                        size += os.lstat(os.path.join(directory, name)).st_size
+                    except OSError:
+                        pass
+            self._sizes[package_dir] = size
+        return size
+
+    def closure(self, package_dir):
+        """Package directories reachable through dependencies, including package_dir"""
+        result = self._closures.get(package_dir)
+        if result is not None:
+            return result
+        result = set()
+        stack = [package_dir]
+        while stack:
+            current = stack.pop()
+            if current in result:
+                continue
+            result.add(current)
+            manifest = self.manifest(current)
+            for field in ("dependencies", "optionalDependencies", "peerDependencies"):
+                for name in manifest.get(field) or {}:
+                    resolved = self.resolve(name, current)
+                    if resolved is not None and resolved not in result:
+                        stack.append(resolved)
+        result = self._closures[package_dir] = frozenset(result)
+        return result
+
+    def name(self, package_dir):
+        return self.manifest(package_dir).get("name") or package_dir.name
+
+
+def package_name(specifier):
+    """'@scope/pkg' for '@scope/pkg/sub/path', 'pkg' for 'pkg/sub'; None for relative or node: specifiers"""
+    if specifier.startswith((".", "/", "node:")):
+        return None
+    parts = specifier.split("/")
+    return "/".join(parts[:2]) if specifier.startswith("@") else parts[0]
+
+
+class RequireGraph:
+    """Static require() graph of compiled modules under a functions package"""
+
+    def __init__(self, snapshot, functions_dir="functions"):
+        self.snapshot = snapshot
+        self.functions_path = snapshot.path(functions_dir)
+        self.packages = PackageIndex(self.functions_path)
+        self._local = {}
+
+    def resolve_local(self, specifier, from_file):
+        """Compiled file a relative require() refers to, or None"""
+        base = from_file.parent / posixpath.normpath(specifier)
+        for candidate in (base, base.with_name(base.name + ".js"), base / "index.js"):
+            if candidate.is_file():
+                return candidate
+        return None
+
+    def module_closure(self, entry):
+        """(local files, package directories) loaded by require()ing entry"""
+        cached = self._local.get(entry)
+        if cached is not None:
+            return cached
+        files = set()
+        packages = set()
+        stack = [entry]
+        while stack:
+            current = stack.pop()
+            if current in files:
+                continue
+            files.add(current)
+            for specifier in self.snapshot.parsed(current, "exports", module_exports).requires:
+                if specifier.startswith("."):
+                    target = self.resolve_local(specifier, current)
+                    if target is not None and target not in files:
+                        stack.append(target)
+                    continue
+                name = package_name(specifier)
+                if name is None:
+                    continue
+                package_dir = self.packages.resolve(name, current.parent)
+                if package_dir is not None:
+                    packages.update(self.packages.closure(package_dir))
+        cached = self._local[entry] = (frozenset(files), frozenset(packages))
+        return cached
+
+    def weight(self, entry):
+        """Bytes of local files plus the transitive package closure of entry"""
+        files, packages = self.module_closure(entry)
+        return sum(f.stat().st_size for f in files) + sum(self.packages.size(p) for p in packages)
+
+
+class EntryWeight:
+    def __init__(self, export, module, path, size, packages, measured=None):
+        self.export = export
+        self.module = module
+        self.path = path
+        self.size = size
+        self.packages = packages
+        self.measured = measured
+
+    def heaviest(self, graph, count=3):
+        """Names of the largest packages in the closure"""
+        ranked = sorted(self.packages, key=graph.packages.size, reverse=True)
+        return [graph.packages.name(p) for p in ranked[:count]]
+
+    def __repr__(self):
+        return f"EntryWeight({self.export} <- {self.module}: {self.size / 1e6:.1f} MB)"
+
+
+def export_weights(graph, exports, lib_path):
+    """EntryWeight for each export of the compiled entry point, attributed to the module it comes from"""
+    weights = []
+    for name, module in exports.items():
+        path = graph.resolve_local(module, lib_path / "index.js") if module else None
+        if path is None:
+            continue
+        _, packages = graph.module_closure(path)
+        weights.append(EntryWeight(name, module, path, graph.weight(path), packages))
+    return weights
+
+
+def probe_command(entry, initialize=True):
+    """argv measuring require(entry) in a fresh node process"""
+    return ["node", "-e", PROBE_SCRIPT, str(Path(entry).resolve()), "init" if initialize else "bare"]
+
+
+def parse_probe(result):
+    """Measurement dict from a finished probe CommandResult, or None"""
+    if not result.ok:
+        return None
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("{"):
+            try:
+                return json.loads(line)
+            except ValueError:
+                return None
+    return None
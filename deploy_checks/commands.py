@@ -0,0 +1,117 @@
+"""
+Command Pool
+Runs the subprocess-backed checks (npm, tsc) on a bounded worker pool so
+they overlap with each other and with the pure-Python checks. Results are
+collected by key, so callers still report them in their own fixed order.
+"""
+
+import subprocess
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+
+class CommandResult:
+    def __init__(self, argv, cwd, returncode=None, stdout="", stderr="", error=None, duration=0.0):
+        self.argv = argv
+        self.cwd = cwd
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.error = error
+        self.duration = duration
+
+    @property
+    def ok(self):
+        return self.error is None and self.returncode == 0
+
+    def __repr__(self):
+        return f"CommandResult({' '.join(self.argv)}, returncode={self.returncode}, error={self.error!r})"
+
+
+class CommandPool:
+    # Workers mostly sit in communicate(); the CPU work happens in the child processes
+    DEFAULT_WORKERS = 4
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or self.DEFAULT_WORKERS
+        self._executor = None
+        self._futures = {}
+        self._running = set()
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        # Wall time of the commands whose results were collected, for per-check profiling
+        self.collected_time = 0.0
+
+    def submit(self, key, argv, cwd, timeout):
+        """Start a command in the background unless one is already queued under key"""
+        with self._lock:
+            if key not in self._futures:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="deploy-checks")
+                self._futures[key] = self._executor.submit(self._run, list(argv), cwd, timeout)
+            return self._futures[key]
+
+    def result(self, key, argv, cwd, timeout):
+        """Wait for the command queued under key, starting it first if necessary"""
+        future = self.submit(key, argv, cwd, timeout)
+        try:
+            result = future.result()
+        except CancelledError as e:
+            return CommandResult(list(argv), cwd, error=e)
+        self.collected_time += result.duration
+        return result
+
+    def cancel(self):
+        """Drop queued commands and kill the ones still running"""
+        self._cancelled.set()
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            running = list(self._running)
+        for proc in running:
+            proc.kill()
+
+    def close(self):
+        """Wait for in-flight commands and release the worker threads"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.cancel()
+        self.close()
+
+    def _run(self, argv, cwd, timeout):
+        if self._cancelled.is_set():
+            return CommandResult(argv, cwd, error=CancelledError())
+        started = time.monotonic()
+        try:
+            proc = subprocess.Popen(
+                argv,
+                cwd=cwd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+        except OSError as e:
+            return CommandResult(argv, cwd, error=e, duration=time.monotonic() - started)
+
+        with self._lock:
+            self._running.add(proc)
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
+            error = CancelledError() if self._cancelled.is_set() else None
+        except subprocess.TimeoutExpired as e:
+            proc.kill()
+            stdout, stderr = proc.communicate()
+            error = e
+        finally:
+            with self._lock:
+                self._running.discard(proc)
+        return CommandResult(argv, cwd, proc.returncode, stdout, stderr, error, time.monotonic() - started)
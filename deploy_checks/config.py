@@ -0,0 +1,53 @@
+"""
+Deploy Checks Configuration
+Project facts the static checks cannot read from the code, kept in
+deploy-checks.json at the project root: the expected size of each
+Firestore collection, how selective its equality filters are, and the
+runtime limits of the functions. Missing keys fall back to DEFAULTS.
+"""
+
+import copy
+
+CONFIG_FILE = "deploy-checks.json"
+
+DEFAULTS = {
+    # Memory of a function instance, used for every function (per-function runWith({memory}) is not read)
+    "function_memory_mb": 256,
+    # Documents a query streams back per second, including deserialization
+    "read_docs_per_second": 2000,
+    # Most writes Firestore accepts in one batch or transaction commit
+    "batch_write_limit": 500,
+    # Document writes per invocation above which a function is reported
+    "writes_per_call_budget": 25,
+    # {collection: {"documents": expected count, "document_kb": average size,
+    #               "per_value": {field: documents matching one equality value}}}
+    "collections": {},
+}
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def load_config(snapshot, rel_path=CONFIG_FILE):
+    """deploy-checks.json merged over DEFAULTS (just DEFAULTS when the file is missing)"""
+    config = copy.deepcopy(DEFAULTS)
+    if not snapshot.exists(rel_path):
+        return config
+    try:
+        data = snapshot.json(rel_path)
+    except ValueError as e:
+        raise ConfigError(f"{rel_path} is not valid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise ConfigError(f"{rel_path} must contain a JSON object")
+    for key, value in data.items():
+        if key.startswith("//"):
+            continue
+        if key in config and isinstance(config[key], dict) and isinstance(value, dict):
+            config[key].update(value)
+        else:
+            config[key] = value
+    for name, collection in config["collections"].items():
+        if not isinstance(collection, dict) or not isinstance(collection.get("documents", 0), (int, float)):
+            raise ConfigError(f"{rel_path}: collection {name!r} needs a numeric 'documents' count")
+    return config
@@ -0,0 +1,196 @@
+"""
+Export Index
+Symbol tables for the Cloud Functions entry point. Both the TypeScript
+sources (`export { a, b as c } from "./x"`, `export const a`) and the
+compiled CommonJS output (`exports.a = ...`,
+`Object.defineProperty(exports, "a", ...)`) are reduced to
+{exported name: module it comes from}, so a stale build, a renamed
+function or an orphaned compiled module is a plain set difference.
+"""
+
+import posixpath
+
+from .ts_source import call_args, declarations, string_value, tokenize_ts
+
+
+class ModuleExports:
+    def __init__(self):
+        # exported name -> module specifier it is re-exported from (None when declared locally)
+        self.names = {}
+        self.requires = set()
+        self.star_modules = []
+
+    def add(self, name, module=None):
+        self.names.setdefault(name, module)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __repr__(self):
+        return f"ModuleExports({sorted(self.names)})"
+
+
+def module_exports(text):
+    """Names a TypeScript or compiled JavaScript module exports"""
+    tokens = tokenize_ts(text)
+    result = ModuleExports()
+    aliases = {}
+    count = len(tokens)
+
+    for decl in declarations(tokens):
+        if decl.exported:
+            result.add(decl.name)
+
+    i = 0
+    while i < count:
+        tok = tokens[i]
+        value = tok.value
+        after_dot = i > 0 and tokens[i - 1].value == "."
+        if value == "require" and not after_dot and i + 1 < count and tokens[i + 1].value == "(":
+            args, end = call_args(tokens, i + 1)
+            module = string_value(args[0][0]) if args and len(args[0]) == 1 else None
+            if module is not None:
+                result.requires.add(module)
+                alias = _require_alias(tokens, i)
+                if alias is not None:
+                    aliases[alias] = module
+            i = end
+        elif value == "export" and tok.kind == "ident" and tok.depth == 0 and i + 1 < count:
+            i = _export_statement(tokens, i + 1, result)
+        elif value == "exports" and not after_dot and i + 2 < count and tokens[i + 1].value == ".":
+            # exports.name = value; `exports.a = exports.b = void 0` only predeclares names
+            name = tokens[i + 2].value
+            j = i + 3
+            if j < count and tokens[j].value == "=":
+                while (j + 4 < count and tokens[j + 1].value == "exports" and tokens[j + 2].value == "."
+                        and tokens[j + 4].value == "="):
+                    j += 4
+                rhs = tokens[j + 1] if j + 1 < count else None
+                if rhs is not None and rhs.value != "void":
+                    result.add(name, aliases.get(rhs.value) if rhs.kind == "ident" else None)
+            i += 3
+        elif (value == "defineProperty" and after_dot and i > 1 and tokens[i - 2].value == "Object"
+                and i + 1 < count and tokens[i + 1].value == "("):
+            args, end = call_args(tokens, i + 1)
+            if len(args) >= 2 and [t.value for t in args[0]] == ["exports"] and len(args[1]) == 1:
+                name = string_value(args[1][0])
+                if name is not None and name != "__esModule":
+                    result.add(name, _getter_module(args[2] if len(args) > 2 else [], aliases))
+            i = end
+        else:
+            i += 1
+    return result
+
+
+def _require_alias(tokens, i):
+    """Variable a require() call at tokens[i] is assigned to, looking through __importStar(...) wrappers"""
+    j = i - 1
+    while j > 0 and tokens[j].value == "(" and tokens[j - 1].value.startswith("__import"):
+        j -= 2
+    if j > 0 and tokens[j].value == "=" and tokens[j - 1].kind == "ident":
+        return tokens[j - 1].value
+    return None
+
+
+def _export_statement(tokens, i, result):
+    """Record `export { a, b as c } from "m"` / `export * from "m"`; returns the index to continue at"""
+    count = len(tokens)
+    if tokens[i].value == "*":
+        j = i + 1
+        while j < count and tokens[j].value != "from" and tokens[j].value != ";":
+            j += 1
+        if j + 1 < count and tokens[j].value == "from" and string_value(tokens[j + 1]) is not None:
+            result.star_modules.append(string_value(tokens[j + 1]))
+        return j + 1
+    if tokens[i].value != "{":
+        return i
+    names = []
+    j = i + 1
+    while j < count and tokens[j].value != "}":
+        if tokens[j].kind == "ident" and tokens[j].value not in ("as", "type"):
+            if j > i + 1 and tokens[j - 1].value == "as":
+                names[-1] = tokens[j].value
+            else:
+                names.append(tokens[j].value)
+        j += 1
+    module = None
+    if j + 2 < count and tokens[j + 1].value == "from":
+        module = string_value(tokens[j + 2])
+    for name in names:
+        result.add(name, module)
+    return j + 1
+
+
+def _getter_module(descriptor, aliases):
+    """Module behind `{ get: function () { return mod_1.name; } }`"""
+    for k, tok in enumerate(descriptor):
+        if tok.value == "return" and k + 1 < len(descriptor) and descriptor[k + 1].value in aliases:
+            return aliases[descriptor[k + 1].value]
+    return None
+
+
+class ExportIndex:
+    """Exports of src/index.ts against the compiled lib/ output of a functions package"""
+
+    def __init__(self, snapshot, functions_dir="functions", source_dir="src", output_dir="lib"):
+        self.snapshot = snapshot
+        self.functions_path = snapshot.path(functions_dir)
+        self.source_path = self.functions_path / source_dir
+        self.output_path = self.functions_path / output_dir
+
+    def module(self, path):
+        """ModuleExports of a source or compiled file, parsed once per snapshot (empty if missing)"""
+        if not self.snapshot.exists(path):
+            return ModuleExports()
+        return self.snapshot.parsed(path, "exports", module_exports)
+
+    @property
+    def source(self):
+        """{name: module} exported by the TypeScript entry point"""
+        return self.module(self.source_path / "index.ts").names
+
+    @property
+    def compiled(self):
+        """{name: module} exported by the compiled entry point"""
+        return self.module(self.output_path / "index.js").names
+
+    def missing_from_build(self):
+        """Exported in the sources but absent from the compiled entry point (stale or failed build)"""
+        compiled = self.compiled
+        return [name for name in self.source if name not in compiled]
+
+    def stale_in_build(self):
+        """Still exported by the compiled entry point but no longer by the sources"""
+        source = self.source
+        return [name for name in self.compiled if name not in source]
+
+    def source_file(self, module):
+        """TypeScript file a relative module specifier of index.ts refers to, or None"""
+        if module is None or not module.startswith("."):
+            return None
+        base = self.source_path / posixpath.normpath(module)
+        for candidate in (base.with_name(base.name + ".ts"), base / "index.ts"):
+            if self.snapshot.exists(candidate):
+                return candidate
+        return None
+
+    def unresolved(self):
+        """(name, module) pairs re-exported from a module that does not exist or does not export name"""
+        result = []
+        for name, module in self.source.items():
+            if module is None:
+                continue
+            path = self.source_file(module)
+            if path is None or (name not in self.module(path) and not self.module(path).star_modules):
+                result.append((name, module))
+        return result
+
+    def orphaned_outputs(self):
+        """Compiled modules with no TypeScript source left (deleted or renamed files)"""
+        orphans = []
+        for path in self.snapshot.glob(f"{self.output_path.relative_to(self.snapshot.project_path)}/**/*.js"):
+            rel = path.relative_to(self.output_path).with_suffix("")
+            if not self.snapshot.exists(self.source_path / rel.with_suffix(".ts")) \
+                    and not self.snapshot.exists(self.source_path / rel.with_suffix(".tsx")):
+                orphans.append(rel.as_posix() + ".js")
+        return orphans
@@ -0,0 +1,334 @@
+"""
+Callable Load Generation
+asyncio building blocks for driving Cloud Functions callables under load:
+a small keep-alive HTTP/1.1 client (no third-party dependencies), a
+CallableTarget speaking the callable protocol to the Functions emulator
+(or the local stand-in) and the Firestore emulator REST API, and a
+LoadReport that turns per-call samples into throughput, latency
+percentiles, transaction retries and aborts.
+"""
+
+import asyncio
+import base64
+import json
+import math
+import time
+from urllib.parse import urlsplit
+
+# Callable error statuses that mean the function's transaction gave up
+# (timesheet.ts rethrows exhausted transaction retries as "internal")
+ABORT_STATUSES = {"ABORTED", "INTERNAL"}
+
+# Response header the stand-in uses to report transaction attempts
+ATTEMPTS_HEADER = "x-transaction-attempts"
+
+
+class HttpError(Exception):
+    pass
+
+
+class HttpClient:
+    """Keep-alive HTTP/1.1 client over at most max_connections connections to one host"""
+
+    def __init__(self, base_url, max_connections=100, timeout=60):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def post_json(self, path, payload, headers=None):
+        """POST payload as JSON; returns (status code, response headers, parsed body or None)"""
+        body = json.dumps(payload).encode()
+        lines = [
+            f"POST {self.prefix}{path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+            "Content-Type: application/json", f"Content-Length: {len(body)}", "Connection: keep-alive",
+        ]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+
+        async with self._slots:
+            reused = bool(self._idle)
+            connection = self._idle.pop() if reused else await self._connect()
+            try:
+                response = await asyncio.wait_for(self._exchange(connection, request), self.timeout)
+            except asyncio.TimeoutError:
+                connection[1].close()
+                raise
+            except (OSError, asyncio.IncompleteReadError, HttpError):
+                connection[1].close()
+                if not reused:
+                    raise
+                # The server may have closed an idle connection; retry once on a fresh one
+                connection = await self._connect()
+                try:
+                    response = await asyncio.wait_for(self._exchange(connection, request), self.timeout)
+                except BaseException:
+                    connection[1].close()
+                    raise
+            status, response_headers, data = response
+            if response_headers.get("connection", "").lower() == "close":
+                connection[1].close()
+            else:
+                self._idle.append(connection)
+        try:
+            parsed = json.loads(data) if data else None
+        except ValueError:
+            parsed = None
+        return status, response_headers, parsed
+
+    async def _connect(self):
+        return await asyncio.open_connection(self.host, self.port)
+
+    async def _exchange(self, connection, request):
+        reader, writer = connection
+        writer.write(request)
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise HttpError("connection closed before response")
+        parts = status_line.decode("latin-1").split(" ", 2)
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise HttpError(f"malformed status line {status_line!r}")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            data = b"".join(chunks)
+        else:
+            data = await reader.readexactly(int(headers.get("content-length", 0)))
+        return int(parts[1]), headers, data
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+def emulator_id_token(uid, project):
+    """Unsigned ID token; the emulators accept it in place of a real Firebase Auth token"""
+    now = int(time.time())
+    header = {"alg": "none", "typ": "JWT"}
+    payload = {
+        "iss": f"https://securetoken.google.com/{project}", "aud": project, "sub": uid, "user_id": uid,
+        "iat": now, "exp": now + 3600, "auth_time": now,
+        "firebase": {"identities": {}, "sign_in_provider": "custom"},
+    }
+    return ".".join(_b64(part) for part in (header, payload)) + "."
+
+
+def token_uid(token):
+    """uid claim of an (unverified) ID token, or None"""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except (IndexError, ValueError):
+        return None
+    return claims.get("user_id") or claims.get("sub")
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode()).rstrip(b"=").decode()
+
+
+class CallResult:
+    __slots__ = ("name", "uid", "status", "latency", "attempts", "started")
+
+    def __init__(self, name, uid, status, latency, attempts, started):
+        self.name = name
+        self.uid = uid
+        self.status = status
+        self.latency = latency
+        self.attempts = attempts
+        self.started = started
+
+    @property
+    def ok(self):
+        return self.status == "OK"
+
+
+class CallableTarget:
+    """Callables served at {functions_url}/{project}/{region}/{name}, documents in the Firestore emulator"""
+
+    def __init__(self, functions_url, firestore_url, project, region="us-central1", max_connections=100,
+                 timeout=60):
+        self.project = project
+        self.region = region
+        self.functions = HttpClient(functions_url, max_connections, timeout)
+        self.firestore = HttpClient(firestore_url, max_connections, timeout)
+        self._tokens = {}
+
+    async def call(self, name, uid, data=None):
+        """Invoke a callable as uid; never raises, failures are reported in the result status"""
+        token = self._tokens.get(uid)
+        if token is None:
+            token = self._tokens[uid] = emulator_id_token(uid, self.project)
+        started = time.perf_counter()
+        attempts = None
+        try:
+            status_code, headers, body = await self.functions.post_json(
+                f"/{self.project}/{self.region}/{name}", {"data": data or {}},
+                {"Authorization": f"Bearer {token}"},
+            )
+            if ATTEMPTS_HEADER in headers:
+                attempts = int(headers[ATTEMPTS_HEADER])
+            if status_code == 200 and isinstance(body, dict) and "result" in body:
+                status = "OK"
+            elif isinstance(body, dict) and isinstance(body.get("error"), dict):
+                status = body["error"].get("status", f"HTTP_{status_code}")
+            else:
+                status = f"HTTP_{status_code}"
+        except asyncio.TimeoutError:
+            status = "TIMEOUT"
+        except (OSError, asyncio.IncompleteReadError, HttpError):
+            status = "CONNECTION_ERROR"
+        return CallResult(name, uid, status, time.perf_counter() - started, attempts, started)
+
+    async def commit(self, writes):
+        """Apply writes through the Firestore emulator's REST commit endpoint (bypassing rules)"""
+        path = f"/v1/projects/{self.project}/databases/(default)/documents:commit"
+        status, _, body = await self.firestore.post_json(path, {"writes": writes}, {"Authorization": "Bearer owner"})
+        if status != 200:
+            raise HttpError(f"commit failed with HTTP {status}: {body}")
+
+    def document_name(self, path):
+        return f"projects/{self.project}/databases/(default)/documents/{path}"
+
+    async def seed_users(self, uids, batch_size=500):
+        """Create clocked-out users/{uid} profiles"""
+        for start in range(0, len(uids), batch_size):
+            await self.commit([
+                {"update": {"name": self.document_name(f"users/{uid}"), "fields": to_fields({
+                    "role": "employee", "attendanceStatus": "clockedOut", "activeTimesheetId": None,
+                    "unreadNotifications": 0,
+                })}}
+                for uid in uids[start:start + batch_size]
+            ])
+
+    async def notify(self, uid):
+        """The user-doc half of sendNotification(): increment unreadNotifications"""
+        await self.commit([{
+            "transform": {
+                "document": self.document_name(f"users/{uid}"),
+                "fieldTransforms": [{"fieldPath": "unreadNotifications", "increment": {"integerValue": "1"}}],
+            },
+        }])
+
+    def close(self):
+        self.functions.close()
+        self.firestore.close()
+
+
+def to_fields(data):
+    """Firestore REST field map for a flat dict"""
+    return {key: to_value(value) for key, value in data.items()}
+
+
+def to_value(value):
+    if value is None:
+        return {"nullValue": None}
+    if isinstance(value, bool):
+        return {"booleanValue": value}
+    if isinstance(value, int):
+        return {"integerValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, dict):
+        return {"mapValue": {"fields": to_fields(value)}}
+    if isinstance(value, list):
+        return {"arrayValue": {"values": [to_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def from_value(value):
+    """Python value of a Firestore REST value"""
+    if "integerValue" in value:
+        return int(value["integerValue"])
+    if "mapValue" in value:
+        return {k: from_value(v) for k, v in value["mapValue"].get("fields", {}).items()}
+    if "arrayValue" in value:
+        return [from_value(v) for v in value["arrayValue"].get("values", [])]
+    for key in ("stringValue", "booleanValue", "doubleValue", "timestampValue"):
+        if key in value:
+            return value[key]
+    return None
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+class LoadReport:
+    def __init__(self):
+        self.results = []
+        self.notifications = 0
+        self.started = None
+        self.finished = None
+
+    def add(self, result):
+        self.results.append(result)
+
+    @property
+    def elapsed(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    def summary(self, name):
+        """Throughput, latency percentiles, retries and aborts of one callable"""
+        results = [r for r in self.results if r.name == name]
+        latencies = sorted(r.latency for r in results)
+        statuses = {}
+        for r in results:
+            statuses[r.status] = statuses.get(r.status, 0) + 1
+        attempts = [r.attempts for r in results if r.attempts is not None]
+        elapsed = self.elapsed or 1e-9
+        return {
+            "calls": len(results),
+            "ok": statuses.get("OK", 0),
+            "statuses": statuses,
+            "throughput": statuses.get("OK", 0) / elapsed,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else 0.0,
+            "retries": sum(a - 1 for a in attempts) if attempts else None,
+            "retried_calls": sum(1 for a in attempts if a > 1) if attempts else None,
+            "aborted": sum(count for status, count in statuses.items() if status in ABORT_STATUSES),
+        }
+
+    def format(self):
+        """Report lines for every callable exercised"""
+        lines = [f"{len(self.results)} calls in {self.elapsed:.2f}s, {self.notifications} notification writes"]
+        for name in sorted({r.name for r in self.results}):
+            s = self.summary(name)
+            retries = "n/a (not reported by target)" if s["retries"] is None else \
+                f"{s['retries']} ({s['retried_calls']} calls retried)"
+            errors = {k: v for k, v in s["statuses"].items() if k != "OK"}
+            lines += [
+                f"{name}: {s['ok']}/{s['calls']} ok, {s['throughput']:.1f} ok/s",
+                f"  latency p50 {s['p50'] * 1000:.1f} ms, p95 {s['p95'] * 1000:.1f} ms, "
+                f"p99 {s['p99'] * 1000:.1f} ms, max {s['max'] * 1000:.1f} ms",
+                f"  transaction retries: {retries}; aborted: {s['aborted']}",
+            ]
+            if errors:
+                lines.append(f"  errors: {errors}")
+        return lines
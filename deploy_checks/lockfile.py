@@ -0,0 +1,354 @@
+"""
+Lockfile Consistency
+Checks that package.json and package-lock.json (lockfileVersion 2/3)
+agree the way `npm ci` requires, without npm. The lockfile is read one
+"packages" entry at a time (each entry decoded on its own and reduced to
+the fields used here), so the full JSON tree is never built. Every range
+package.json declares must match the range recorded in the lockfile root
+and be satisfied by the version locked for it, and every locked package's
+own dependencies must resolve (node_modules lookup rules) to a satisfying
+version. The production dependency closure is exposed for other checks.
+"""
+
+import json
+import re
+
+DEPENDENCY_FIELDS = ("dependencies", "devDependencies", "optionalDependencies", "peerDependencies")
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"[ \t\n\r]*")
+
+
+class LockfileError(ValueError):
+    pass
+
+
+class LockedPackage:
+    def __init__(self, path, entry):
+        self.path = path
+        self.name = entry.get("name") or package_name(path)
+        self.version = entry.get("version")
+        self.resolved = entry.get("resolved")
+        self.link = bool(entry.get("link"))
+        self.dev = bool(entry.get("dev"))
+        self.optional = bool(entry.get("optional"))
+        self.dependencies = entry.get("dependencies") or {}
+        self.optional_dependencies = entry.get("optionalDependencies") or {}
+        self.peer_dependencies = entry.get("peerDependencies") or {}
+        self.peer_optional = {name for name, meta in (entry.get("peerDependenciesMeta") or {}).items()
+                              if meta.get("optional")}
+
+    def __repr__(self):
+        return f"LockedPackage({self.path}@{self.version})"
+
+
+def package_name(path):
+    """Package name of a lockfile path such as node_modules/a/node_modules/@scope/b"""
+    _, _, tail = path.rpartition("node_modules/")
+    return tail
+
+
+class Lockfile:
+    def __init__(self, version, root, packages):
+        self.version = version
+        # Declarations recorded for the project itself (the "" entry)
+        self.root = root
+        self.packages = packages
+
+    def resolve(self, from_path, name):
+        """LockedPackage that `require(name)` from from_path finds, following links (None if missing)"""
+        base = from_path
+        while True:
+            candidate = f"{base}/node_modules/{name}" if base else f"node_modules/{name}"
+            package = self.packages.get(candidate)
+            if package is not None:
+                if package.link and package.resolved in self.packages:
+                    return self.packages[package.resolved]
+                return package
+            if not base:
+                return None
+            index = base.rfind("node_modules/")
+            base = base[:index].rstrip("/") if index > 0 else ""
+
+    def production_closure(self):
+        """{path: LockedPackage} installed for production: root dependencies and everything they need"""
+        closure = {}
+        pending = [("", name) for name in list(self.root.get("dependencies", {}))
+                   + list(self.root.get("optionalDependencies", {}))
+                   + list(self.root.get("peerDependencies", {}))]
+        while pending:
+            from_path, name = pending.pop()
+            package = self.resolve(from_path, name)
+            if package is None or package.path in closure:
+                continue
+            closure[package.path] = package
+            for field in (package.dependencies, package.optional_dependencies, package.peer_dependencies):
+                pending.extend((package.path, dep) for dep in field)
+        return closure
+
+
+class _Cursor:
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+
+    def skip_ws(self):
+        self.pos = _whitespace.match(self.text, self.pos).end()
+
+    def expect(self, char):
+        self.skip_ws()
+        if self.text[self.pos:self.pos + 1] != char:
+            raise LockfileError(f"expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def peek(self):
+        self.skip_ws()
+        return self.text[self.pos:self.pos + 1]
+
+    def value(self):
+        self.skip_ws()
+        try:
+            value, self.pos = _decoder.raw_decode(self.text, self.pos)
+        except json.JSONDecodeError as e:
+            raise LockfileError(f"invalid JSON: {e}") from e
+        return value
+
+    def members(self):
+        """Yield the keys of the object at the cursor; the caller consumes each value before resuming"""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise LockfileError(f"expected an object key at offset {self.pos}")
+            self.expect(":")
+            yield key
+            following = self.peek()
+            self.pos += 1
+            if following == "}":
+                return
+            if following != ",":
+                raise LockfileError(f"expected ',' or '}}' at offset {self.pos - 1}")
+
+
+def read_lockfile(text):
+    """Lockfile of package-lock.json text, decoding one packages entry at a time"""
+    cursor = _Cursor(text)
+    version = None
+    root = {}
+    packages = {}
+    for key in cursor.members():
+        if key == "packages":
+            for path in cursor.members():
+                entry = cursor.value()
+                if not isinstance(entry, dict):
+                    raise LockfileError(f"packages[{path!r}] is not an object")
+                if path == "":
+                    root = {field: entry.get(field) or {} for field in DEPENDENCY_FIELDS}
+                else:
+                    packages[path] = LockedPackage(path, entry)
+        elif key == "lockfileVersion":
+            version = cursor.value()
+        else:
+            # name, requires, and the lockfileVersion 2 "dependencies" mirror of the tree
+            cursor.value()
+    if version is None:
+        raise LockfileError("lockfileVersion missing")
+    return Lockfile(version, root, packages)
+
+
+def load_lockfile(snapshot, rel_path):
+    """Lockfile at rel_path, parsed once per snapshot"""
+    return snapshot.parsed(rel_path, "lockfile", read_lockfile)
+
+
+_VERSION = re.compile(r"^v?(\d+)\.(\d+)\.(\d+)(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$")
+_PARTIAL = re.compile(r"^v?(\d+|[xX*])(?:\.(\d+|[xX*]))?(?:\.(\d+|[xX*]))?(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$")
+_COMPARATOR = re.compile(r"^(<=|>=|<|>|=|\^|~>|~)?(.*)$")
+_HYPHEN = re.compile(r"^(\S+)\s+-\s+(\S+)$")
+
+
+def _prerelease(text):
+    if not text:
+        return ()
+    return tuple((0, int(part)) if part.isdigit() else (1, part) for part in text.split("."))
+
+
+def parse_version(text):
+    """(major, minor, patch, prerelease) of a semver version, or None"""
+    match = _VERSION.match(text.strip()) if isinstance(text, str) else None
+    if match is None:
+        return None
+    return int(match.group(1)), int(match.group(2)), int(match.group(3)), _prerelease(match.group(4))
+
+
+def _key(version):
+    major, minor, patch, pre = version
+    return major, minor, patch, 0 if pre else 1, pre
+
+
+_FLOOR = ((0, 0),)  # "-0": below every prerelease of a version
+
+
+def _partial(text):
+    """([major, minor, patch] with None for wildcards/missing, prerelease) or None"""
+    match = _PARTIAL.match(text)
+    if match is None:
+        return None
+    parts = []
+    for group in match.groups()[:3]:
+        parts.append(None if group is None or group in "xX*" else int(group))
+    for i in range(1, 3):
+        if parts[i - 1] is None:
+            parts[i] = None
+    return parts, _prerelease(match.group(4))
+
+
+def _comparators(op, text):
+    """Primitive (op, version) comparators of one range token"""
+    if text in ("", "*", "x", "X"):
+        return []
+    parsed = _partial(text)
+    if parsed is None:
+        raise ValueError(text)
+    (major, minor, patch), pre = parsed
+    if major is None:
+        return [("<", (0, 0, 0, _FLOOR))] if op in ("<", ">") else []
+    if op in ("", "="):
+        if minor is None:
+            return [(">=", (major, 0, 0, ())), ("<", (major + 1, 0, 0, _FLOOR))]
+        if patch is None:
+            return [(">=", (major, minor, 0, ())), ("<", (major, minor + 1, 0, _FLOOR))]
+        return [("=", (major, minor, patch, pre))]
+    if op in ("~", "~>"):
+        low = (major, minor or 0, patch or 0, pre)
+        high = (major + 1, 0, 0, _FLOOR) if minor is None else (major, minor + 1, 0, _FLOOR)
+        return [(">=", low), ("<", high)]
+    if op == "^":
+        low = (major, minor or 0, patch or 0, pre)
+        if major > 0 or minor is None:
+            high = (major + 1, 0, 0, _FLOOR)
+        elif minor > 0 or patch is None:
+            high = (0, minor + 1, 0, _FLOOR)
+        else:
+            high = (0, 0, patch + 1, _FLOOR)
+        return [(">=", low), ("<", high)]
+    if op == ">":
+        if minor is None:
+            return [(">=", (major + 1, 0, 0, ()))]
+        if patch is None:
+            return [(">=", (major, minor + 1, 0, ()))]
+        return [(">", (major, minor, patch, pre))]
+    if op == ">=":
+        return [(">=", (major, minor or 0, patch or 0, pre))]
+    if op == "<":
+        return [("<", (major, minor or 0, patch or 0, pre if patch is not None else _FLOOR))]
+    # <=
+    if minor is None:
+        return [("<", (major + 1, 0, 0, _FLOOR))]
+    if patch is None:
+        return [("<", (major, minor + 1, 0, _FLOOR))]
+    return [("<=", (major, minor, patch, pre))]
+
+
+def parse_range(spec):
+    """Comparator sets ([[(op, version)]]) of an npm semver range; raises ValueError if it is not one"""
+    sets = []
+    for part in spec.split("||"):
+        part = part.strip()
+        hyphen = _HYPHEN.match(part)
+        if hyphen:
+            low, high = _partial(hyphen.group(1)), _partial(hyphen.group(2))
+            if low is None or high is None:
+                raise ValueError(spec)
+            sets.append(_comparators(">=", hyphen.group(1)) + _comparators("<=", hyphen.group(2)))
+            continue
+        part = re.sub(r"(<=|>=|<|>|=|\^|~>|~)\s+", r"\1", part)
+        comparators = []
+        for token in part.split():
+            op, text = _COMPARATOR.match(token).groups()
+            comparators += _comparators(op or "", text)
+        sets.append(comparators)
+    return sets
+
+
+def _holds(op, version, bound):
+    a, b = _key(version), _key(bound)
+    return {"=": a == b, "<": a < b, "<=": a <= b, ">": a > b, ">=": a >= b}[op]
+
+
+def satisfies(version, spec):
+    """Whether a locked version satisfies a semver range (None when spec is not a semver range)"""
+    parsed = parse_version(version)
+    try:
+        sets = parse_range(spec)
+    except ValueError:
+        return None
+    if parsed is None:
+        return False
+    for comparators in sets:
+        if not all(_holds(op, parsed, bound) for op, bound in comparators):
+            continue
+        # A prerelease only matches ranges that name a prerelease of the same major.minor.patch
+        if parsed[3] and not any(bound[3] and bound[3] != _FLOOR and bound[:3] == parsed[:3]
+                                 for _, bound in comparators):
+            continue
+        return True
+    return False
+
+
+def _check_spec(package, spec):
+    """Drift message when package does not satisfy spec (None when it does or spec is not a range)"""
+    if spec.startswith("npm:"):
+        alias, _, spec = spec[4:].rpartition("@")
+        if alias and package.name != alias:
+            return f"is locked as {package.name}, not {alias}"
+    if re.match(r"^(file|link|git|git\+\w+|github|gitlab|bitbucket|https?|workspace):", spec) or "/" in spec:
+        return None
+    ok = satisfies(package.version, spec)
+    if ok is False:
+        return f"{spec} is locked at {package.version}"
+    return None
+
+
+def lockfile_drift(manifest, lock):
+    """Messages for every way a package.json and its lockfile disagree (empty when in sync)"""
+    if not isinstance(lock.version, int) or lock.version < 2:
+        return [f"lockfileVersion {lock.version} is not supported; regenerate it with npm 7 or later"]
+    drift = []
+    for field in DEPENDENCY_FIELDS:
+        declared = manifest.get(field) or {}
+        recorded = lock.root.get(field, {})
+        for name, spec in declared.items():
+            if recorded.get(name) != spec:
+                drift.append(f"{name}: package.json {field} has {spec}, lockfile has {recorded.get(name) or 'nothing'}")
+                continue
+            package = lock.resolve("", name)
+            if package is None:
+                if field in ("dependencies", "devDependencies"):
+                    drift.append(f"{name}: declared in {field} but not locked")
+                continue
+            problem = _check_spec(package, spec)
+            if problem:
+                drift.append(f"{name}: {problem}")
+        for name in recorded:
+            if name not in declared:
+                drift.append(f"{name}: locked in {field} but no longer in package.json")
+
+    for path, package in lock.packages.items():
+        for field, required in ((package.dependencies, True), (package.optional_dependencies, False),
+                                (package.peer_dependencies, None)):
+            for name, spec in field.items():
+                target = lock.resolve(path, name)
+                if target is None:
+                    if required and not package.optional:
+                        drift.append(f"{path} needs {name}@{spec}, which is not locked")
+                    continue
+                if required is None and name in package.peer_optional:
+                    continue
+                problem = _check_spec(target, spec)
+                if problem:
+                    drift.append(f"{path} needs {name}@{spec}: {problem.removeprefix(spec + ' ')}")
+    return drift
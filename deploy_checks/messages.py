@@ -0,0 +1,362 @@
+"""
+Message Catalogs
+Parity, usage and per-route payload of the next-intl message catalogs in
+messages/<locale>.json. Each catalog is flattened into {dotted key:
+message}. Every locale must have exactly the keys of the reference locale,
+with the same {placeholders} in each message. The t('...') calls of every
+useTranslations/getTranslations binding in src/** are resolved to catalog
+keys; a key built at runtime counts as using every key under its static
+prefix. That gives the keys nothing uses and the keys used but missing.
+For each route it also gives the messages its client components need
+against what the NextIntlClientProvider above it serializes into the page.
+"""
+
+import json
+import re
+from functools import partial
+
+from .ts_source import call_args, string_value, tokenize_ts
+
+CATALOG_DIR = "messages"
+
+# Locale whose catalog defines the keys every other locale must have
+REFERENCE_LOCALE = "en"
+
+TRANSLATOR_FACTORIES = ("useTranslations", "getTranslations")
+
+# t.rich('key'), t.markup('key'), ... take the key like t('key')
+TRANSLATOR_METHODS = ("rich", "markup", "raw", "has")
+
+# Start of an ICU argument: {name or {name, type
+_ARGUMENT_RE = re.compile(r"\s*([A-Za-z_]\w*|\d+)\s*(?:,\s*(\w+)\s*)?")
+
+# Argument types whose options are sub-messages: {gender, select, male {He} other {They}}
+BRANCHING_TYPES = ("plural", "select", "selectordinal")
+
+
+class CatalogError(ValueError):
+    pass
+
+
+def flatten_messages(data, prefix=""):
+    """{dotted key: message} of a nested catalog"""
+    flat = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            flat.update(flatten_messages(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def placeholders(message):
+    """Argument names of an ICU message: 'Hello, {name}!' -> {'name'}; branch text is not an argument"""
+    names = set()
+    i = 0
+    while isinstance(message, str) and i < len(message):
+        # A stray '}' ends nothing at the top level
+        i = _message(message, i, names) + 1
+    return names
+
+
+def _message(text, i, names):
+    """Collect the argument names of message text starting at i; index of the '}' ending it"""
+    while i < len(text):
+        char = text[i]
+        if char == "'":
+            i = _quoted(text, i)
+        elif char == "{":
+            i = _argument(text, i + 1, names)
+        elif char == "}":
+            return i
+        else:
+            i += 1
+    return i
+
+
+def _quoted(text, i):
+    """Index after an apostrophe: '' is a literal one, and '{...' quotes up to the next apostrophe"""
+    if text.startswith("''", i):
+        return i + 2
+    if i + 1 < len(text) and text[i + 1] in "{}#|":
+        end = text.find("'", i + 1)
+        return len(text) if end < 0 else end + 1
+    return i + 1
+
+
+def _argument(text, i, names):
+    """Parse {name[, type[, style or options]]} from just after its '{'; index after its '}'"""
+    m = _ARGUMENT_RE.match(text, i)
+    if m is None:
+        return _skip_braces(text, i)
+    names.add(m.group(1))
+    i = m.end()
+    if i >= len(text) or text[i] != ",":
+        return _skip_braces(text, i)
+    if m.group(2) not in BRANCHING_TYPES:
+        # number/date/time style, e.g. {amount, number, ::currency/EUR}
+        return _skip_braces(text, i)
+    i += 1
+    # Options: selectors (other, =0, offset:1) each followed by a {sub-message}
+    while i < len(text):
+        if text[i] == "}":
+            return i + 1
+        if text[i] == "{":
+            i = _message(text, i + 1, names) + 1
+        else:
+            i += 1
+    return i
+
+
+def _skip_braces(text, i):
+    """Index after the '}' closing the brace opened before i"""
+    depth = 1
+    while i < len(text):
+        depth += {"{": 1, "}": -1}.get(text[i], 0)
+        i += 1
+        if depth == 0:
+            break
+    return i
+
+
+def load_catalogs(snapshot, directory=CATALOG_DIR):
+    """{locale: flattened catalog} of every <locale>.json under directory"""
+    catalogs = {}
+    for path in snapshot.glob(f"{directory}/*.json"):
+        rel = path.relative_to(snapshot.project_path).as_posix()
+        try:
+            data = snapshot.json(path)
+        except ValueError as e:
+            raise CatalogError(f"{rel} is not valid JSON: {e}") from e
+        if not isinstance(data, dict):
+            raise CatalogError(f"{rel} must contain a JSON object")
+        catalogs[path.stem] = flatten_messages(data)
+    return catalogs
+
+
+class ParityGap:
+    def __init__(self, locale, key, kind, detail=""):
+        self.locale = locale
+        self.key = key
+        # missing (in locale), extra (only in locale) or placeholders (different arguments)
+        self.kind = kind
+        self.detail = detail
+
+    def __str__(self):
+        if self.kind == "missing":
+            return f"{self.locale}.json is missing {self.key}"
+        if self.kind == "extra":
+            return f"{self.locale}.json has {self.key}, which {REFERENCE_LOCALE}.json does not"
+        return f"{self.locale}.json {self.key} has different placeholders: {self.detail}"
+
+
+def catalog_parity(catalogs, reference=REFERENCE_LOCALE):
+    """ParityGap of every locale against the reference catalog"""
+    base = catalogs[reference]
+    gaps = []
+    for locale, catalog in sorted(catalogs.items()):
+        if locale == reference:
+            continue
+        for key, message in base.items():
+            if key not in catalog:
+                gaps.append(ParityGap(locale, key, "missing"))
+            elif placeholders(message) != placeholders(catalog[key]):
+                expected, found = sorted(placeholders(message)), sorted(placeholders(catalog[key]))
+                gaps.append(ParityGap(locale, key, "placeholders", f"{found} instead of {expected}"))
+        gaps.extend(ParityGap(locale, key, "extra") for key in catalog if key not in base)
+    return gaps
+
+
+class MessageUsage:
+    """A translation call; key is the full key, or its static prefix when dynamic"""
+
+    def __init__(self, source, line, key, dynamic=False):
+        self.source = source
+        self.line = line
+        self.key = key
+        self.dynamic = dynamic
+
+    @property
+    def location(self):
+        return f"{self.source}:{self.line}"
+
+    def covers(self, key):
+        if self.dynamic:
+            return key.startswith(self.key)
+        return key == self.key or key.startswith(self.key + ".")
+
+    def __repr__(self):
+        return f"MessageUsage({self.key}{'*' if self.dynamic else ''} @ {self.location})"
+
+
+def message_usages(source, text):
+    """MessageUsage of every call on a translator bound from useTranslations/getTranslations"""
+    tokens = tokenize_ts(text)
+    count = len(tokens)
+    # (token index, variable, key prefix or None when the namespace is not a literal)
+    bindings = []
+    for i, tok in enumerate(tokens):
+        if tok.value not in TRANSLATOR_FACTORIES or i + 1 >= count or tokens[i + 1].value != "(":
+            continue
+        j = i - 1
+        if j >= 0 and tokens[j].value == "await":
+            j -= 1
+        if j < 1 or tokens[j].value != "=" or tokens[j - 1].kind != "ident":
+            continue
+        args, _ = call_args(tokens, i + 1)
+        bindings.append((i, tokens[j - 1].value, _namespace_prefix(args)))
+    if not bindings:
+        return []
+
+    usages = []
+    names = {name for _, name, _ in bindings}
+    for i, tok in enumerate(tokens):
+        if tok.value not in names or tok.kind != "ident" or (i and tokens[i - 1].value in (".", "?.")):
+            continue
+        open_index = i + 1
+        if i + 3 < count and tokens[i + 1].value == "." and tokens[i + 2].value in TRANSLATOR_METHODS:
+            open_index = i + 3
+        if open_index >= count or tokens[open_index].value != "(":
+            continue
+        binding = next((b for b in reversed(bindings) if b[1] == tok.value and b[0] < i), None)
+        if binding is None:
+            continue
+        prefix = binding[2]
+        args, _ = call_args(tokens, open_index)
+        arg = args[0] if args else []
+        if prefix is None:
+            usages.append(MessageUsage(source, tok.line, "", dynamic=True))
+        elif len(arg) == 1 and string_value(arg[0]) is not None:
+            usages.append(MessageUsage(source, tok.line, prefix + string_value(arg[0])))
+        elif len(arg) == 1 and arg[0].kind == "template":
+            static = arg[0].value[1:].split("${", 1)[0]
+            usages.append(MessageUsage(source, tok.line, prefix + static, dynamic=True))
+        else:
+            usages.append(MessageUsage(source, tok.line, prefix, dynamic=True))
+    return usages
+
+
+def _namespace_prefix(args):
+    """'Header.' for useTranslations('Header') or getTranslations({namespace: 'Header'}); '' for the root"""
+    if not args:
+        return ""
+    arg = args[0]
+    if len(arg) == 1 and string_value(arg[0]) is not None:
+        return string_value(arg[0]) + "."
+    for i in range(len(arg) - 2):
+        if arg[i].value == "namespace" and arg[i + 1].value == ":":
+            value = string_value(arg[i + 2])
+            return value + "." if value is not None else None
+    if arg and arg[0].value == "{":
+        # getTranslations({locale}) without a namespace
+        return ""
+    return None
+
+
+def unused_keys(catalog, usages):
+    """Catalog keys no usage can reach"""
+    return [key for key in catalog if not any(usage.covers(key) for usage in usages)]
+
+
+def missing_keys(catalog, usages):
+    """Static usages whose key is neither a message nor a namespace of the catalog"""
+    return [
+        usage for usage in usages
+        if not usage.dynamic and not any(usage.covers(key) for key in catalog)
+    ]
+
+
+def payload_bytes(catalog, keys):
+    """Bytes of the nested JSON holding just keys, as a provider serializes it"""
+    tree = {}
+    for key in keys:
+        node = tree
+        parts = key.split(".")
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = catalog[key]
+    return len(json.dumps(tree, ensure_ascii=False, separators=(",", ":")).encode()) if tree else 0
+
+
+def provider_messages(text):
+    """(whether a NextIntlClientProvider is rendered, namespaces it is given or None for the whole catalog)"""
+    tokens = tokenize_ts(text)
+    for i, tok in enumerate(tokens[:-1]):
+        if tok.value != "NextIntlClientProvider" or i == 0 or tokens[i - 1].value != "<":
+            continue
+        j = i + 1
+        while j + 2 < len(tokens) and tokens[j].value not in (">", "/"):
+            if tokens[j].value == "messages" and tokens[j + 1].value == "=" and tokens[j + 2].value == "{":
+                end = j + 3
+                while end < len(tokens) and tokens[end].depth > tokens[j + 2].depth:
+                    end += 1
+                expression = tokens[j + 3:end]
+                if any(t.value == "pick" for t in expression):
+                    return True, [string_value(t) for t in expression if string_value(t) is not None]
+                return True, None
+            j += 1
+        # Without a messages prop the client components get none
+        return True, []
+    return False, []
+
+
+class RoutePayload:
+    """Messages one route's client components use, and what its provider ships"""
+
+    def __init__(self, route, usages, provider, namespaces):
+        self.route = route
+        self.usages = usages
+        # Project path of the nearest layout rendering a NextIntlClientProvider, or None
+        self.provider = provider
+        # Namespaces the provider passes; None for the whole catalog
+        self.namespaces = namespaces
+
+    def needed(self, catalog):
+        return [key for key in catalog if any(usage.covers(key) for usage in self.usages)]
+
+    def shipped(self, catalog):
+        if self.provider is None:
+            return []
+        if self.namespaces is None:
+            return list(catalog)
+        return [key for key in catalog if key.split(".", 1)[0] in self.namespaces]
+
+
+def route_payloads(graph, snapshot):
+    """RoutePayload of every page whose client code translates or that is wrapped by a provider"""
+    payloads = []
+    for page in graph.pages():
+        bundle = graph.bundle(page, packages=False)
+        usages = []
+        for path in sorted(bundle.local):
+            source = path.relative_to(snapshot.project_path).as_posix()
+            usages.extend(snapshot.parsed(path, "message-usages", partial(message_usages, source)))
+        provider, namespaces = None, []
+        for path in graph.boundaries(page):
+            found, passed = snapshot.parsed(path, "intl-provider", provider_messages)
+            if found:
+                provider, namespaces = path.relative_to(snapshot.project_path).as_posix(), passed
+        if usages or provider is not None:
+            payloads.append(RoutePayload(graph.route(page), usages, provider, namespaces))
+    return payloads
+
+
+def format_payload_table(payloads, catalogs):
+    """Per route: message bytes needed by its client components and shipped by its provider, per locale"""
+    locales = sorted(catalogs, key=lambda locale: (locale != REFERENCE_LOCALE, locale))
+    header = ("Route",) + tuple(f"{locale} need/ship" for locale in locales) + ("Provider",)
+    rows = []
+    for payload in sorted(payloads, key=lambda p: p.route):
+        cells = [payload.route]
+        for locale in locales:
+            catalog = catalogs[locale]
+            shipped = f"{payload_bytes(catalog, payload.shipped(catalog))} B" if payload.provider else "-"
+            cells.append(f"{payload_bytes(catalog, payload.needed(catalog))} B / {shipped}")
+        cells.append(payload.provider or "none")
+        rows.append(tuple(cells))
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+    return [
+        "  ".join(f"{value:<{widths[i]}}" if i in (0, len(header) - 1) else f"{value:>{widths[i]}}"
+                  for i, value in enumerate(row)).rstrip()
+        for row in [header] + rows
+    ]
@@ -0,0 +1,146 @@
+"""
+Unbounded Query Analysis
+Flags Firestore reads that load a whole result set into memory: queries
+executed with get() that have no limit(), no cursor and are not consumed
+with stream(). Each one is sized with the expected collection cardinality
+and filter selectivity from deploy-checks.json, giving an estimate of the
+documents returned, the heap they occupy in the function instance and the
+time spent reading them, rolled up per exported function. Reads made in
+a helper are charged to every exported function whose calls reach it.
+"""
+
+from .queries import EQUALITY_OPS
+
+# Deserialized documents take several times their stored size on the JS heap
+HEAP_FACTOR = 3
+
+# Values assumed in an `in` / `array-contains-any` filter (Firestore allows up to 30)
+IN_FANOUT = 10
+
+# (share of function memory, seconds) at which a read becomes a medium / high risk
+MEDIUM_RISK = (0.10, 1.0)
+HIGH_RISK = (0.50, 10.0)
+
+RISK_ORDER = {"high": 0, "medium": 1, "low": 2, "unknown": 3}
+
+
+def is_unbounded(query):
+    """Whether an executed query materializes its full result set"""
+    return query.limit is None and not query.cursors and query.terminal in ("get", "onSnapshot")
+
+
+def cardinality_class(documents):
+    if documents < 1_000:
+        return "small"
+    if documents < 100_000:
+        return "medium"
+    return "large"
+
+
+class ReadRisk:
+    def __init__(self, query, documents=None, rows=None, memory_bytes=None, seconds=None, level="unknown"):
+        self.query = query
+        self.documents = documents
+        self.rows = rows
+        self.memory_bytes = memory_bytes
+        self.seconds = seconds
+        self.level = level
+        # Exported functions whose calls reach the read (the function itself when it is exported)
+        self.callers = []
+
+    @property
+    def function(self):
+        return self.query.function or "(module scope)"
+
+    @property
+    def callables(self):
+        return self.callers or [self.function]
+
+    @property
+    def label(self):
+        if not self.callers or self.callers == [self.function]:
+            return self.function
+        return f"{', '.join(self.callers)} (via {self.function})"
+
+    def __repr__(self):
+        return f"ReadRisk({self.query.describe()} @ {self.query.location}: {self.level})"
+
+
+def estimate_rows(query, collection):
+    """Expected documents returned, narrowed by the most selective equality filter"""
+    rows = collection.get("documents", 0)
+    per_value = collection.get("per_value", {})
+    for field, op in query.filters:
+        if op in EQUALITY_OPS and field in per_value:
+            matches = per_value[field] * (IN_FANOUT if op in ("in", "array-contains-any") else 1)
+            rows = min(rows, matches)
+    return rows
+
+
+def assess(queries, config):
+    """ReadRisk for every unbounded query, worst first"""
+    memory_limit = config["function_memory_mb"] * 2 ** 20
+    throughput = config["read_docs_per_second"]
+    risks = []
+    for query in queries:
+        if not is_unbounded(query):
+            continue
+        collection = config["collections"].get(query.collection)
+        if collection is None:
+            risks.append(ReadRisk(query))
+            continue
+        rows = estimate_rows(query, collection)
+        memory = rows * collection.get("document_kb", 1) * 1024 * HEAP_FACTOR
+        seconds = rows / throughput
+        if memory >= HIGH_RISK[0] * memory_limit or seconds >= HIGH_RISK[1]:
+            level = "high"
+        elif memory >= MEDIUM_RISK[0] * memory_limit or seconds >= MEDIUM_RISK[1]:
+            level = "medium"
+        else:
+            level = "low"
+        risks.append(ReadRisk(query, collection.get("documents", 0), rows, memory, seconds, level))
+    risks.sort(key=lambda r: (RISK_ORDER[r.level], -(r.memory_bytes or 0), r.query.location))
+    return risks
+
+
+def fold_helpers(risks, callers):
+    """Attribute each read to the exported functions reaching it, from {(source, name): exported names}"""
+    for risk in risks:
+        risk.callers = sorted(set(callers.get((risk.query.source, risk.query.function), [])))
+    return risks
+
+
+def by_function(risks):
+    """{exported function: (worst level, summed heap bytes, summed seconds, risks)}"""
+    grouped = {}
+    for risk in risks:
+        for function in risk.callables:
+            grouped.setdefault(function, []).append(risk)
+    result = {}
+    for function, items in grouped.items():
+        level = min((r.level for r in items), key=RISK_ORDER.get)
+        memory = sum(r.memory_bytes or 0 for r in items)
+        seconds = sum(r.seconds or 0 for r in items)
+        result[function] = (level, memory, seconds, items)
+    return result
+
+
+def format_risk_table(risks):
+    """Render risks as an aligned text table"""
+    rows = []
+    for risk in risks:
+        if risk.rows is None:
+            size, rows_text, memory, seconds = "?", "?", "?", "?"
+        else:
+            size = f"{cardinality_class(risk.documents)} ({risk.documents:,})"
+            rows_text = f"{risk.rows:,.0f}"
+            memory = f"{risk.memory_bytes / 2 ** 20:.1f}"
+            seconds = f"{risk.seconds:.2f}"
+        rows.append((risk.label, risk.query.describe(), size, rows_text, memory, seconds, risk.level))
+    header = ("Function", "Query", "Collection", "Docs", "Heap MB", "Seconds", "Risk")
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+    return [
+        "  ".join(f"{value:>{widths[i]}}" if i in (3, 4, 5) else f"{value:<{widths[i]}}" for i, value in enumerate(row))
+        .rstrip()
+        for row in [header] + rows
+    ]
@@ -0,0 +1,363 @@
+"""
+Firestore Cost Projection
+Daily Firestore reads, writes and rules get() calls, their price and a p95
+latency estimate, per exported function and per collection. Three inputs:
+the reads and writes one call of each function performs (the write
+analysis, with loops and helpers folded in), the documents each rules
+operation get()s (the rules read cost analysis), and a YAML traffic profile
+with calls per day per function, client requests per day per collection
+and collection sizes. The static analysis is compiled once into per-call
+cost vectors; a scenario that changes traffic or moves role lookups into
+custom claims only re-weights them, and one that resizes collections
+re-sizes loops and queries through the memoized write analysis.
+"""
+
+import math
+
+from .config import ConfigError
+from .rules_cost import analyze_rules
+from .rules_diff import rule_path
+from .writes import WriteIndex
+
+try:
+    import yaml
+except ImportError:  # only needed to read the traffic profile
+    yaml = None
+
+PROFILE_FILE = "firestore-traffic.yaml"
+
+PROFILE_DEFAULTS = {
+    # US$ per 100,000 billed operations; deletes are billed as writes here
+    "pricing": {"reads_per_100k": 0.06, "writes_per_100k": 0.18},
+    # p95 of one Firestore round trip from a function, and the commit cost of each write in it
+    "latency": {"round_trip_p95_ms": 60, "write_ms": 1},
+    # Documents a client list request returns when the profile does not say
+    "client_list_docs": 20,
+}
+
+CLIENT_OPERATIONS = ("get", "list", "create", "update", "delete")
+
+# Rules allow methods consulted for a client operation, most specific first
+_RULE_METHODS = {
+    "get": ("get", "read"),
+    "list": ("list", "read"),
+    "create": ("create", "write"),
+    "update": ("update", "write"),
+    "delete": ("delete", "write"),
+}
+
+
+class ProfileError(ValueError):
+    pass
+
+
+def load_profile(snapshot, rel_path=PROFILE_FILE):
+    """The traffic profile merged over PROFILE_DEFAULTS"""
+    if yaml is None:
+        raise ProfileError("reading the traffic profile needs PyYAML (pip install pyyaml)")
+    if not snapshot.exists(rel_path):
+        raise ProfileError(f"{rel_path} not found")
+    try:
+        data = snapshot.parsed(rel_path, "yaml", yaml.safe_load) or {}
+    except yaml.YAMLError as e:
+        raise ProfileError(f"{rel_path} is not valid YAML: {e}") from e
+    if not isinstance(data, dict):
+        raise ProfileError(f"{rel_path} must contain a mapping")
+    profile = {key: dict(value) if isinstance(value, dict) else value for key, value in PROFILE_DEFAULTS.items()}
+    for key, value in data.items():
+        if isinstance(profile.get(key), dict) and isinstance(value, dict):
+            profile[key].update(value)
+        else:
+            profile[key] = value
+    for key in ("calls_per_day", "client_requests_per_day", "collections", "scenarios"):
+        if not isinstance(profile.setdefault(key, {}) or {}, dict):
+            raise ProfileError(f"{rel_path}: {key} must be a mapping")
+        profile[key] = profile[key] or {}
+    return profile
+
+
+class CallCost:
+    """Firestore work of one invocation; exact is False when a loop or query has no known size"""
+
+    def __init__(self, name):
+        self.name = name
+        self.reads = {}
+        self.writes = {}
+        self.round_trips = 0
+        self.docs_read = 0
+        self.exact = True
+
+    @property
+    def total_reads(self):
+        return sum(self.reads.values())
+
+    @property
+    def total_writes(self):
+        return sum(self.writes.values())
+
+    def p95_ms(self, latency, read_docs_per_second):
+        """Round trips at their p95, plus streaming the documents read and committing the writes"""
+        return (self.round_trips * latency["round_trip_p95_ms"]
+                + 1000 * self.docs_read / read_docs_per_second
+                + self.total_writes * latency["write_ms"])
+
+
+def call_cost(name, reads, writes):
+    """CallCost from the ReadSites and WriteSites of one exported function"""
+    cost = CallCost(name)
+    for site in reads:
+        if site.multiplier is None or site.docs is None:
+            cost.exact = False
+        runs = site.multiplier or 1
+        # A query is billed at least one read even when it matches nothing
+        billed = max(site.docs or 1, 1)
+        collection = site.collection or "?"
+        cost.reads[collection] = cost.reads.get(collection, 0) + runs * billed
+        cost.docs_read += runs * (site.docs or 1)
+        cost.round_trips += runs
+    commits = {}
+    for site in writes:
+        if site.multiplier is None:
+            cost.exact = False
+        runs = site.multiplier or 1
+        collection = site.collection or "?"
+        cost.writes[collection] = cost.writes.get(collection, 0) + runs
+        if site.scope is None:
+            cost.round_trips += runs
+        else:
+            per_commit = site.per_commit or runs
+            commits[site.scope] = max(commits.get(site.scope, 0), math.ceil(runs / per_commit))
+    cost.round_trips += sum(commits.values())
+    return cost
+
+
+def rules_gets(rules):
+    """{(collection, client operation): {collection read by get(): [fields used, per document]}} per request"""
+    root = "cloud.firestore"
+    by_method = {}
+    for cost in analyze_rules(rules):
+        segments = rule_path(cost.path, root).strip("/").split("/")
+        if len(segments) != 2 or segments[0].startswith("{"):
+            continue
+        # Firestore bills each distinct document a request's rules read once
+        reads = {}
+        for path in sorted(set(cost.reads)):
+            reads.setdefault(_read_collection(path), []).append(frozenset(cost.fields.get(path, {None})))
+        by_method[(segments[0], cost.operation)] = reads
+    gets = {}
+    for collection in {key[0] for key in by_method}:
+        for operation, methods in _RULE_METHODS.items():
+            for method in methods:
+                if (collection, method) in by_method:
+                    gets[(collection, operation)] = by_method[(collection, method)]
+                    break
+    return gets
+
+
+def _read_collection(path):
+    segments = path.strip("/").split("/")
+    if "documents" in segments:
+        segments = segments[segments.index("documents") + 1:]
+    return segments[0] if segments and not segments[0].startswith("$(") else "?"
+
+
+class Scenario:
+    """Multipliers over the baseline profile: calls, client requests, collection sizes, claims"""
+
+    def __init__(self, name, calls=None, client_requests=None, collections=None, claims=None):
+        self.name = name
+        self.calls = calls or {}
+        self.client_requests = client_requests or {}
+        self.collections = collections or {}
+        self.claims = set(claims or [])
+
+    @classmethod
+    def from_profile(cls, name, data):
+        if not isinstance(data, dict):
+            raise ProfileError(f"scenario {name!r} must be a mapping")
+        return cls(name, data.get("calls"), data.get("client_requests"), data.get("collections"), data.get("claims"))
+
+    def claimed(self, collection, fields):
+        """Whether every field the rules use from a document is in a claim ('users.role', or 'users' for all)"""
+        if collection in self.claims:
+            return True
+        return all(field is not None and f"{collection}.{field}" in self.claims for field in fields)
+
+    def factor(self, table, key):
+        return table.get(key, table.get("*", 1))
+
+    def sizes(self, collections):
+        """Collection sizing with this scenario's growth applied"""
+        sized = {}
+        for name, sizing in collections.items():
+            growth = self.factor(self.collections, name)
+            sizing = dict(sizing)
+            per_value = dict(sizing.get("per_value", {}))
+            if isinstance(growth, dict):
+                for field, factor in growth.get("per_value", {}).items():
+                    if field in per_value:
+                        per_value[field] *= factor
+                growth = growth.get("documents", 1)
+            sizing["documents"] = sizing.get("documents", 0) * growth
+            sizing["per_value"] = per_value
+            sized[name] = sizing
+        return sized
+
+
+class Projection:
+    def __init__(self, scenario, functions, collections, exact):
+        self.scenario = scenario
+        # name -> (calls/day, CallCost, p95 ms)
+        self.functions = functions
+        # collection -> {"reads", "writes", "rules_gets"} per day
+        self.collections = collections
+        self.exact = exact
+
+    def totals(self):
+        reads = sum(c["reads"] for c in self.collections.values())
+        gets = sum(c["rules_gets"] for c in self.collections.values())
+        writes = sum(c["writes"] for c in self.collections.values())
+        return reads, gets, writes
+
+    def price(self, pricing):
+        reads, gets, writes = self.totals()
+        return (reads + gets) / 1e5 * pricing["reads_per_100k"] + writes / 1e5 * pricing["writes_per_100k"]
+
+
+class CostModel:
+    """Per-call cost vectors of every exported function and the rules get() table, compiled once per sizing"""
+
+    def __init__(self, snapshot, config, profile, rules=None, source_dir="functions/src"):
+        self.snapshot = snapshot
+        self.profile = profile
+        self.source_dir = source_dir
+        self.config = dict(config)
+        collections = {name: dict(sizing) for name, sizing in config.get("collections", {}).items()}
+        for name, sizing in profile["collections"].items():
+            if not isinstance(sizing, dict):
+                raise ConfigError(f"traffic profile: collection {name!r} must be a mapping")
+            collections.setdefault(name, {}).update(sizing)
+        self.config["collections"] = collections
+        self.rules_gets = rules_gets(rules) if rules is not None else {}
+        self._costs = {}
+
+    def costs(self, collections):
+        """{function: CallCost} under a collection sizing"""
+        key = repr(sorted((name, sorted(sizing.items())) for name, sizing in collections.items()))
+        if key not in self._costs:
+            config = dict(self.config, collections=collections)
+            index = WriteIndex(self.snapshot, config, self.source_dir)
+            self._costs[key] = {
+                name: call_cost(name, index.reads(path, name), index.profile(path, name).sites)
+                for path, name in index.exported()
+            }
+        return self._costs[key]
+
+    def unknown_functions(self):
+        """Functions with traffic in the profile that the analysis does not know"""
+        known = self.costs(self.config["collections"])
+        return sorted(name for name in self.profile["calls_per_day"] if name not in known)
+
+    def project(self, scenario):
+        collections = scenario.sizes(self.config["collections"])
+        costs = self.costs(collections)
+        latency = self.profile["latency"]
+        throughput = self.config["read_docs_per_second"]
+        daily = {}
+        functions = {}
+        exact = True
+
+        def add(collection, key, amount):
+            daily.setdefault(collection, {"reads": 0, "writes": 0, "rules_gets": 0})[key] += amount
+
+        for name, calls in self.profile["calls_per_day"].items():
+            cost = costs.get(name)
+            if cost is None:
+                continue
+            calls = calls * scenario.factor(scenario.calls, name)
+            functions[name] = (calls, cost, cost.p95_ms(latency, throughput))
+            exact = exact and cost.exact
+            for collection, reads in cost.reads.items():
+                add(collection, "reads", calls * reads)
+            for collection, writes in cost.writes.items():
+                add(collection, "writes", calls * writes)
+
+        for collection, requests in self.profile["client_requests_per_day"].items():
+            requests = dict(requests or {})
+            list_docs = requests.pop("list_docs", self.profile["client_list_docs"])
+            growth = scenario.factor(scenario.client_requests, collection)
+            for operation, count in requests.items():
+                if operation not in CLIENT_OPERATIONS:
+                    raise ProfileError(f"client_requests_per_day.{collection}: unknown operation {operation!r}")
+                count *= growth
+                if operation in ("get", "list"):
+                    add(collection, "reads", count * (list_docs if operation == "list" else 1))
+                else:
+                    add(collection, "writes", count)
+                for read_collection, documents in self.rules_gets.get((collection, operation), {}).items():
+                    # A field kept in a custom claim is read from the token instead of get()
+                    gets = sum(1 for fields in documents if not scenario.claimed(read_collection, fields))
+                    add(read_collection, "rules_gets", count * gets)
+        return Projection(scenario, functions, daily, exact)
+
+    def scenarios(self, names=None):
+        """The baseline plus the profile's scenarios (only the named ones when given)"""
+        result = [Scenario("baseline")]
+        for name, data in self.profile["scenarios"].items():
+            if names is None or name in names:
+                result.append(Scenario.from_profile(name, data))
+        return result
+
+
+def _number(value):
+    return f"{value:,.0f}"
+
+
+def format_function_table(projection, pricing):
+    """Calls, per-call and daily reads/writes, cost and p95 latency of each function with traffic"""
+    rows = []
+    for name, (calls, cost, p95) in sorted(projection.functions.items(),
+                                           key=lambda item: -(item[1][0] * item[1][1].total_reads)):
+        mark = "" if cost.exact else ">="
+        dollars = calls * (cost.total_reads / 1e5 * pricing["reads_per_100k"]
+                           + cost.total_writes / 1e5 * pricing["writes_per_100k"])
+        rows.append((name, _number(calls), mark + _number(cost.total_reads), mark + _number(cost.total_writes),
+                     mark + _number(calls * cost.total_reads), mark + _number(calls * cost.total_writes),
+                     f"{dollars:,.2f}", _number(p95)))
+    header = ("Function", "Calls/day", "Reads/call", "Writes/call", "Reads/day", "Writes/day", "$/day", "p95 ms")
+    return _table(header, rows)
+
+
+def format_collection_table(projection, pricing):
+    """Daily reads, rules get()s and writes per collection"""
+    rows = []
+    for name, daily in sorted(projection.collections.items(), key=lambda item: -sum(item[1].values())):
+        dollars = ((daily["reads"] + daily["rules_gets"]) / 1e5 * pricing["reads_per_100k"]
+                   + daily["writes"] / 1e5 * pricing["writes_per_100k"])
+        rows.append((name, _number(daily["reads"]), _number(daily["rules_gets"]), _number(daily["writes"]),
+                     f"{dollars:,.2f}"))
+    header = ("Collection", "Reads/day", "Rules get()/day", "Writes/day", "$/day")
+    return _table(header, rows)
+
+
+def format_scenario_table(projections, pricing):
+    """Totals per scenario and their change against the first (the baseline)"""
+    base = projections[0].price(pricing) if projections else 0
+    rows = []
+    for projection in projections:
+        reads, gets, writes = projection.totals()
+        price = projection.price(pricing)
+        change = f"{100 * (price - base) / base:+.0f}%" if base else "-"
+        mark = "" if projection.exact else ">="
+        rows.append((projection.scenario.name, mark + _number(reads), _number(gets), mark + _number(writes),
+                     f"{price:,.2f}", f"{30 * price:,.2f}", change))
+    header = ("Scenario", "Reads/day", "Rules get()/day", "Writes/day", "$/day", "$/30 days", "vs baseline")
+    return _table(header, rows)
+
+
+def _table(header, rows):
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+    return [
+        "  ".join(f"{value:<{widths[i]}}" if i == 0 else f"{value:>{widths[i]}}" for i, value in enumerate(row))
+        for row in [header] + rows
+    ]
@@ -0,0 +1,299 @@
+"""
+Firestore Query Extraction
+Finds Firestore query chains (collection().where().orderBy().limit()...) in
+TypeScript sources, following queries that are built up in a variable
+(`query = query.where(...)`), and works out the composite index each one
+needs so it can be diffed against firestore.indexes.json.
+"""
+
+from .ts_source import call_args, declaration_at, declarations, receiver_start, string_value, tokenize_ts
+
+EQUALITY_OPS = {"==", "in", "array-contains", "array-contains-any"}
+RANGE_OPS = {"<", "<=", ">", ">=", "!=", "not-in"}
+TERMINALS = {"get", "stream", "count", "onSnapshot"}
+CURSORS = {"startAt", "startAfter", "endAt", "endBefore", "offset"}
+PASSTHROUGH = {"select", "withConverter"}
+
+
+class Query:
+    def __init__(self, collection, group, source, line, function):
+        self.collection = collection
+        self.group = group
+        self.source = source
+        self.line = line
+        self.function = function
+        self.filters = []
+        self.orders = []
+        self.limit = None
+        self.cursors = False
+        self.dynamic = False
+        self.terminal = None
+
+    def copy(self):
+        query = Query(self.collection, self.group, self.source, self.line, self.function)
+        query.filters = list(self.filters)
+        query.orders = list(self.orders)
+        query.limit = self.limit
+        query.cursors = self.cursors
+        query.dynamic = self.dynamic
+        return query
+
+    @property
+    def location(self):
+        return f"{self.source}:{self.line}"
+
+    def describe(self):
+        parts = [f"{self.collection}"]
+        parts += [f"where({field} {op})" for field, op in self.filters]
+        parts += [f"orderBy({field} {direction})" for field, direction in self.orders]
+        if self.limit is not None:
+            parts.append(f"limit({self.limit})")
+        return ".".join(parts)
+
+    def signature(self):
+        return (self.collection, self.group, tuple(self.filters), tuple(self.orders), self.limit,
+                self.cursors, self.terminal, self.function)
+
+    def __repr__(self):
+        return f"Query({self.describe()} @ {self.location})"
+
+
+def extract_queries(source, text):
+    """Executed Firestore queries in a TypeScript source file"""
+    tokens = tokenize_ts(text)
+    decls = declarations(tokens)
+    queries = []
+    variables = {}
+    current_decl = None
+    i = 0
+    count = len(tokens)
+    while i < count:
+        tok = tokens[i]
+        decl = declaration_at(decls, i) if tok.depth == 0 or current_decl is None else current_decl
+        if decl is not current_decl:
+            current_decl = decl
+            variables = {}
+
+        states = None
+        if (tok.value in ("collection", "collectionGroup") and i > 0 and tokens[i - 1].value == "."
+                and i + 1 < count and tokens[i + 1].value == "("):
+            args, end = call_args(tokens, i + 1)
+            name = string_value(args[0][0]) if args and len(args[0]) == 1 else None
+            if name is not None:
+                function = decl.name if decl else None
+                states = [Query(name, tok.value == "collectionGroup", source, tok.line, function)]
+                start = receiver_start(tokens, i - 1)
+                i = end
+        elif (tok.kind == "ident" and tok.value in variables and (i == 0 or tokens[i - 1].value != ".")
+                and i + 1 < count and tokens[i + 1].value == "."):
+            states = [q.copy() for q in variables[tok.value][1]]
+            start = i
+            i += 1
+        elif (tok.value == "get" and i > 0 and tokens[i - 1].value == "." and i + 1 < count
+                and tokens[i + 1].value == "("):
+            # transaction.get(query)
+            args, end = call_args(tokens, i + 1)
+            if len(args) == 1 and len(args[0]) == 1 and args[0][0].value in variables:
+                for query in variables[args[0][0].value][1]:
+                    executed = query.copy()
+                    executed.terminal = "get"
+                    queries.append(executed)
+                i = end
+                continue
+
+        if states is None:
+            i += 1
+            continue
+
+        i, terminal = _follow_chain(tokens, i, states)
+        if terminal is not None:
+            for query in states:
+                query.terminal = terminal
+                queries.append(query)
+            continue
+        if i < count and tokens[i].value in (".", "?."):
+            # The chain went on with something other than a query method, e.g. .doc(id)
+            continue
+
+        target, depth = _assignment_target(tokens, start)
+        if target is not None:
+            if target in variables and depth > variables[target][0]:
+                # Assigned inside a nested block (e.g. an if): both variants can reach the query
+                variables[target] = (variables[target][0], variables[target][1] + states)
+            elif target in variables:
+                variables[target] = (variables[target][0], states)
+            else:
+                variables[target] = (depth, states)
+
+    unique = {}
+    for query in queries:
+        unique.setdefault(query.signature(), query)
+    return list(unique.values())
+
+
+def _follow_chain(tokens, i, states):
+    """Apply .where/.orderBy/... calls starting at tokens[i]; returns (next index, terminal or None)"""
+    count = len(tokens)
+    while i + 2 < count and tokens[i].value == "." and tokens[i + 2].value == "(":
+        method = tokens[i + 1].value
+        args, end = call_args(tokens, i + 2)
+        if method in TERMINALS:
+            return end, method
+        if method == "where":
+            field = string_value(args[0][0]) if args and len(args[0]) == 1 else None
+            op = string_value(args[1][0]) if len(args) > 1 and len(args[1]) == 1 else None
+            for query in states:
+                if field is None or op is None:
+                    query.dynamic = True
+                else:
+                    query.filters.append((field, op))
+        elif method == "orderBy":
+            field = string_value(args[0][0]) if args and len(args[0]) == 1 else None
+            direction = "asc"
+            if len(args) > 1 and len(args[1]) == 1:
+                direction = string_value(args[1][0]) or "asc"
+            for query in states:
+                if field is None:
+                    query.dynamic = True
+                else:
+                    query.orders.append((field, direction.lower()))
+        elif method in ("limit", "limitToLast"):
+            value = args[0][0].value if args and len(args[0]) == 1 else "?"
+            for query in states:
+                query.limit = int(value) if value.isdigit() else value
+        elif method in CURSORS:
+            for query in states:
+                query.cursors = True
+        elif method not in PASSTHROUGH:
+            return i, None
+        i = end
+    return i, None
+
+
+def _assignment_target(tokens, start):
+    """Variable a query expression starting at start is assigned to, and the depth of the assignment"""
+    if start == 0 or tokens[start - 1].value != "=":
+        return None, 0
+    j = start - 2
+    # Skip a type annotation: `let query: admin.firestore.Query = ...`
+    k = j
+    while k > 0 and tokens[k].value != ":" and (tokens[k].kind == "ident" or tokens[k].value in (".", "<", ">")):
+        k -= 1
+    if k > 0 and tokens[k].value == ":" and tokens[k - 1].kind == "ident":
+        j = k - 1
+    if j < 0 or tokens[j].kind != "ident":
+        return None, 0
+    return tokens[j].value, tokens[j].depth
+
+
+class IndexSpec:
+    def __init__(self, collection, fields, scope="COLLECTION", equality=0):
+        self.collection = collection
+        self.fields = fields
+        self.scope = scope
+        # Number of leading equality fields, whose relative order does not matter
+        self.equality = equality
+
+    def describe(self):
+        fields = ", ".join(f"{field} {order}" for field, order in self.fields)
+        return f"{self.collection} ({fields})"
+
+    def key(self):
+        return (self.collection, self.scope, tuple(self.fields))
+
+    def __repr__(self):
+        return f"IndexSpec({self.describe()})"
+
+
+def required_index(query):
+    """Composite index a query needs, or None when single-field indexes suffice"""
+    if query.dynamic:
+        return None
+    equality = []
+    contains = []
+    range_fields = []
+    for field, op in query.filters:
+        if op in ("array-contains", "array-contains-any"):
+            contains.append(field)
+        elif op in EQUALITY_OPS:
+            if field not in equality:
+                equality.append(field)
+        elif op in RANGE_OPS and field not in range_fields:
+            range_fields.append(field)
+
+    orders = list(query.orders)
+    ordered_fields = [field for field, _ in orders]
+    # An inequality field is implicitly ordered first unless explicitly ordered
+    for field in reversed(range_fields):
+        if field not in ordered_fields:
+            orders.insert(0, (field, "asc"))
+    ordered = [(field, _order(direction)) for field, direction in orders]
+    equality = sorted(set(equality) - {field for field, _ in ordered})
+
+    # Equality-only queries are served by merging single-field indexes, and a
+    # single ordered field with no other constraint uses its own single-field index
+    if not ordered and len(contains) <= 1 and not (contains and equality):
+        return None
+    if len(ordered) <= 1 and not equality and not contains:
+        return None
+    fields = [(field, "ASCENDING") for field in equality]
+    fields += [(field, "CONTAINS") for field in contains]
+    fields += ordered
+    scope = "COLLECTION_GROUP" if query.group else "COLLECTION"
+    return IndexSpec(query.collection, fields, scope, len(equality))
+
+
+def _order(direction):
+    return "DESCENDING" if direction.lower() in ("desc", "descending") else "ASCENDING"
+
+
+def load_indexes(config):
+    """Composite indexes declared in a parsed firestore.indexes.json"""
+    indexes = []
+    for entry in config.get("indexes", []):
+        fields = []
+        for field in entry.get("fields", []):
+            order = field.get("order") or ("CONTAINS" if field.get("arrayConfig") else "ASCENDING")
+            fields.append((field["fieldPath"], order))
+        indexes.append(IndexSpec(entry["collectionGroup"], fields, entry.get("queryScope", "COLLECTION")))
+    return indexes
+
+
+def covers(index, needed):
+    """Whether a declared index can serve a required one"""
+    if index.collection != needed.collection or len(index.fields) != len(needed.fields):
+        return False
+    if needed.scope == "COLLECTION_GROUP" and index.scope != "COLLECTION_GROUP":
+        return False
+    cut = needed.equality
+    # Equality fields may be declared in any order and direction
+    if {field for field, _ in index.fields[:cut]} != {field for field, _ in needed.fields[:cut]}:
+        return False
+    if any(order == "CONTAINS" for _, order in index.fields[:cut]):
+        return False
+    # The ordered tail must match exactly, or fully reversed since indexes can be scanned backwards
+    tail = needed.fields[cut:]
+    declared = index.fields[cut:]
+    return declared == tail or declared == [(field, _flip(order)) for field, order in tail]
+
+
+def _flip(order):
+    return {"ASCENDING": "DESCENDING", "DESCENDING": "ASCENDING"}.get(order, order)
+
+
+def index_coverage(queries, indexes):
+    """(missing, unused): required indexes with the queries needing them, and declared indexes no query uses"""
+    missing = {}
+    used = set()
+    for query in queries:
+        needed = required_index(query)
+        if needed is None:
+            continue
+        matches = [index for index in indexes if covers(index, needed)]
+        if matches:
+            used.update(id(index) for index in matches)
+        else:
+            spec, users = missing.setdefault(needed.key(), (needed, []))
+            users.append(query)
+    unused = [index for index in indexes if id(index) not in used]
+    return list(missing.values()), unused
@@ -0,0 +1,111 @@
+"""
+Check Registry
+Declarative description of the checks a validator runs: the method, the
+project files it reads and whether it runs in-process or waits on a
+subprocess. A validator's CHECKS list is its run order; CHECK_INPUTS and
+SUBPROCESS_CHECKS are derived from it. Selecting the checks affected by a
+set of changed files (from a watch event or a git diff) matches the same
+input patterns.
+"""
+
+import re
+import subprocess
+
+PYTHON = "python"
+SUBPROCESS = "subprocess"
+
+
+class GitDiffError(RuntimeError):
+    pass
+
+
+class Check:
+    """rules: match paths (below the service root, as input globs) the check reads
+    from the rules files among its inputs; None means it depends on the whole file"""
+
+    def __init__(self, name, inputs, cost=PYTHON, rules=None):
+        self.name = name
+        self.inputs = list(inputs)
+        self.cost = cost
+        self.rules = list(rules) if rules is not None else None
+
+    def __repr__(self):
+        return f"Check({self.name}, {self.cost})"
+
+
+def pattern_regex(pattern):
+    """Compile an input glob into a regex over project-relative POSIX paths"""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(parts) + r"\Z")
+
+
+def dependents(check_inputs):
+    """{input pattern: [check names]}, the edges from files to the checks that read them"""
+    graph = {}
+    for name, inputs in check_inputs.items():
+        for pattern in inputs:
+            graph.setdefault(pattern, []).append(name)
+    return graph
+
+
+def affected_checks(check_inputs, changed, check_rules=None, rule_paths=None):
+    """Names of the checks (in CHECK_INPUTS order) reading any of the changed relative paths
+
+    rule_paths maps a changed rules file to the match paths whose permissions
+    changed; a check declaring the rules it reads is only affected by that
+    file when one of those paths is among them.
+    """
+    check_rules = check_rules or {}
+    rule_paths = rule_paths or {}
+    hit = set()
+    for pattern, names in dependents(check_inputs).items():
+        regex = pattern_regex(pattern)
+        for rel in changed:
+            if not regex.match(rel):
+                continue
+            for name in names:
+                if rel in rule_paths and check_rules.get(name) is not None:
+                    if not _reads_rules(check_rules[name], rule_paths[rel]):
+                        continue
+                hit.add(name)
+    return [name for name in check_inputs if name in hit]
+
+
+def _reads_rules(patterns, paths):
+    regexes = [pattern_regex(pattern) for pattern in patterns]
+    return any(regex.match(path) for regex in regexes for path in paths)
+
+
+def changed_files(project_path, rev):
+    """Project-relative paths that differ from rev: committed, staged, unstaged and untracked"""
+    commands = [
+        ["git", "diff", "--name-only", "--relative", "--no-renames", rev, "--"],
+        ["git", "ls-files", "--others", "--exclude-standard"],
+    ]
+    changed = set()
+    for argv in commands:
+        try:
+            proc = subprocess.run(argv, cwd=project_path, capture_output=True, text=True, timeout=60)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise GitDiffError(f"{' '.join(argv)} failed: {e}") from e
+        if proc.returncode != 0:
+            raise GitDiffError(f"{' '.join(argv)} failed: {proc.stderr.strip() or proc.returncode}")
+        changed.update(line for line in proc.stdout.splitlines() if line)
+    return sorted(changed)
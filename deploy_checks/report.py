@@ -0,0 +1,159 @@
+"""
+Result Stream
+Per-check timing and machine-readable results for the validator scripts.
+Each check is timed on a monotonic clock together with the bytes it read
+through the project snapshot and the wall time of the subprocesses whose
+results it collected. Finished checks are appended to an NDJSON feed as
+they complete (one JSON object per line, flushed immediately) and can
+also be written out as a JUnit XML report for CI dashboards.
+"""
+
+import json
+import os
+import time
+import xml.etree.ElementTree as ET
+
+
+class CheckRecord:
+    def __init__(self, suite, name):
+        self.suite = suite
+        self.name = name
+        self.tests = []
+        self.warnings = []
+        self.duration = 0.0
+        self.bytes_read = 0
+        self.subprocess_time = 0.0
+        self.cached = False
+
+    @property
+    def status(self):
+        if not self.tests:
+            return "skipped"
+        return "passed" if all(passed for _, passed, _ in self.tests) else "failed"
+
+    def as_dict(self):
+        return {
+            "type": "check",
+            "suite": self.suite,
+            "check": self.name,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 3),
+            "bytes_read": self.bytes_read,
+            "subprocess_ms": round(self.subprocess_time * 1000, 3),
+            "cached": self.cached,
+            "tests": [{"name": name, "passed": passed, "message": message} for name, passed, message in self.tests],
+            "warnings": list(self.warnings),
+        }
+
+
+class ResultStream:
+    """Collects a CheckRecord per check; streams NDJSON and optionally writes JUnit XML on close"""
+
+    def __init__(self, suite, ndjson_path=None, junit_path=None):
+        self.suite = suite
+        self.ndjson_path = ndjson_path
+        self.junit_path = junit_path
+        self.records = []
+        self.current = None
+        self.started = time.monotonic()
+        self._ndjson = None
+        if ndjson_path:
+            self._ndjson = open(ndjson_path, "a", encoding="utf-8")
+
+    def run(self, validator, name, check):
+        """Run check() as validator's check name, recording its duration and resource use"""
+        record = CheckRecord(self.suite, name)
+        snapshot = validator.snapshot
+        commands = validator.commands
+        cache = validator.cache
+        bytes_before = snapshot.bytes_read
+        subprocess_before = commands.collected_time
+        hits_before = cache.hits if cache is not None else 0
+        self.current = record
+        started = time.monotonic()
+        try:
+            check()
+        finally:
+            record.duration = time.monotonic() - started
+            record.bytes_read = snapshot.bytes_read - bytes_before
+            record.subprocess_time = commands.collected_time - subprocess_before
+            record.cached = cache is not None and cache.hits > hits_before
+            self.current = None
+            self.records.append(record)
+            self._emit(record.as_dict())
+
+    def test(self, name, passed, message=""):
+        if self.current is not None:
+            self.current.tests.append((name, bool(passed), message))
+
+    def warning(self, message):
+        if self.current is not None:
+            self.current.warnings.append(message)
+
+    def summary(self):
+        return {
+            "type": "summary",
+            "suite": self.suite,
+            "checks": len(self.records),
+            "failed": sum(1 for r in self.records if r.status == "failed"),
+            "cached": sum(1 for r in self.records if r.cached),
+            "duration_ms": round((time.monotonic() - self.started) * 1000, 3),
+        }
+
+    def close(self):
+        """Emit the summary line and write the JUnit report"""
+        self._emit(self.summary())
+        if self._ndjson is not None:
+            self._ndjson.close()
+            self._ndjson = None
+        if self.junit_path:
+            write_junit(self.junit_path, self.suite, self.records)
+
+    def _emit(self, data):
+        if self._ndjson is not None:
+            self._ndjson.write(json.dumps(data) + "\n")
+            self._ndjson.flush()
+
+
+def write_junit(path, suite, records):
+    """JUnit XML with one testcase per check; failed verdicts become <failure> elements"""
+    total = sum(r.duration for r in records)
+    root = ET.Element("testsuites", name=suite, time=f"{total:.3f}")
+    element = ET.SubElement(
+        root, "testsuite", name=suite, tests=str(len(records)),
+        failures=str(sum(1 for r in records if r.status == "failed")),
+        skipped=str(sum(1 for r in records if r.status == "skipped")),
+        time=f"{total:.3f}",
+    )
+    for record in records:
+        case = ET.SubElement(element, "testcase", classname=suite, name=record.name, time=f"{record.duration:.3f}")
+        for name, passed, message in record.tests:
+            if not passed:
+                failure = ET.SubElement(case, "failure", message=f"{name}: {message}"[:1000])
+                failure.text = message
+        if record.status == "skipped":
+            ET.SubElement(case, "skipped")
+        output = [f"{name}: {'PASSED' if passed else 'FAILED'} {message}".rstrip() for name, passed, message in record.tests]
+        output += [f"WARNING: {message}" for message in record.warnings]
+        output.append(f"bytes_read={record.bytes_read} subprocess_ms={record.subprocess_time * 1000:.0f} "
+                      f"cached={str(record.cached).lower()}")
+        ET.SubElement(case, "system-out").text = "\n".join(output)
+    tmp = f"{path}.tmp"
+    ET.ElementTree(root).write(tmp, encoding="utf-8", xml_declaration=True)
+    os.replace(tmp, path)
+
+
+def format_profile(records, count=10):
+    """The slowest checks as aligned text lines"""
+    rows = []
+    for record in sorted(records, key=lambda r: r.duration, reverse=True)[:count]:
+        rows.append((record.name, f"{record.duration * 1000:.1f}", f"{record.subprocess_time * 1000:.1f}",
+                     f"{record.bytes_read / 1024:.1f}", "yes" if record.cached else "", record.status))
+    header = ("Check", "ms", "Subprocess ms", "KiB read", "Cached", "Status")
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+    lines = []
+    for row in [header] + rows:
+        lines.append("  ".join(
+            f"{value:<{widths[i]}}" if i in (0, 4, 5) else f"{value:>{widths[i]}}" for i, value in enumerate(row)
+        ).rstrip())
+    return lines
@@ -0,0 +1,394 @@
+"""
+Security Rules Parser
+Tokenizer and single-pass parser for firestore.rules / storage.rules.
+Builds an AST of services, match blocks, functions and allow statements,
+indexed by match path, function name and allow operation.
+"""
+
+import bisect
+import re
+
+
+class RulesSyntaxError(ValueError):
+    def __init__(self, message, line):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+class Token:
+    __slots__ = ("kind", "value", "line", "start", "end")
+
+    def __init__(self, kind, value, line, start, end):
+        self.kind = kind
+        self.value = value
+        self.line = line
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f"Token({self.kind}, {self.value!r}, line={self.line})"
+
+
+# Whitespace and comments between tokens; one character of whitespace per repetition,
+# so a token that fails to match after a long run cannot backtrack through it
+_TRIVIA_RE = re.compile(r"(?:\s|//[^\n]*|/\*.*?\*/)*", re.DOTALL)
+
+# One token at the first offset past the trivia
+_TOKEN_RE = re.compile(r"""
+    (?P<string>'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*")
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op>==|!=|<=|>=|&&|\|\||[-+*/%<>!?:.,;=()\[\]{}])
+  | (?P<end>$)
+""", re.VERBOSE)
+
+# A path literal: /seg/{wildcard}/{rest=**}/$(interpolated.expr(with(parens)))
+_PATH_RE = re.compile(r"""
+    (?:/(?:[A-Za-z0-9_\-.~%*]+
+          |\{[^{}\s]*\}
+          |\$\((?:[^()]|\((?:[^()]|\([^()]*\))*\))*\)
+        )*)+
+""", re.VERBOSE)
+
+# Tokens after which a "/" is a division operator rather than the start of a path
+_OPERAND_OPS = {")", "]"}
+_KEYWORD_OPS = {"in", "is"}
+_PATH_KEYWORDS = {"match", "if", "return"} | _KEYWORD_OPS
+
+
+def tokenize(text):
+    """Split rules source into tokens, dropping whitespace and comments"""
+    tokens = []
+    append = tokens.append
+    newlines = [i for i, ch in enumerate(text) if ch == "\n"] if "\n" in text else []
+    trivia_match = _TRIVIA_RE.match
+    token_match = _TOKEN_RE.match
+    pos = 0
+    prev = None
+    while True:
+        pos = trivia_match(text, pos).end()
+        m = token_match(text, pos)
+        if m is None:
+            raise RulesSyntaxError(f"unexpected character {text[pos]!r}", _line_at(newlines, pos))
+        kind = m.lastgroup
+        if kind == "end":
+            return tokens
+        start = pos
+        end = m.end()
+        if kind == "op" and text[start] == "/" and _path_allowed(prev):
+            path = _PATH_RE.match(text, start)
+            if path.end() > start + 1:
+                kind, end = "path", path.end()
+        prev = Token(kind, text[start:end], _line_at(newlines, start), start, end)
+        append(prev)
+        pos = end
+
+
+def _line_at(newlines, offset):
+    return bisect.bisect_left(newlines, offset) + 1
+
+
+def _path_allowed(prev):
+    if prev is None:
+        return True
+    if prev.kind == "ident":
+        return prev.value in _PATH_KEYWORDS
+    if prev.kind == "op":
+        return prev.value not in _OPERAND_OPS
+    return False
+
+
+def interpolations(path):
+    """Yield (start, end) of each $( ... ) group in a path literal"""
+    i = path.find("$(")
+    while i != -1:
+        depth = 0
+        j = i + 1
+        while j < len(path):
+            if path[j] == "(":
+                depth += 1
+            elif path[j] == ")":
+                depth -= 1
+                if depth == 0:
+                    break
+            j += 1
+        yield i, j + 1
+        i = path.find("$(", j + 1)
+
+
+_BINARY_OPS = {"==", "!=", "<", ">", "<=", ">=", "&&", "||", "+", "*", "/", "%", "?", ":", "="}
+_TIGHT_OPS = {".", "(", ")", "[", "]"}
+
+
+def render(tokens):
+    """Render an expression in canonical spacing, e.g. `a.b(c, d) == 'x' && !e`"""
+    parts = []
+    prev = None
+    for tok in tokens:
+        value = tok.value
+        if tok.kind == "op":
+            if value in _TIGHT_OPS:
+                parts.append(value)
+            elif value == ",":
+                parts.append(", ")
+            elif value == "!":
+                parts.append(value if prev is None or _is_prefix_position(prev) else " " + value)
+            elif value == "-" and (prev is None or _is_prefix_position(prev)):
+                parts.append(value)
+            elif value in _BINARY_OPS or value == "-":
+                parts.append(f" {value} ")
+            else:
+                parts.append(value)
+        elif tok.kind == "ident" and value in _KEYWORD_OPS:
+            parts.append(f" {value} ")
+        else:
+            if prev is not None and prev.kind != "op" and prev.value not in _KEYWORD_OPS:
+                parts.append(" ")
+            parts.append(value)
+        prev = tok
+    return "".join(parts).replace("  ", " ").strip()
+
+
+def _is_prefix_position(prev):
+    if prev.kind == "op":
+        return prev.value not in (")", "]")
+    return prev.value in _KEYWORD_OPS
+
+
+class Allow:
+    def __init__(self, operations, condition, line):
+        self.operations = operations
+        self.condition_tokens = condition
+        self.condition = render(condition) if condition else "true"
+        self.line = line
+
+    def __repr__(self):
+        return f"Allow({', '.join(self.operations)}: if {self.condition})"
+
+
+class FunctionDecl:
+    def __init__(self, name, params, lets, body, line, scope):
+        self.name = name
+        self.params = params
+        self.lets = lets
+        self.body_tokens = body
+        self.body = render(body)
+        self.line = line
+        self.scope = scope
+
+    @property
+    def text(self):
+        """Canonical text of the let bindings and return expression"""
+        lets = "".join(f"let {name} = {render(tokens)}; " for name, tokens in self.lets)
+        return f"{lets}return {self.body};"
+
+    def __repr__(self):
+        return f"FunctionDecl({self.name}({', '.join(self.params)}))"
+
+
+class MatchBlock:
+    def __init__(self, path, parent, line, start):
+        self.path = path
+        self.parent = parent
+        self.full_path = (parent.full_path if parent else "") + path
+        self.line = line
+        self.start = start
+        self.end = start
+        self.children = []
+        self.functions = {}
+        self.allows = {}
+
+    def allow_conditions(self, operation):
+        """Canonical conditions of the allow statements granting operation"""
+        return [allow.condition for allow in self.allows.get(operation, [])]
+
+    def __repr__(self):
+        return f"MatchBlock({self.full_path})"
+
+
+class Service:
+    def __init__(self, name, line):
+        self.name = name
+        self.line = line
+        self.matches = []
+        self.functions = {}
+        self.allows = {}
+        self.full_path = ""
+
+
+class RulesFile:
+    def __init__(self, source):
+        self.source = source
+        self.version = None
+        self.services = []
+        self.matches = {}
+        self.matches_by_header = {}
+        self.functions = {}
+
+    def service(self, name):
+        """Service declaration by name, e.g. 'cloud.firestore'"""
+        for service in self.services:
+            if service.name == name:
+                return service
+        return None
+
+    def match(self, full_path):
+        """Match block by its full nested path"""
+        return self.matches.get(_normalize_path(full_path))
+
+    def find_matches(self, header_path):
+        """Match blocks whose own header is header_path, wherever they are nested"""
+        return self.matches_by_header.get(_normalize_path(header_path), [])
+
+    def section(self, block):
+        """Source text of a match block"""
+        return self.source[block.start:block.end]
+
+
+def _normalize_path(path):
+    return re.sub(r"\s+", "", path)
+
+
+class _Parser:
+    def __init__(self, source):
+        self.source = source
+        self.tokens = tokenize(source)
+        self.pos = 0
+        self.rules = RulesFile(source)
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def next(self):
+        tok = self.peek()
+        if tok is None:
+            last = self.tokens[-1].line if self.tokens else 1
+            raise RulesSyntaxError("unexpected end of file", last)
+        self.pos += 1
+        return tok
+
+    def expect(self, value=None, kind=None):
+        tok = self.next()
+        if (value is not None and tok.value != value) or (kind is not None and tok.kind != kind):
+            raise RulesSyntaxError(f"expected {value or kind}, found {tok.value!r}", tok.line)
+        return tok
+
+    def accept(self, value):
+        tok = self.peek()
+        if tok is not None and tok.value == value and tok.kind in ("op", "ident"):
+            self.pos += 1
+            return tok
+        return None
+
+    def parse(self):
+        while self.peek() is not None:
+            tok = self.next()
+            if tok.value == "rules_version":
+                self.expect("=")
+                self.rules.version = self.expect(kind="string").value[1:-1]
+                self.accept(";")
+            elif tok.value == "service":
+                name = [self.expect(kind="ident").value]
+                while self.accept("."):
+                    name.append(self.expect(kind="ident").value)
+                service = Service(".".join(name), tok.line)
+                self.expect("{")
+                self.parse_body(service, None)
+                self.rules.services.append(service)
+            elif tok.value == ";":
+                continue
+            else:
+                raise RulesSyntaxError(f"unexpected {tok.value!r}", tok.line)
+        return self.rules
+
+    def parse_body(self, node, block):
+        """Parse statements until the closing brace of node"""
+        while True:
+            tok = self.next()
+            if tok.value == "}" and tok.kind == "op":
+                return tok
+            if tok.value == "match":
+                self.parse_match(node, block, tok)
+            elif tok.value == "function":
+                self.parse_function(node, block, tok)
+            elif tok.value == "allow":
+                self.parse_allow(node, tok)
+            elif tok.value == ";":
+                continue
+            else:
+                raise RulesSyntaxError(f"unexpected {tok.value!r}", tok.line)
+
+    def parse_match(self, node, parent, keyword):
+        path = self.expect(kind="path").value
+        block = MatchBlock(path, parent, keyword.line, keyword.start)
+        self.expect("{")
+        block.end = self.parse_body(block, block).end
+        if parent is None:
+            node.matches.append(block)
+        else:
+            parent.children.append(block)
+        self.rules.matches[block.full_path] = block
+        self.rules.matches_by_header.setdefault(block.path, []).append(block)
+
+    def parse_function(self, node, block, keyword):
+        name = self.expect(kind="ident").value
+        self.expect("(")
+        params = []
+        while not self.accept(")"):
+            params.append(self.expect(kind="ident").value)
+            self.accept(",")
+        self.expect("{")
+        lets = []
+        while self.accept("let"):
+            let_name = self.expect(kind="ident").value
+            self.expect("=")
+            lets.append((let_name, self.expression()))
+            self.accept(";")
+        self.expect("return")
+        body = self.expression()
+        self.accept(";")
+        self.expect("}")
+        decl = FunctionDecl(name, params, lets, body, keyword.line, block)
+        node.functions[name] = decl
+        self.rules.functions.setdefault(name, decl)
+
+    def parse_allow(self, node, keyword):
+        operations = [self.expect(kind="ident").value]
+        while self.accept(","):
+            operations.append(self.expect(kind="ident").value)
+        condition = None
+        if self.accept(":"):
+            self.expect("if")
+            condition = self.expression()
+        self.accept(";")
+        allow = Allow(tuple(operations), condition, keyword.line)
+        for operation in operations:
+            node.allows.setdefault(operation, []).append(allow)
+
+    def expression(self):
+        """Collect the tokens of an expression up to `;` or the enclosing `}`"""
+        start = self.pos
+        depth = 0
+        while True:
+            tok = self.peek()
+            if tok is None:
+                raise RulesSyntaxError("unterminated expression", self.tokens[start].line)
+            if tok.kind == "op":
+                if tok.value in ("(", "[", "{"):
+                    depth += 1
+                elif tok.value in (")", "]", "}"):
+                    if depth == 0:
+                        break
+                    depth -= 1
+                elif tok.value == ";" and depth == 0:
+                    break
+            self.pos += 1
+        if self.pos == start:
+            raise RulesSyntaxError("empty expression", self.peek().line)
+        return self.tokens[start:self.pos]
+
+
+def parse_rules(source):
+    """Parse security rules source into a RulesFile"""
+    return _Parser(source).parse()
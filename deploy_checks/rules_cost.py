@@ -0,0 +1,228 @@
+"""
+Rules Read Cost
+Static analysis of the document reads a Firestore security rules evaluation
+performs. Every rule function call in an allow condition is expanded with
+its arguments substituted, and each get()/exists() call is recorded with the
+document path it resolves to. Per operation this gives the worst case
+(every call evaluated, no short-circuiting) and the deduplicated count
+(Firestore bills repeated reads of the same document once per request).
+Each read document also records the fields the rules use from it
+(get(...).data.role), so a field moved into a custom claim can be costed.
+"""
+
+from .rules import Token, interpolations, render, tokenize
+
+ACCESS_CALLS = {"get", "exists", "getAfter", "existsAfter"}
+
+# Firestore rejects rules with deeper function call chains
+MAX_CALL_DEPTH = 20
+
+# Allow statements that apply to each operation
+OPERATION_SCOPES = {
+    "get": ("get", "read"),
+    "list": ("list", "read"),
+    "read": ("read", "get", "list"),
+    "create": ("create", "write"),
+    "update": ("update", "write"),
+    "delete": ("delete", "write"),
+    "write": ("write", "create", "update", "delete"),
+}
+
+
+class RulesCostError(ValueError):
+    pass
+
+
+class OperationCost:
+    def __init__(self, path, operation, reads, fields=None):
+        self.path = path
+        self.operation = operation
+        self.reads = reads
+        # {document path: fields read from it}; None among them when the whole document is used
+        self.fields = fields or {}
+
+    @property
+    def worst_case(self):
+        return len(self.reads)
+
+    @property
+    def deduplicated(self):
+        return len(set(self.reads))
+
+    def __repr__(self):
+        return f"OperationCost({self.path} {self.operation}: worst={self.worst_case}, dedup={self.deduplicated})"
+
+
+def analyze_rules(rules):
+    """Read cost of every allow operation of every match block, in source order"""
+    blocks = sorted(rules.matches.values(), key=lambda b: b.start)
+    recursive = [b for b in blocks if b.path.endswith("=**}")]
+    costs = []
+    for block in blocks:
+        applicable = [block] + [r for r in recursive if r is not block and _covers(r, block)]
+        for operation in block.allows:
+            reads = []
+            fields = {}
+            for candidate in applicable:
+                # `allow update, delete: if ...` is indexed under both operations; evaluate it once
+                seen = set()
+                for scope in OPERATION_SCOPES.get(operation, (operation,)):
+                    for allow in candidate.allows.get(scope, []):
+                        if id(allow) not in seen:
+                            seen.add(id(allow))
+                            reads.extend(condition_reads(allow.condition_tokens or [], candidate, rules, fields))
+            costs.append(OperationCost(block.full_path, operation, reads, fields))
+    return costs
+
+
+def _covers(recursive, block):
+    prefix = recursive.full_path.rsplit("/", 1)[0]
+    return block.full_path.startswith(prefix + "/") or prefix == ""
+
+
+def condition_reads(tokens, block, rules, fields=None):
+    """Document paths read while evaluating an allow condition in block; fields collects {path: fields used}"""
+    return _expand(tokens, {}, block, rules, 0, {} if fields is None else fields)
+
+
+def _expand(tokens, env, block, rules, depth, fields):
+    if depth > MAX_CALL_DEPTH:
+        raise RulesCostError(f"function calls nested deeper than {MAX_CALL_DEPTH}")
+    reads = []
+    i = 0
+    count = len(tokens)
+    while i < count:
+        tok = tokens[i]
+        is_call = (
+            tok.kind == "ident"
+            and i + 1 < count
+            and tokens[i + 1].value == "("
+            and (i == 0 or tokens[i - 1].value != ".")
+        )
+        if not is_call:
+            if tok.kind == "path":
+                reads.extend(_interpolation_reads(tok, env, block, rules, depth, fields))
+            i += 1
+            continue
+
+        args, end = _call_args(tokens, i + 1)
+        for arg in args:
+            reads.extend(_expand(arg, env, block, rules, depth, fields))
+        if tok.value in ACCESS_CALLS:
+            if args:
+                path = _document_path(_substitute(args[0], env))
+                reads.append(path)
+                fields.setdefault(path, set()).add(_data_field(tokens, end) if tok.value.startswith("get") else None)
+        else:
+            decl = _lookup(tok.value, block, rules)
+            if decl is not None:
+                call_env = {
+                    param: _opaque(_substitute(arg, env))
+                    for param, arg in zip(decl.params, args)
+                }
+                for name, let_tokens in decl.lets:
+                    reads.extend(_expand(let_tokens, call_env, block, rules, depth + 1, fields))
+                    call_env[name] = _opaque(_substitute(let_tokens, call_env))
+                reads.extend(_expand(decl.body_tokens, call_env, block, rules, depth + 1, fields))
+        i = end
+    return reads
+
+
+def _call_args(tokens, open_index):
+    """Split the arguments of the call whose `(` is at open_index; returns (args, index after `)`)"""
+    args = []
+    current = []
+    depth = 0
+    i = open_index + 1
+    while i < len(tokens):
+        tok = tokens[i]
+        if tok.kind == "op" and tok.value in ("(", "[", "{"):
+            depth += 1
+        elif tok.kind == "op" and tok.value in (")", "]", "}"):
+            if depth == 0:
+                if current:
+                    args.append(current)
+                return args, i + 1
+            depth -= 1
+        elif tok.kind == "op" and tok.value == "," and depth == 0:
+            args.append(current)
+            current = []
+            i += 1
+            continue
+        current.append(tok)
+        i += 1
+    raise RulesCostError("unbalanced parentheses in rule expression")
+
+
+def _lookup(name, block, rules):
+    scope = block
+    while scope is not None:
+        if name in scope.functions:
+            return scope.functions[name]
+        scope = scope.parent
+    return rules.functions.get(name)
+
+
+def _opaque(tokens):
+    """A single token standing for an already evaluated argument"""
+    if len(tokens) == 1:
+        return tokens[0]
+    text = render(tokens)
+    return Token("opaque", f"({text})" if " " in text else text, tokens[0].line if tokens else 0, 0, 0)
+
+
+def _substitute(tokens, env):
+    if not env:
+        return tokens
+    result = []
+    for i, tok in enumerate(tokens):
+        if tok.kind == "ident" and tok.value in env and (i == 0 or tokens[i - 1].value != "."):
+            result.append(env[tok.value])
+        elif tok.kind == "path":
+            result.append(Token("path", _substitute_path(tok.value, env), tok.line, tok.start, tok.end))
+        else:
+            result.append(tok)
+    return result
+
+
+def _substitute_path(path, env):
+    parts = []
+    last = 0
+    for start, end in interpolations(path):
+        inner = tokenize(path[start + 2:end - 1])
+        parts.append(path[last:start])
+        parts.append(f"$({render(_substitute(inner, env))})")
+        last = end
+    parts.append(path[last:])
+    return "".join(parts)
+
+
+def _interpolation_reads(tok, env, block, rules, depth, fields):
+    reads = []
+    for start, end in interpolations(tok.value):
+        reads.extend(_expand(tokenize(tok.value[start + 2:end - 1]), env, block, rules, depth, fields))
+    return reads
+
+
+def _data_field(tokens, after):
+    """Field of `get(...).data.field` following the call ending before index after, or None"""
+    if (after + 3 < len(tokens) and tokens[after].value == "." and tokens[after + 1].value == "data"
+            and tokens[after + 2].value == "." and tokens[after + 3].kind == "ident"):
+        return tokens[after + 3].value
+    return None
+
+
+def _document_path(tokens):
+    return render(tokens)
+
+
+def format_cost_table(costs, root=""):
+    """Render costs as an aligned text table"""
+    rows = [(c.path[len(root):] if root and c.path.startswith(root + "/") else c.path, c.operation,
+             str(c.worst_case), str(c.deduplicated)) for c in costs]
+    header = ("Match path", "Operation", "Worst", "Dedup")
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(4)]
+    lines = [f"{header[0]:<{widths[0]}}  {header[1]:<{widths[1]}}  {header[2]:>{widths[2]}}  {header[3]:>{widths[3]}}"]
+    for path, operation, worst, dedup in rows:
+        lines.append(f"{path:<{widths[0]}}  {operation:<{widths[1]}}  {worst:>{widths[2]}}  {dedup:>{widths[3]}}")
+    return lines
@@ -0,0 +1,340 @@
+"""
+Security Rules Diff
+Permission-level diff of a firestore.rules / storage.rules file between two
+versions. Match blocks are aligned by path (wildcard names ignored, so
+renaming {userId} to {uid} grants nothing new) and compared per concrete
+operation (get, list, create, update, delete), with read/write allows
+expanded to the operations they grant. Each block carries a Merkle hash of
+its conditions, the rule functions those conditions call (resolved and
+hashed transitively) and its children, so only subtrees whose hashes
+differ are walked, and a change inside a helper function shows up on every
+operation whose condition reaches it. A renamed header is still reported
+as a changed path: checks look match blocks up by their header text.
+"""
+
+import hashlib
+import subprocess
+from pathlib import Path
+
+from .registry import GitDiffError
+from .rules import parse_rules
+
+# Concrete operations and the allow methods that grant each one
+OPERATIONS = {
+    "get": ("get", "read"),
+    "list": ("list", "read"),
+    "create": ("create", "write"),
+    "update": ("update", "write"),
+    "delete": ("delete", "write"),
+}
+
+# Leading match segments that only select the database or bucket
+SERVICE_ROOTS = {
+    "cloud.firestore": ("databases", None, "documents"),
+    "firebase.storage": ("b", None, "o"),
+}
+
+
+class RuleChange:
+    """A change in who may perform operation on the documents under path"""
+
+    def __init__(self, path, operation, before, after, via, line):
+        self.path = path
+        self.operation = operation
+        self.before = before
+        self.after = after
+        self.via = via
+        self.line = line
+
+    @property
+    def kind(self):
+        if not self.before:
+            return "granted"
+        if not self.after:
+            return "revoked"
+        return "changed"
+
+    def __repr__(self):
+        return f"RuleChange({self.kind} {self.operation} {self.path})"
+
+
+class RulesDiff:
+    def __init__(self, changes, functions, compared, total, renamed=()):
+        self.changes = changes
+        # (scope path, name, old text, new text) of each rule function whose definition changed
+        self.functions = functions
+        # (old path, new path) of each aligned match block whose header text changed
+        self.renamed = list(renamed)
+        # Match blocks walked, out of all blocks in both versions
+        self.compared = compared
+        self.total = total
+
+    @property
+    def paths(self):
+        """Match paths with a permission change or a renamed header (under both names)"""
+        return {change.path for change in self.changes} | {path for pair in self.renamed for path in pair}
+
+
+class _Hasher:
+    """Memoized Merkle hashes of the blocks and functions of one parsed rules file"""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self._blocks = {}
+        self._functions = {}
+
+    def function(self, decl):
+        key = id(decl)
+        if key not in self._functions:
+            # Rules functions cannot recurse; the placeholder only guards against malformed input
+            self._functions[key] = ""
+            tokens = list(decl.body_tokens) + [tok for _, let in decl.lets for tok in let]
+            parts = [decl.name, ",".join(decl.params), decl.text]
+            parts += [self.function(callee) for callee in self.callees(tokens, decl.scope).values()]
+            self._functions[key] = _digest(parts)
+        return self._functions[key]
+
+    def callees(self, tokens, block):
+        """{name: FunctionDecl} of the rules functions called in tokens, resolved from block"""
+        found = {}
+        for i, tok in enumerate(tokens[:-1]):
+            if tok.kind != "ident" or tokens[i + 1].value != "(" or (i and tokens[i - 1].value == "."):
+                continue
+            decl = _lookup(tok.value, block, self.rules)
+            if decl is not None:
+                found[tok.value] = decl
+        return found
+
+    def operation(self, block, operation):
+        """(conditions, hash) of the allows granting operation in block itself"""
+        allows = _granting(block, operation)
+        parts = []
+        for allow in allows:
+            parts.append(allow.condition)
+            parts += [self.function(decl) for decl in self.callees(allow.condition_tokens or [], block).values()]
+        return [allow.condition for allow in allows], _digest(parts)
+
+    def block(self, block):
+        key = id(block)
+        if key not in self._blocks:
+            # The literal header, so a wildcard rename is walked (and reported) like any other change
+            parts = [block.path]
+            parts += [self.operation(block, operation)[1] for operation in OPERATIONS]
+            parts += sorted(self.block(child) for child in block.children)
+            self._blocks[key] = _digest(parts)
+        return self._blocks[key]
+
+
+def _digest(parts):
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+def _lookup(name, block, rules):
+    scope = block
+    while scope is not None:
+        if name in scope.functions:
+            return scope.functions[name]
+        scope = scope.parent
+    return rules.functions.get(name)
+
+
+def _granting(block, operation):
+    allows = []
+    for method in OPERATIONS[operation]:
+        for allow in block.allows.get(method, []):
+            if allow not in allows:
+                allows.append(allow)
+    return allows
+
+
+def _align_key(path):
+    """Match header with wildcard names dropped: /users/{uid} -> /users/{}"""
+    segments = []
+    for segment in path.split("/"):
+        if segment.startswith("{") and segment.endswith("}"):
+            segment = "{**}" if segment.endswith("=**}") else "{}"
+        segments.append(segment)
+    return "/".join(segments)
+
+
+def rule_path(full_path, service):
+    """Block path below the service root, e.g. /leaveRequests/{id}"""
+    segments = [seg for seg in full_path.split("/") if seg]
+    root = SERVICE_ROOTS.get(service)
+    if root and len(segments) >= len(root) and all(
+        expected is None or expected == seg for expected, seg in zip(root, segments)
+    ):
+        segments = segments[len(root):]
+    return "/" + "/".join(segments)
+
+
+def _count(blocks):
+    return sum(1 + _count(block.children) for block in blocks)
+
+
+def diff_rules(old, new):
+    """RulesDiff between two parsed rules files (either may be None for an added/removed file)"""
+    differ = _Differ(old, new)
+    old_services = {service.name: service for service in old.services} if old else {}
+    new_services = {service.name: service for service in new.services} if new else {}
+    for name in list(old_services) + [n for n in new_services if n not in old_services]:
+        old_service, new_service = old_services.get(name), new_services.get(name)
+        differ.children(name, old_service.matches if old_service else [], new_service.matches if new_service else [])
+    total = sum(_count(service.matches) for service in list(old_services.values()) + list(new_services.values()))
+    return RulesDiff(differ.changes, _function_changes(old, new), differ.compared, total, differ.renamed)
+
+
+def _functions(rules):
+    """{(scope path, name): FunctionDecl} of every rule function in a parsed file"""
+    found = {}
+    for service in rules.services if rules else []:
+        found.update({(service.name, "/", name): decl for name, decl in service.functions.items()})
+        stack = list(service.matches)
+        while stack:
+            block = stack.pop()
+            path = _align_key(rule_path(block.full_path, service.name))
+            found.update({(service.name, path, name): decl for name, decl in block.functions.items()})
+            stack.extend(block.children)
+    return found
+
+
+def _function_changes(old, new):
+    old_functions, new_functions = _functions(old), _functions(new)
+    changes = []
+    for key in list(old_functions) + [k for k in new_functions if k not in old_functions]:
+        before, after = old_functions.get(key), new_functions.get(key)
+        before_text = f"({', '.join(before.params)}) {before.text}" if before else ""
+        after_text = f"({', '.join(after.params)}) {after.text}" if after else ""
+        if before_text != after_text:
+            shown = after or before
+            changes.append((rule_path(shown.scope.full_path, key[0]) if shown.scope else "/", key[2],
+                            before_text, after_text))
+    return changes
+
+
+class _Differ:
+    def __init__(self, old, new):
+        self.old = _Hasher(old) if old else None
+        self.new = _Hasher(new) if new else None
+        self.changes = []
+        self.renamed = []
+        self.compared = 0
+
+    def children(self, service, old_blocks, new_blocks):
+        old_by_key = {_align_key(block.path): block for block in old_blocks}
+        new_by_key = {_align_key(block.path): block for block in new_blocks}
+        for key in list(old_by_key) + [k for k in new_by_key if k not in old_by_key]:
+            self.blocks(service, old_by_key.get(key), new_by_key.get(key))
+
+    def blocks(self, service, old, new):
+        if old is not None and new is not None and self.old.block(old) == self.new.block(new):
+            return
+        self.compared += (old is not None) + (new is not None)
+        shown = new if new is not None else old
+        path = rule_path(shown.full_path, service)
+        if old is not None and new is not None and old.path != new.path:
+            self.renamed.append((rule_path(old.full_path, service), path))
+        for operation in OPERATIONS:
+            before, before_hash = self.old.operation(old, operation) if old is not None else ([], None)
+            after, after_hash = self.new.operation(new, operation) if new is not None else ([], None)
+            if before_hash == after_hash or (not before and not after):
+                continue
+            via = []
+            if before == after:
+                via = self._changed_functions(old, new, operation)
+            self.changes.append(RuleChange(path, operation, " || ".join(before), " || ".join(after), via, shown.line))
+        self.children(service, old.children if old is not None else [], new.children if new is not None else [])
+
+    def _changed_functions(self, old, new, operation):
+        """Names of the functions reachable from an unchanged condition whose definition changed"""
+        reach_old = self._reachable(self.old, old, operation)
+        reach_new = self._reachable(self.new, new, operation)
+        return sorted(
+            name for name in reach_old.keys() | reach_new.keys()
+            if name not in reach_old or name not in reach_new
+            or (reach_old[name].params, reach_old[name].text) != (reach_new[name].params, reach_new[name].text)
+        )
+
+    def _reachable(self, hasher, block, operation):
+        found = {}
+        pending = [(allow.condition_tokens or [], block) for allow in _granting(block, operation)]
+        while pending:
+            tokens, scope = pending.pop()
+            for name, decl in hasher.callees(tokens, scope).items():
+                if name not in found:
+                    found[name] = decl
+                    pending.append((list(decl.body_tokens) + [t for _, let in decl.lets for t in let], decl.scope))
+        return found
+
+
+def format_rule_changes(diff):
+    """Review lines: renamed match headers, changed rule functions, then one header per changed operation with its conditions"""
+    lines = []
+    for before, after in diff.renamed:
+        lines.append(f"match {before} renamed to {after}")
+    for scope, name, before, after in diff.functions:
+        lines.append(f"function {name} in {scope}")
+        if before:
+            lines.append(f"  - {before}")
+        if after:
+            lines.append(f"  + {after}")
+    for change in diff.changes:
+        via = f" via {', '.join(f'{name}()' for name in change.via)}" if change.via else ""
+        lines.append(f"{change.path}  {change.operation}  {change.kind}{via} (line {change.line})")
+        if change.before == change.after:
+            lines.append(f"    if {change.after}")
+            continue
+        if change.before:
+            lines.append(f"  - if {change.before}")
+        if change.after:
+            lines.append(f"  + if {change.after}")
+    return lines
+
+
+def read_revision(project_path, rev, rel):
+    """Text of rel at a git revision, or None when the file does not exist there"""
+    argv = ["git", "rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}"]
+    try:
+        proc = subprocess.run(argv, cwd=project_path, capture_output=True, text=True, timeout=60)
+        if proc.returncode != 0:
+            raise GitDiffError(f"unknown revision {rev!r}")
+        proc = subprocess.run(["git", "show", f"{rev}:./{rel}"], cwd=project_path,
+                              capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise GitDiffError(f"git show {rev}:{rel} failed: {e}") from e
+    return proc.stdout if proc.returncode == 0 else None
+
+
+def diff_revisions(project_path, rel, base, head=None, snapshot=None):
+    """RulesDiff of rel from git revision base to head (the working tree when None)"""
+    old_text = read_revision(project_path, base, rel)
+    if head is not None:
+        new_text = read_revision(project_path, head, rel)
+        new = parse_rules(new_text) if new_text is not None else None
+    elif snapshot is not None:
+        new = snapshot.rules(rel) if snapshot.exists(rel) else None
+    else:
+        path = Path(project_path) / rel
+        new = parse_rules(path.read_text(encoding="utf-8")) if path.exists() else None
+    return diff_rules(parse_rules(old_text) if old_text is not None else None, new)
+
+
+def changed_rule_paths(project_path, rev, changed, snapshot=None):
+    """{rules file: changed match paths} for the changed rules files that parse at both versions
+
+    A file whose rule functions changed is left out, so it counts as a
+    whole-file change: checks read function declarations directly, even
+    ones no match block calls.
+    """
+    result = {}
+    for rel in changed:
+        if not rel.endswith(".rules"):
+            continue
+        try:
+            diff = diff_revisions(project_path, rel, rev, snapshot=snapshot)
+        except ValueError:
+            # A version that does not parse is compared as a whole-file change
+            continue
+        if not diff.functions:
+            result[rel] = diff.paths
+    return result
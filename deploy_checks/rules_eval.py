@@ -0,0 +1,737 @@
+"""
+Rules Evaluator
+In-process evaluator for the subset of Firestore security rules the project
+uses: functions with let bindings, get()/exists()/getAfter(), `in`, `is`,
+list/set/map methods such as hasOnly(), request.auth, resource and
+request.resource. Allow conditions are compiled once into Python closures
+and evaluated against an in-memory DocumentStore, so a single process can
+replay large numbers of synthetic requests. Each Decision records the
+get() calls made, the distinct documents read and the allow statement that
+granted access.
+
+Error semantics follow Firestore: a failing sub-expression (null access,
+missing field, type mismatch) makes its allow statement false, except where
+`||`/`&&` short-circuit around it. `list` requests are evaluated against a
+single document, not against query constraints.
+"""
+
+import re
+
+from .rules import interpolations, tokenize
+from .rules_cost import MAX_CALL_DEPTH, OPERATION_SCOPES
+
+# Distinct documents a single-document request may access through get()/exists()
+ACCESS_CALL_LIMIT = 10
+
+OPERATIONS = ("get", "list", "create", "update", "delete")
+
+_DOCUMENT_PREFIX = re.compile(r"^/databases/[^/]+/documents/")
+
+_BINARY_PRECEDENCE = {
+    "||": 1, "&&": 2,
+    "==": 3, "!=": 3, "<": 3, "<=": 3, ">": 3, ">=": 3, "in": 3, "is": 3,
+    "+": 4, "-": 4,
+    "*": 5, "/": 5, "%": 5,
+}
+
+
+class RulesEvalError(Exception):
+    pass
+
+
+class DocumentStore:
+    """Documents keyed by their path below /databases/{db}/documents, e.g. 'users/u1'"""
+
+    def __init__(self, documents=None):
+        self.documents = dict(documents or {})
+
+    def set(self, path, data):
+        self.documents[document_key(path)] = data
+
+    def get(self, path):
+        return self.documents.get(document_key(path))
+
+    def delete(self, path):
+        self.documents.pop(document_key(path), None)
+
+    def __len__(self):
+        return len(self.documents)
+
+
+def document_key(path):
+    """'users/u1' for '/databases/(default)/documents/users/u1' (or 'users/u1' itself)"""
+    return _DOCUMENT_PREFIX.sub("", path).strip("/")
+
+
+def auth_context(uid, **claims):
+    """request.auth for a signed-in user with custom claims"""
+    return {"uid": uid, "token": dict(claims, sub=uid)}
+
+
+class Decision:
+    def __init__(self, allowed, operation, path, block, allow, get_calls, reads, errors):
+        self.allowed = allowed
+        self.operation = operation
+        self.path = path
+        self.block = block
+        self.allow = allow
+        self.get_calls = get_calls
+        self.reads = reads
+        self.errors = errors
+
+    @property
+    def rule(self):
+        """The allow statement that granted access, or None when denied"""
+        if self.allow is None:
+            return None
+        return f"{self.block.full_path} allow {', '.join(self.allow.operations)} (line {self.allow.line})"
+
+    def __repr__(self):
+        verdict = "allow" if self.allowed else "deny"
+        return f"Decision({verdict} {self.operation} {self.path}, get_calls={self.get_calls}, rule={self.rule})"
+
+
+class RulesEvaluator:
+    def __init__(self, rules, store=None, service="cloud.firestore", database="(default)"):
+        self.rules = rules
+        self.store = store if store is not None else DocumentStore()
+        self.database = database
+        self._functions = {}
+        self._blocks = []
+        service_node = rules.service(service)
+        if service_node is None:
+            raise RulesEvalError(f"rules declare no {service} service")
+        for block in sorted(rules.matches.values(), key=lambda b: b.start):
+            if not block.allows or not _in_service(block, service_node):
+                continue
+            allows = {}
+            for operation in OPERATIONS:
+                seen = set()
+                for scope in OPERATION_SCOPES[operation]:
+                    for allow in block.allows.get(scope, []):
+                        if id(allow) not in seen:
+                            seen.add(id(allow))
+                            allows.setdefault(operation, []).append((allow, self._compile_allow(allow, block)))
+            self._blocks.append((_path_pattern(block.full_path), block, allows))
+
+    def evaluate(self, operation, path, auth=None, data=None, time=0):
+        """Decide a request; data is the document as it would be after a create/update"""
+        if operation not in OPERATIONS:
+            raise ValueError(f"unknown operation {operation!r}")
+        key = document_key(path)
+        full_path = f"/databases/{self.database}/documents/{key}"
+        existing = self.store.get(key)
+        ctx = _Context(self)
+        ctx.resource = _resource(full_path, key, existing) if existing is not None else None
+        request_resource = _resource(full_path, key, data) if data is not None else None
+        ctx.request = {
+            "auth": auth, "method": operation, "path": full_path, "time": time, "resource": request_resource,
+        }
+        ctx.after = {key: data if operation != "delete" else None}
+
+        segments = full_path.strip("/").split("/")
+        errors = []
+        for pattern, block, allows in self._blocks:
+            candidates = allows.get(operation)
+            if not candidates:
+                continue
+            bindings = _match_path(pattern, segments)
+            if bindings is None:
+                continue
+            ctx.bindings = bindings
+            for allow, condition in candidates:
+                try:
+                    granted = condition(ctx, None) is True
+                except RulesEvalError as e:
+                    errors.append(f"line {allow.line}: {e}")
+                    continue
+                if granted:
+                    return Decision(True, operation, key, block, allow, ctx.get_calls, len(ctx.fetched), errors)
+        return Decision(False, operation, key, None, None, ctx.get_calls, len(ctx.fetched), errors)
+
+    def _compile_allow(self, allow, block):
+        if not allow.condition_tokens:
+            return lambda c, s: True
+        return _Compiler(self, allow.condition_tokens, (), block).compile()
+
+    def _function(self, name, block):
+        """Compiled function visible from block, as fn(ctx, args); None if undeclared"""
+        decl = _lookup(name, block, self.rules)
+        if decl is None:
+            return None
+        compiled = self._functions.get(id(decl))
+        if compiled is None:
+            compiled = self._functions[id(decl)] = _LazyFunction(self, decl)
+        return compiled
+
+
+def _in_service(block, service):
+    while block.parent is not None:
+        block = block.parent
+    return any(block is top for top in service.matches)
+
+
+def _path_pattern(full_path):
+    pattern = []
+    for segment in full_path.strip("/").split("/"):
+        if segment.startswith("{") and segment.endswith("}"):
+            name = segment[1:-1]
+            if name.endswith("=**"):
+                pattern.append(("rest", name[:-3]))
+            else:
+                pattern.append(("wild", name))
+        else:
+            pattern.append(("literal", segment))
+    return pattern
+
+
+def _match_path(pattern, segments):
+    bindings = {}
+    for i, (kind, value) in enumerate(pattern):
+        if kind == "rest":
+            bindings[value] = "/".join(segments[i:])
+            return bindings
+        if i >= len(segments):
+            return None
+        if kind == "wild":
+            bindings[value] = segments[i]
+        elif value != segments[i]:
+            return None
+    return bindings if len(pattern) == len(segments) else None
+
+
+def _lookup(name, block, rules):
+    scope = block
+    while scope is not None:
+        if name in scope.functions:
+            return scope.functions[name]
+        scope = scope.parent
+    return rules.functions.get(name)
+
+
+def _resource(full_path, key, data):
+    return {"data": data, "id": key.rsplit("/", 1)[-1], "__name__": full_path}
+
+
+class _Context:
+    __slots__ = ("evaluator", "request", "resource", "bindings", "after", "depth", "get_calls", "fetched")
+
+    def __init__(self, evaluator):
+        self.evaluator = evaluator
+        self.request = None
+        self.resource = None
+        self.bindings = {}
+        self.after = {}
+        self.depth = 0
+        self.get_calls = 0
+        self.fetched = {}
+
+    def access(self, path, after=False):
+        """Document at path (None when missing), counting the call against the access limit"""
+        if not isinstance(path, str):
+            raise RulesEvalError("document access requires a path")
+        self.get_calls += 1
+        key = document_key(path)
+        cache_key = (key, after)
+        if cache_key in self.fetched:
+            return self.fetched[cache_key]
+        if len(self.fetched) >= ACCESS_CALL_LIMIT:
+            raise RulesEvalError(f"more than {ACCESS_CALL_LIMIT} document access calls")
+        if after and key in self.after:
+            data = self.after[key]
+        else:
+            data = self.evaluator.store.get(key)
+        doc = _resource(path, key, data) if data is not None else None
+        self.fetched[cache_key] = doc
+        return doc
+
+
+class _LazyFunction:
+    """A rules function compiled on first call (functions may be declared after their callers)"""
+
+    def __init__(self, evaluator, decl):
+        self.evaluator = evaluator
+        self.decl = decl
+        self.compiled = None
+
+    def __call__(self, ctx, args):
+        if self.compiled is None:
+            decl = self.decl
+            local_names = tuple(decl.params) + tuple(name for name, _ in decl.lets)
+            lets = [(name, _Compiler(self.evaluator, tokens, local_names, decl.scope).compile())
+                    for name, tokens in decl.lets]
+            body = _Compiler(self.evaluator, decl.body_tokens, local_names, decl.scope).compile()
+            self.compiled = (tuple(decl.params), lets, body)
+        params, lets, body = self.compiled
+        if len(args) != len(params):
+            raise RulesEvalError(f"{self.decl.name}() takes {len(params)} arguments, got {len(args)}")
+        scope = dict(zip(params, args))
+        for name, let in lets:
+            scope[name] = let(ctx, scope)
+        return body(ctx, scope)
+
+
+class _Compiler:
+    """Pratt parser turning a rules expression into a closure fn(ctx, scope)"""
+
+    def __init__(self, evaluator, tokens, local_names, block):
+        self.evaluator = evaluator
+        self.tokens = tokens
+        self.local_names = set(local_names)
+        self.block = block
+        self.pos = 0
+
+    def compile(self):
+        fn = self.ternary()
+        if self.pos != len(self.tokens):
+            tok = self.tokens[self.pos]
+            raise RulesEvalError(f"line {tok.line}: unexpected {tok.value!r}")
+        return fn
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self):
+        tok = self.peek()
+        if tok is None:
+            raise RulesEvalError("unexpected end of expression")
+        self.pos += 1
+        return tok
+
+    def expect(self, value):
+        tok = self.next()
+        if tok.value != value:
+            raise RulesEvalError(f"line {tok.line}: expected {value!r}, found {tok.value!r}")
+        return tok
+
+    def accept(self, value):
+        tok = self.peek()
+        if tok is not None and tok.value == value and tok.kind in ("op", "ident"):
+            self.pos += 1
+            return True
+        return False
+
+    def ternary(self):
+        condition = self.binary(1)
+        if not self.accept("?"):
+            return condition
+        then = self.ternary()
+        self.expect(":")
+        otherwise = self.ternary()
+
+        def ternary(c, s):
+            return then(c, s) if _truth(condition(c, s)) else otherwise(c, s)
+        return ternary
+
+    def binary(self, min_precedence):
+        left = self.unary()
+        while True:
+            tok = self.peek()
+            if tok is None or tok.kind not in ("op", "ident"):
+                return left
+            precedence = _BINARY_PRECEDENCE.get(tok.value)
+            if precedence is None or precedence < min_precedence:
+                return left
+            if tok.kind == "ident" and tok.value not in ("in", "is"):
+                return left
+            self.pos += 1
+            if tok.value == "is":
+                left = _is(left, self.next().value)
+                continue
+            right = self.binary(precedence + 1)
+            left = _binary(tok.value, left, right)
+
+    def unary(self):
+        if self.accept("!"):
+            operand = self.unary()
+            return lambda c, s: not _truth(operand(c, s))
+        if self.accept("-"):
+            operand = self.unary()
+            return lambda c, s: -_number(operand(c, s))
+        return self.postfix(self.primary())
+
+    def primary(self):
+        tok = self.next()
+        kind, value = tok.kind, tok.value
+        if kind == "string":
+            constant = re.sub(r"\\(.)", r"\1", value[1:-1])
+            return lambda c, s: constant
+        if kind == "number":
+            constant = float(value) if "." in value else int(value)
+            return lambda c, s: constant
+        if kind == "path":
+            return self.path(value)
+        if value == "(" and kind == "op":
+            inner = self.ternary()
+            self.expect(")")
+            return inner
+        if value == "[" and kind == "op":
+            items = self.items("]")
+            return lambda c, s: [item(c, s) for item in items]
+        if value == "{" and kind == "op":
+            entries = []
+            while not self.accept("}"):
+                key = self.ternary()
+                self.expect(":")
+                entries.append((key, self.ternary()))
+                self.accept(",")
+            return lambda c, s: {key(c, s): item(c, s) for key, item in entries}
+        if kind == "ident":
+            if value in ("true", "false", "null"):
+                constant = {"true": True, "false": False, "null": None}[value]
+                return lambda c, s: constant
+            if self.accept("("):
+                return self.call(value, self.items(")"), tok)
+            return self.variable(value)
+        raise RulesEvalError(f"line {tok.line}: unexpected {value!r}")
+
+    def items(self, close):
+        items = []
+        while not self.accept(close):
+            items.append(self.ternary())
+            self.accept(",")
+        return items
+
+    def postfix(self, fn):
+        while True:
+            if self.accept("."):
+                name = self.next().value
+                if self.accept("("):
+                    fn = _method(fn, name, self.items(")"))
+                else:
+                    fn = _member(fn, name)
+            elif self.accept("["):
+                index = self.ternary()
+                self.expect("]")
+                fn = _index(fn, index)
+            else:
+                return fn
+
+    def variable(self, name):
+        if name in self.local_names:
+            return lambda c, s: s[name]
+        if name == "request":
+            return lambda c, s: c.request
+        if name == "resource":
+            return lambda c, s: c.resource
+        if name == "database":
+            return lambda c, s: c.evaluator.database
+
+        def wildcard(c, s):
+            try:
+                return c.bindings[name]
+            except KeyError:
+                raise RulesEvalError(f"unknown variable {name}") from None
+        return wildcard
+
+    def call(self, name, args, tok):
+        if name in ("get", "getAfter", "exists", "existsAfter"):
+            if len(args) != 1:
+                raise RulesEvalError(f"line {tok.line}: {name}() takes one path")
+            path = args[0]
+            after = name.endswith("After")
+            if name.startswith("exists"):
+                return lambda c, s: c.access(path(c, s), after) is not None
+
+            def access(c, s):
+                return c.access(path(c, s), after)
+            return access
+        if name in _GLOBALS:
+            builtin = _GLOBALS[name]
+
+            def global_call(c, s):
+                try:
+                    return builtin(*[arg(c, s) for arg in args])
+                except (TypeError, ValueError) as e:
+                    raise RulesEvalError(f"{name}(): {e}") from None
+            return global_call
+        function = self.evaluator._function(name, self.block)
+        if function is None:
+            raise RulesEvalError(f"line {tok.line}: undefined function {name}()")
+
+        def call(c, s):
+            values = [arg(c, s) for arg in args]
+            if c.depth >= MAX_CALL_DEPTH:
+                raise RulesEvalError(f"function calls nested deeper than {MAX_CALL_DEPTH}")
+            c.depth += 1
+            try:
+                return function(c, values)
+            finally:
+                c.depth -= 1
+        return call
+
+    def path(self, text):
+        """A path literal, with each $(expr) compiled and interpolated at evaluation time"""
+        parts = []
+        last = 0
+        for start, end in interpolations(text):
+            if start > last:
+                literal = text[last:start]
+                parts.append(lambda c, s, literal=literal: literal)
+            inner = _Compiler(self.evaluator, tokenize(text[start + 2:end - 1]), self.local_names, self.block)
+            expr = inner.compile()
+            parts.append(lambda c, s, expr=expr: _segment(expr(c, s)))
+            last = end
+        if last < len(text):
+            literal = text[last:]
+            parts.append(lambda c, s: literal)
+        return lambda c, s: "".join(part(c, s) for part in parts)
+
+
+def _truth(value):
+    if value is True or value is False:
+        return value
+    raise RulesEvalError(f"expected a bool, got {_type_name(value)}")
+
+
+def _number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    raise RulesEvalError(f"expected a number, got {_type_name(value)}")
+
+
+def _segment(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    raise RulesEvalError(f"cannot interpolate {_type_name(value)} into a path")
+
+
+def _binary(op, left, right):
+    if op == "||":
+        def or_(c, s):
+            try:
+                if _truth(left(c, s)):
+                    return True
+                failed = None
+            except RulesEvalError as e:
+                failed = e
+            if _truth(right(c, s)):
+                return True
+            if failed is not None:
+                raise failed
+            return False
+        return or_
+    if op == "&&":
+        def and_(c, s):
+            try:
+                if not _truth(left(c, s)):
+                    return False
+                failed = None
+            except RulesEvalError as e:
+                failed = e
+            if not _truth(right(c, s)):
+                return False
+            if failed is not None:
+                raise failed
+            return True
+        return and_
+    if op == "==":
+        return lambda c, s: _equal(left(c, s), right(c, s))
+    if op == "!=":
+        return lambda c, s: not _equal(left(c, s), right(c, s))
+    if op == "in":
+        return lambda c, s: _contains(right(c, s), left(c, s))
+    if op == "+":
+        return lambda c, s: _add(left(c, s), right(c, s))
+    compare = _ARITHMETIC[op]
+
+    def arithmetic(c, s):
+        a, b = left(c, s), right(c, s)
+        if type(a) is not type(b) and not (isinstance(a, (int, float)) and isinstance(b, (int, float))):
+            raise RulesEvalError(f"cannot apply {op} to {_type_name(a)} and {_type_name(b)}")
+        try:
+            return compare(a, b)
+        except (TypeError, ZeroDivisionError) as e:
+            raise RulesEvalError(str(e)) from None
+    return arithmetic
+
+
+_ARITHMETIC = {
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "-": lambda a, b: _number(a) - _number(b),
+    "*": lambda a, b: _number(a) * _number(b),
+    "/": lambda a, b: _number(a) / _number(b) if isinstance(a, float) or isinstance(b, float) else int(a / b),
+    "%": lambda a, b: _number(a) % _number(b),
+}
+
+
+def _equal(a, b):
+    if isinstance(a, bool) != isinstance(b, bool):
+        return False
+    return a == b
+
+
+def _add(a, b):
+    if isinstance(a, str) and isinstance(b, str):
+        return a + b
+    if isinstance(a, list) and isinstance(b, list):
+        return a + b
+    return _number(a) + _number(b)
+
+
+def _contains(container, item):
+    if isinstance(container, dict):
+        return item in container
+    if isinstance(container, (list, frozenset)):
+        return any(_equal(item, element) for element in container)
+    raise RulesEvalError(f"'in' needs a list, set or map, got {_type_name(container)}")
+
+
+_TYPE_CHECKS = {
+    "string": lambda v: isinstance(v, str),
+    "int": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "float": lambda v: isinstance(v, float),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "bool": lambda v: isinstance(v, bool),
+    "map": lambda v: isinstance(v, dict),
+    "list": lambda v: isinstance(v, list),
+    "set": lambda v: isinstance(v, frozenset),
+    "path": lambda v: isinstance(v, str) and v.startswith("/"),
+    "null": lambda v: v is None,
+}
+
+
+def _is(fn, type_name):
+    check = _TYPE_CHECKS.get(type_name)
+    if check is None:
+        raise RulesEvalError(f"unsupported type check 'is {type_name}'")
+    return lambda c, s: check(fn(c, s))
+
+
+def _type_name(value):
+    if value is None:
+        return "null"
+    for name in ("bool", "int", "float", "string", "map", "list", "set"):
+        if _TYPE_CHECKS[name](value):
+            return name
+    return type(value).__name__
+
+
+def _member(fn, name):
+    def member(c, s):
+        value = fn(c, s)
+        if type(value) is dict:
+            try:
+                return value[name]
+            except KeyError:
+                raise RulesEvalError(f"property {name} is undefined") from None
+        raise RulesEvalError(f"property {name} of {_type_name(value)}")
+    return member
+
+
+def _index(fn, index):
+    def item(c, s):
+        value, key = fn(c, s), index(c, s)
+        try:
+            return value[key]
+        except (KeyError, IndexError, TypeError):
+            raise RulesEvalError(f"no element {key!r} in {_type_name(value)}") from None
+    return item
+
+
+def _method(fn, name, args):
+    def method(c, s):
+        receiver = fn(c, s)
+        values = [arg(c, s) for arg in args]
+        if isinstance(receiver, (list, frozenset)):
+            table = _LIST_METHODS
+        elif isinstance(receiver, dict):
+            table = _MAP_METHODS
+        elif isinstance(receiver, str):
+            table = _STRING_METHODS
+        elif isinstance(receiver, _MapDiff):
+            table = _DIFF_METHODS
+        else:
+            table = {}
+        impl = table.get(name)
+        if impl is None:
+            raise RulesEvalError(f"no method {name}() on {_type_name(receiver)}")
+        try:
+            return impl(receiver, *values)
+        except (TypeError, ValueError, re.error) as e:
+            raise RulesEvalError(f"{name}(): {e}") from None
+    return method
+
+
+def _as_list(value):
+    if isinstance(value, (list, frozenset)):
+        return value
+    raise RulesEvalError(f"expected a list or set, got {_type_name(value)}")
+
+
+def _to_set(values):
+    try:
+        return frozenset(values)
+    except TypeError:
+        raise RulesEvalError("set elements must be hashable") from None
+
+
+class _MapDiff:
+    def __init__(self, before, after):
+        self.before = before
+        self.after = after
+
+    def added(self):
+        return _to_set(k for k in self.after if k not in self.before)
+
+    def removed(self):
+        return _to_set(k for k in self.before if k not in self.after)
+
+    def changed(self):
+        return _to_set(k for k in self.after if k in self.before and not _equal(self.before[k], self.after[k]))
+
+    def unchanged(self):
+        return _to_set(k for k in self.after if k in self.before and _equal(self.before[k], self.after[k]))
+
+
+_LIST_METHODS = {
+    "hasOnly": lambda r, other: all(_contains(_as_list(other), x) for x in r),
+    "hasAny": lambda r, other: any(_contains(_as_list(other), x) for x in r),
+    "hasAll": lambda r, other: all(_contains(r, x) for x in _as_list(other)),
+    "size": lambda r: len(r),
+    "toSet": lambda r: _to_set(r),
+    "join": lambda r, sep: sep.join(r),
+    "concat": lambda r, other: list(r) + list(_as_list(other)),
+    "removeAll": lambda r, other: [x for x in r if not _contains(_as_list(other), x)],
+    "difference": lambda r, other: _to_set(x for x in r if not _contains(_as_list(other), x)),
+    "intersection": lambda r, other: _to_set(x for x in r if _contains(_as_list(other), x)),
+    "union": lambda r, other: _to_set(list(r) + list(_as_list(other))),
+}
+
+_MAP_METHODS = {
+    "keys": lambda r: list(r),
+    "values": lambda r: list(r.values()),
+    "size": lambda r: len(r),
+    "get": lambda r, key, default: r.get(key, default),
+    "diff": lambda r, other: _MapDiff(r, other),
+}
+
+_STRING_METHODS = {
+    "size": lambda r: len(r),
+    "lower": lambda r: r.lower(),
+    "upper": lambda r: r.upper(),
+    "trim": lambda r: r.strip(),
+    "split": lambda r, sep: re.split(sep, r),
+    "matches": lambda r, pattern: re.fullmatch(pattern, r) is not None,
+}
+
+_DIFF_METHODS = {
+    "addedKeys": _MapDiff.added,
+    "removedKeys": _MapDiff.removed,
+    "changedKeys": _MapDiff.changed,
+    "unchangedKeys": _MapDiff.unchanged,
+    "affectedKeys": lambda d: d.added() | d.removed() | d.changed(),
+}
+
+
+_GLOBALS = {
+    "debug": lambda v: v,
+    "string": lambda v: "null" if v is None else str(v).lower() if isinstance(v, bool) else str(v),
+    "int": lambda v: int(_number(v) if not isinstance(v, str) else v),
+    "float": lambda v: float(_number(v) if not isinstance(v, str) else v),
+}
@@ -0,0 +1,134 @@
+"""
+Source Pattern Scanner
+Walks the TypeScript source trees once and runs every registered pattern in
+a single combined regex pass per file, so scan cost grows with the total
+bytes scanned rather than bytes times the number of patterns. Matches are
+collected per pattern name for the checks that registered them.
+
+Patterns are tried as one alternation, so matches are non-overlapping:
+register patterns that cannot start inside each other's matches. Each
+pattern is wrapped in a group named after it, so its own groups must be
+plain capturing or non-capturing ones: named groups and backreferences
+would clash or be renumbered inside the combination and are rejected.
+"""
+
+import re
+
+
+class SourceMatch:
+    __slots__ = ("path", "rel_path", "line", "text", "groups")
+
+    def __init__(self, path, rel_path, line, text, groups):
+        self.path = path
+        self.rel_path = rel_path
+        self.line = line
+        self.text = text
+        self.groups = groups
+
+    def __repr__(self):
+        return f"SourceMatch({self.rel_path}:{self.line} {self.text!r})"
+
+
+class SourceScanner:
+    DEFAULT_ROOTS = ("functions/src", "src")
+    EXTENSIONS = (".ts", ".tsx")
+
+    def __init__(self, snapshot, roots=DEFAULT_ROOTS, extensions=EXTENSIONS):
+        self.snapshot = snapshot
+        self.roots = tuple(roots)
+        self.extensions = tuple(extensions)
+        self._patterns = {}
+        self._combined = {}
+        self.files_scanned = 0
+        self.bytes_scanned = 0
+
+    def register(self, name, pattern, roots=None, literal=False):
+        """Register a regex (or a literal string) under name, optionally limited to some roots"""
+        if not name.isidentifier():
+            raise ValueError(f"pattern name must be an identifier: {name!r}")
+        source = re.escape(pattern) if literal else pattern
+        compiled = re.compile(source)
+        if compiled.groupindex or _refers_to_groups(source):
+            raise ValueError(f"pattern {name!r} uses named groups or backreferences, which cannot be combined")
+        self._patterns[name] = (compiled, tuple(roots or self.roots))
+        self._combined.clear()
+
+    def register_literals(self, name, literals, roots=None):
+        """Register a set of literal strings as one pattern"""
+        alternation = "|".join(re.escape(text) for text in sorted(literals, key=len, reverse=True))
+        self.register(name, alternation, roots)
+
+    def files(self):
+        """Source files under any registered root, each listed once"""
+        roots = sorted({root for _, pattern_roots in self._patterns.values() for root in pattern_roots})
+        seen = set()
+        for root in roots:
+            for extension in self.extensions:
+                for path in self.snapshot.glob(f"{root}/**/*{extension}"):
+                    if path not in seen and "node_modules" not in path.parts:
+                        seen.add(path)
+        return sorted(seen)
+
+    def scan(self):
+        """Run all registered patterns over all files; returns {name: [SourceMatch]}"""
+        results = {name: [] for name in self._patterns}
+        for path in self.files():
+            names = self._names_for(path)
+            if not names:
+                continue
+            combined = self._combined_for(names)
+            text = self.snapshot.text(path)
+            self.files_scanned += 1
+            self.bytes_scanned += len(text)
+            rel_path = path.relative_to(self.snapshot.project_path).as_posix()
+            line, counted = 1, 0
+            for m in combined.finditer(text):
+                name = m.lastgroup
+                line += text.count("\n", counted, m.start())
+                counted = m.start()
+                matched = m.group(name)
+                # Re-match the hit alone to recover the pattern's own capture groups
+                inner = self._patterns[name][0].fullmatch(matched)
+                groups = inner.groups() if inner else ()
+                results[name].append(SourceMatch(path, rel_path, line, matched, groups))
+        return results
+
+    def _names_for(self, path):
+        rel = path.relative_to(self.snapshot.project_path).as_posix()
+        return tuple(
+            name for name, (_, roots) in self._patterns.items()
+            if any(rel.startswith(root.rstrip("/") + "/") for root in roots)
+        )
+
+    def _combined_for(self, names):
+        combined = self._combined.get(names)
+        if combined is None:
+            # The named wrapper closes last, so lastgroup names the pattern whatever groups it has inside
+            parts = [f"(?P<{name}>{self._patterns[name][0].pattern})" for name in names]
+            combined = self._combined[names] = re.compile("|".join(parts))
+        return combined
+
+
+def _refers_to_groups(pattern):
+    """Whether pattern refers to a group by number or name (\\1, (?P=name), (?(1)...))"""
+    i, in_class = 0, False
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            if not in_class and pattern[i + 1:i + 2] in tuple("123456789"):
+                return True
+            i += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+            # A ']' first in the class (after an optional '^') is literal
+            if pattern.startswith("^", i + 1):
+                i += 1
+            if pattern.startswith("]", i + 1):
+                i += 1
+        elif pattern.startswith(("(?P=", "(?("), i):
+            return True
+        i += 1
+    return False
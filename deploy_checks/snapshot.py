@@ -0,0 +1,225 @@
+"""
+Project Snapshot
+Lazily loaded, content-hashed view of the project files the validators read.
+Each artifact is read, hashed and parsed at most once per run (or, in watch
+mode, once per change to the file). Snapshots of several projects can share
+an ArtifactStore, which memoizes parses by content hash so a lockfile or
+rules file that is identical across checkouts is parsed once for all of them.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+
+from .rules import parse_rules
+
+ARTIFACT_FORMAT = 1
+
+
+class ArtifactStore:
+    """Parse results keyed by (kind, project-relative path, content digest)
+
+    Kept in memory, and also pickled under directory (when given) so worker
+    processes validating other checkouts reuse each other's parses. Parse
+    errors are only kept in memory.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory) if directory is not None else None
+        self._parsed = {}
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, key, text, parser):
+        """(result, error) for key, calling parser(text()) only when no process has stored it yet"""
+        entry = self._parsed.get(key)
+        if entry is None:
+            entry = self._load(key)
+            if entry is None:
+                self.misses += 1
+                try:
+                    entry = (parser(text()), None)
+                except Exception as e:
+                    entry = (None, e)
+                else:
+                    self._store(key, entry[0])
+            self._parsed[key] = entry
+        else:
+            self.hits += 1
+        return entry
+
+    def prune(self, max_age):
+        """Delete stored artifacts not written or loaded within max_age seconds"""
+        if self.directory is None:
+            return
+        cutoff = time.time() - max_age
+        for path in self.directory.glob("*.pickle"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+    def _file(self, key):
+        name = hashlib.sha256(json.dumps([ARTIFACT_FORMAT, _package_digest(), *key]).encode()).hexdigest()
+        return self.directory / f"{name}.pickle"
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        path = self._file(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+            os.utime(path)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        self.hits += 1
+        return (result, None)
+
+    def _store(self, key, result):
+        if self.directory is None:
+            return
+        try:
+            data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError, RecursionError):
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._file(key))
+        except OSError:
+            return
+
+
+_package_digests = []
+
+
+def _package_digest():
+    """Hash of this package's sources, so a parser change invalidates stored artifacts"""
+    if not _package_digests:
+        h = hashlib.sha256()
+        for path in sorted(Path(__file__).parent.glob("*.py")):
+            h.update(path.read_bytes())
+        _package_digests.append(h.hexdigest())
+    return _package_digests[0]
+
+
+class ProjectSnapshot:
+    _shared = {}
+
+    def __init__(self, project_path="/app", artifacts=None):
+        self.project_path = Path(project_path)
+        self.artifacts = artifacts
+        self._bytes = {}
+        self._text = {}
+        self._digests = {}
+        self._parsed = {}
+        self.bytes_read = 0
+
+    @classmethod
+    def shared(cls, project_path="/app"):
+        """Return the snapshot shared by every validator of project_path"""
+        key = str(Path(project_path).resolve())
+        snapshot = cls._shared.get(key)
+        if snapshot is None:
+            snapshot = cls._shared[key] = cls(project_path)
+        return snapshot
+
+    def forget(self, rel_paths=None):
+        """Drop what was loaded for rel_paths (everything when None) so it is read again from disk"""
+        if rel_paths is None:
+            self._bytes.clear()
+            self._text.clear()
+            self._digests.clear()
+            self._parsed.clear()
+            return
+        paths = {self.path(rel_path) for rel_path in rel_paths}
+        for store in (self._bytes, self._text, self._digests):
+            for path in paths:
+                store.pop(path, None)
+        for key in [key for key in self._parsed if key[0] in paths]:
+            del self._parsed[key]
+
+    def path(self, rel_path):
+        """Resolve a project-relative (or absolute) path"""
+        path = Path(rel_path)
+        if not path.is_absolute():
+            path = self.project_path / path
+        return path
+
+    def _relative(self, path):
+        try:
+            return path.relative_to(self.project_path).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    def glob(self, pattern):
+        """Project paths matching a glob pattern (or a plain path), sorted"""
+        if not any(ch in pattern for ch in "*?["):
+            path = self.path(pattern)
+            return [path] if path.exists() else []
+        return sorted(p for p in self.project_path.glob(pattern) if p.is_file())
+
+    def exists(self, rel_path):
+        """Check whether a file exists, answering from memory when already loaded"""
+        path = self.path(rel_path)
+        return path in self._bytes or path.exists()
+
+    def read_bytes(self, rel_path):
+        """Raw file contents, read from disk only once"""
+        path = self.path(rel_path)
+        data = self._bytes.get(path)
+        if data is None:
+            data = self._bytes[path] = path.read_bytes()
+            self.bytes_read += len(data)
+        return data
+
+    def text(self, rel_path):
+        """File contents decoded as UTF-8"""
+        path = self.path(rel_path)
+        content = self._text.get(path)
+        if content is None:
+            content = self._text[path] = self.read_bytes(path).decode("utf-8")
+        return content
+
+    def digest(self, rel_path):
+        """SHA-256 of the file contents"""
+        path = self.path(rel_path)
+        digest = self._digests.get(path)
+        if digest is None:
+            digest = self._digests[path] = hashlib.sha256(self.read_bytes(path)).hexdigest()
+        return digest
+
+    def json(self, rel_path):
+        """File contents parsed as JSON"""
+        return self.parsed(rel_path, "json", json.loads)
+
+    def rules(self, rel_path):
+        """File contents parsed as Firestore/Storage security rules"""
+        return self.parsed(rel_path, "rules", parse_rules)
+
+    def parsed(self, rel_path, kind, parser):
+        """Parse a file once with parser(text) and memoize the result (or the error) under kind"""
+        path = self.path(rel_path)
+        key = (path, kind)
+        if key not in self._parsed:
+            if self.artifacts is not None:
+                artifact = (kind, self._relative(path), self.digest(path))
+                self._parsed[key] = self.artifacts.parse(artifact, lambda: self.text(path), parser)
+            else:
+                content = self.text(path)
+                try:
+                    self._parsed[key] = (parser(content), None)
+                except Exception as e:
+                    self._parsed[key] = (None, e)
+        result, error = self._parsed[key]
+        if error is not None:
+            raise error
+        return result
@@ -0,0 +1,264 @@
+"""
+Emulator Stand-in
+A local HTTP server standing in for the Functions and Firestore emulators
+when they are not available. It serves clockInV2/clockOutV2 with the same
+transaction bodies as functions/src/http/timesheet.ts over an in-memory,
+versioned document store, plus the Firestore REST commit endpoint the load
+harness uses for seeding and notification counter increments.
+
+Transactions are optimistic: a commit fails when a document read by the
+transaction was written since, and is retried with backoff up to
+max_attempts times like the Admin SDK's runTransaction. Each response
+carries the number of attempts in an x-transaction-attempts header.
+"""
+
+import asyncio
+import json
+import random
+import uuid
+
+from .load import ATTEMPTS_HEADER, from_value, token_uid
+
+_HTTP_STATUS = {
+    "OK": 200, "INVALID_ARGUMENT": 400, "FAILED_PRECONDITION": 400, "UNAUTHENTICATED": 401,
+    "NOT_FOUND": 404, "ABORTED": 409, "INTERNAL": 500,
+}
+
+
+class CallableError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class TransactionConflict(Exception):
+    pass
+
+
+class StandInStore:
+    """Versioned in-memory documents with simulated RPC latency"""
+
+    def __init__(self, latency=0.002, jitter=0.5, seed=0):
+        self.documents = {}
+        self.versions = {}
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.commits = 0
+        self.conflicts = 0
+
+    async def rpc(self):
+        """One simulated round trip to the database"""
+        if self.latency > 0:
+            spread = self.latency * self.jitter
+            await asyncio.sleep(max(0.0, self.rng.uniform(self.latency - spread, self.latency + spread)))
+
+    def read(self, path):
+        return self.versions.get(path, 0), self.documents.get(path)
+
+    def apply(self, writes):
+        for path, kind, data in writes:
+            if kind == "set":
+                self.documents[path] = dict(data)
+            elif kind == "update":
+                if path not in self.documents:
+                    raise CallableError("NOT_FOUND", f"No document to update: {path}")
+                self.documents[path].update(data)
+            elif kind == "increment":
+                document = self.documents.setdefault(path, {})
+                for field, amount in data.items():
+                    document[field] = document.get(field, 0) + amount
+            self.versions[path] = self.versions.get(path, 0) + 1
+        self.commits += 1
+
+    async def run_transaction(self, body, max_attempts=5, backoff=0.01):
+        """Run body(transaction) until it commits; returns (result, attempts)"""
+        attempt = 0
+        while True:
+            attempt += 1
+            transaction = _Transaction(self)
+            result = await body(transaction)
+            await self.rpc()
+            # Commit validation and apply run without awaiting, so they are atomic
+            if all(self.versions.get(path, 0) == version for path, version in transaction.reads.items()):
+                self.apply(transaction.writes)
+                return result, attempt
+            self.conflicts += 1
+            if attempt >= max_attempts:
+                raise TransactionConflict(f"transaction aborted after {attempt} attempts")
+            await asyncio.sleep(self.rng.uniform(0, backoff * 2 ** (attempt - 1)))
+
+
+class _Transaction:
+    def __init__(self, store):
+        self.store = store
+        self.reads = {}
+        self.writes = []
+
+    async def get(self, path):
+        await self.store.rpc()
+        version, data = self.store.read(path)
+        self.reads.setdefault(path, version)
+        return dict(data) if data is not None else None
+
+    def set(self, path, data):
+        self.writes.append((path, "set", data))
+
+    def update(self, path, data):
+        self.writes.append((path, "update", data))
+
+
+async def clock_in(store, uid, max_attempts):
+    user_path = f"users/{uid}"
+    timesheet_id = uuid.uuid4().hex[:20]
+
+    async def body(transaction):
+        user = await transaction.get(user_path)
+        if user is None:
+            raise CallableError("NOT_FOUND", "User profile not found.")
+        if user.get("attendanceStatus") == "clockedIn":
+            raise CallableError("FAILED_PRECONDITION", "User is already clocked in.")
+        transaction.update(user_path, {
+            "attendanceStatus": "clockedIn", "lastClockIn": _now(), "activeTimesheetId": timesheet_id,
+        })
+        transaction.set(f"timesheets/{timesheet_id}", {
+            "userId": uid, "clockInTime": _now(), "clockOutTime": None, "status": "open",
+        })
+        transaction.set(f"auditLogs/{uuid.uuid4().hex[:20]}", {
+            "ts": _now(), "actorUid": uid, "action": "timesheet.clockIn", "targetRef": f"timesheets/{timesheet_id}",
+            "before": {"status": user.get("attendanceStatus") or "clockedOut"}, "after": {"status": "clockedIn"},
+        })
+        return {"success": True, "timesheetId": timesheet_id}
+
+    return await store.run_transaction(body, max_attempts)
+
+
+async def clock_out(store, uid, max_attempts):
+    user_path = f"users/{uid}"
+
+    async def body(transaction):
+        user = await transaction.get(user_path)
+        if user is None:
+            raise CallableError("NOT_FOUND", "User profile not found.")
+        if user.get("attendanceStatus") != "clockedIn" or not user.get("activeTimesheetId"):
+            raise CallableError("FAILED_PRECONDITION", "User is not clocked in or no active timesheet found.")
+        timesheet_path = f"timesheets/{user['activeTimesheetId']}"
+        transaction.update(user_path, {"attendanceStatus": "clockedOut", "activeTimesheetId": None})
+        transaction.update(timesheet_path, {"clockOutTime": _now(), "status": "closed"})
+        transaction.set(f"auditLogs/{uuid.uuid4().hex[:20]}", {
+            "ts": _now(), "actorUid": uid, "action": "timesheet.clockOut", "targetRef": timesheet_path,
+            "before": {"status": "open"}, "after": {"status": "closed"},
+        })
+        return {"success": True}
+
+    return await store.run_transaction(body, max_attempts)
+
+
+CALLABLES = {"clockInV2": clock_in, "clockOutV2": clock_out}
+
+
+def _now():
+    return asyncio.get_running_loop().time()
+
+
+class StandInServer:
+    """Serves /{project}/{region}/{callable} and /v1/projects/{project}/databases/(default)/documents:commit"""
+
+    def __init__(self, store=None, max_attempts=5, host="127.0.0.1", port=0):
+        self.store = store or StandInStore()
+        self.max_attempts = max_attempts
+        self.host = host
+        self.port = port
+        self._server = None
+        self._connections = {}
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in self._connections.values():
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload, extra = await self._dispatch(path, headers, body)
+                data = json.dumps(payload).encode()
+                lines = [f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}",
+                         "Content-Type: application/json", f"Content-Length: {len(data)}"]
+                lines += [f"{name}: {value}" for name, value in extra.items()]
+                writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + data)
+                await writer.drain()
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def _dispatch(self, path, headers, body):
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            return 400, {"error": {"status": "INVALID_ARGUMENT", "message": "Body is not JSON"}}, {}
+        if path.endswith("/documents:commit"):
+            self.store.apply([_rest_write(write) for write in payload.get("writes", [])])
+            return 200, {"writeResults": []}, {}
+
+        name = path.rstrip("/").rsplit("/", 1)[-1]
+        handler = CALLABLES.get(name)
+        if handler is None:
+            return 404, {"error": {"status": "NOT_FOUND", "message": f"Function {name} does not exist"}}, {}
+        auth = headers.get("authorization", "")
+        uid = token_uid(auth[7:]) if auth.startswith("Bearer ") else None
+        if uid is None:
+            return 401, {"error": {"status": "UNAUTHENTICATED", "message": "Authentication required."}}, {}
+        try:
+            result, attempts = await handler(self.store, uid, self.max_attempts)
+        except CallableError as e:
+            return _HTTP_STATUS.get(e.status, 500), {"error": {"status": e.status, "message": str(e)}}, {}
+        except TransactionConflict:
+            # timesheet.ts turns any non-HttpsError into "internal"
+            return 500, {"error": {"status": "INTERNAL", "message": "An internal error occurred."}}, \
+                {ATTEMPTS_HEADER: self.max_attempts}
+        return 200, {"result": result}, {ATTEMPTS_HEADER: attempts}
+
+
+def _rest_write(write):
+    """(path, kind, data) for a Firestore REST update or increment transform"""
+    if "update" in write:
+        document = write["update"]
+        fields = {key: from_value(value) for key, value in document.get("fields", {}).items()}
+        return _document_path(document["name"]), "set", fields
+    transform = write["transform"]
+    increments = {
+        t["fieldPath"]: from_value(t["increment"]) for t in transform.get("fieldTransforms", []) if "increment" in t
+    }
+    return _document_path(transform["document"]), "increment", increments
+
+
+def _document_path(name):
+    return name.split("/documents/", 1)[-1]
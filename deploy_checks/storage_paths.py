@@ -0,0 +1,384 @@
+"""
+Storage Path Coverage
+Cross-checks the object paths the code reads and writes against
+storage.rules. The rules' match paths (below /b/{bucket}/o) are compiled
+into a trie of literal, {wildcard} and {rest=**} segments; the path
+templates built at Cloud Storage call sites (Admin SDK `.file(path)` and
+client SDK `ref(storage, path)`) are extracted from the sources with each
+`${...}` interpolation as a wildcard segment, and every template walks
+the trie once. A client path whose matching rules do not grant its
+operation is denied (clients retry the upload); Admin SDK calls bypass
+the rules, so their paths are only reported. A rule no path reaches is
+unused.
+"""
+
+from .rules import parse_rules
+from .ts_source import call_args, string_value, tokenize_ts
+
+# Stands in for an interpolated expression inside a path template
+DYNAMIC = None
+
+# Admin SDK File methods and the rules operation each one needs
+FILE_METHODS = {
+    "getSignedUrl": "read",
+    "download": "read",
+    "createReadStream": "read",
+    "getMetadata": "read",
+    "exists": "read",
+    "save": "write",
+    "createWriteStream": "write",
+    "createResumableUpload": "write",
+    "setMetadata": "write",
+    "delete": "delete",
+}
+
+# Client SDK functions taking a StorageReference first
+CLIENT_FUNCTIONS = {
+    "getDownloadURL": "read",
+    "getBytes": "read",
+    "getBlob": "read",
+    "getStream": "read",
+    "getMetadata": "read",
+    "list": "read",
+    "listAll": "read",
+    "uploadBytes": "write",
+    "uploadBytesResumable": "write",
+    "uploadString": "write",
+    "updateMetadata": "write",
+    "deleteObject": "delete",
+}
+
+# Rules methods that grant each operation
+GRANTING_METHODS = {
+    "read": ("read", "get"),
+    "write": ("write", "create", "update"),
+    "delete": ("write", "delete"),
+}
+
+# Identifiers followed back to their initializer when they hold a path
+_RESOLVE_DEPTH = 3
+
+
+class StoragePath:
+    """A path template used at one call site; segments are literals or DYNAMIC"""
+
+    def __init__(self, source, line, operation, template, segments, client=True):
+        self.source = source
+        self.line = line
+        self.operation = operation
+        self.template = template
+        self.segments = segments
+        # False for Admin SDK `.file()` call sites, which storage.rules do not apply to
+        self.client = client
+
+    @property
+    def location(self):
+        return f"{self.source}:{self.line}"
+
+    @property
+    def resolved(self):
+        """Whether anything of the path is known statically (not one opaque expression)"""
+        return self.segments is not None and any(seg is not DYNAMIC for seg in self.segments)
+
+    def __repr__(self):
+        return f"StoragePath({self.operation} {self.template} @ {self.location})"
+
+
+class _RuleNode:
+    __slots__ = ("children", "wildcard", "rest", "blocks")
+
+    def __init__(self):
+        self.children = {}
+        self.wildcard = None
+        self.rest = []
+        self.blocks = []
+
+
+class StorageRuleTrie:
+    """Match blocks of the firebase.storage service keyed by their object path"""
+
+    def __init__(self, rules):
+        self.root = _RuleNode()
+        self.blocks = []
+        service = rules.service("firebase.storage")
+        stack = list(reversed(service.matches)) if service else []
+        while stack:
+            block = stack.pop()
+            if block.allows:
+                self._insert(block)
+            stack.extend(reversed(block.children))
+        self.blocks.sort(key=lambda b: b.line)
+
+    def _insert(self, block):
+        node = self.root
+        for segment in object_segments(block.full_path):
+            if segment.endswith("=**}"):
+                node.rest.append(block)
+                break
+            if segment.startswith(("{", "$(")):
+                node.wildcard = node.wildcard or _RuleNode()
+                node = node.wildcard
+            else:
+                node = node.children.setdefault(segment, _RuleNode())
+        else:
+            node.blocks.append(block)
+        self.blocks.append(block)
+
+    def match(self, segments):
+        """Match blocks (in source order) whose path can match every object the segments describe"""
+        matched = []
+        active = [self.root]
+        for segment in segments:
+            following = []
+            for node in active:
+                matched.extend(node.rest)
+                if segment is not DYNAMIC and segment in node.children:
+                    following.append(node.children[segment])
+                if node.wildcard is not None:
+                    following.append(node.wildcard)
+            active = following
+        for node in active:
+            matched.extend(node.blocks)
+            matched.extend(node.rest)
+        unique = {id(block): block for block in matched}
+        return sorted(unique.values(), key=lambda b: b.line)
+
+
+def object_segments(full_path):
+    """Segments of a storage match path below the /b/{bucket}/o service root"""
+    segments = [seg for seg in full_path.split("/") if seg]
+    if len(segments) >= 3 and segments[0] == "b" and segments[1].startswith("{") and segments[2] == "o":
+        segments = segments[3:]
+    return segments
+
+
+def grants(block, operation):
+    """Whether block has an allow for operation whose condition is not literally false"""
+    return any(
+        condition != "false"
+        for method in GRANTING_METHODS[operation]
+        for condition in block.allow_conditions(method)
+    )
+
+
+def load_storage_trie(snapshot, rel="storage.rules"):
+    """StorageRuleTrie of a rules file, built once per snapshot"""
+    return snapshot.parsed(rel, "storage-trie", lambda text: StorageRuleTrie(parse_rules(text)))
+
+
+def storage_paths(source, text):
+    """StoragePath of every Cloud Storage call site in one TypeScript/TSX file"""
+    tokens = tokenize_ts(text)
+    paths = []
+    for i, tok in enumerate(tokens):
+        if tok.kind != "ident" or i + 1 >= len(tokens) or tokens[i + 1].value != "(":
+            continue
+        dotted = i > 0 and tokens[i - 1].value in (".", "?.")
+        client = not dotted
+        if tok.value == "file" and dotted:
+            args, after = call_args(tokens, i + 1)
+            operation = _file_operation(tokens, after)
+            arg = args[0] if args else None
+        elif tok.value == "ref" and not dotted:
+            args, _ = call_args(tokens, i + 1)
+            if len(args) < 2:
+                continue
+            operation = _ref_operation(tokens, i)
+            arg = args[1]
+        else:
+            continue
+        if operation is None or arg is None:
+            continue
+        template, segments = _template(tokens, arg, i, _RESOLVE_DEPTH)
+        paths.append(StoragePath(source, tok.line, operation, template, segments, client))
+    return paths
+
+
+def _file_operation(tokens, after):
+    """Operation of `.file(...).method(...)`, reading getSignedUrl's action option"""
+    if after + 2 >= len(tokens) or tokens[after].value not in (".", "?."):
+        return None
+    method = tokens[after + 1].value
+    operation = FILE_METHODS.get(method)
+    if method == "getSignedUrl" and tokens[after + 2].value == "(":
+        args, _ = call_args(tokens, after + 2)
+        options = args[0] if args else []
+        if len(options) == 1 and options[0].kind == "ident":
+            options = _initializer(tokens, options[0].value, after)[1] or []
+        action = _property(options, "action")
+        if action in ("read", "write", "delete"):
+            operation = action
+        elif action == "resumable":
+            operation = "write"
+    return operation
+
+
+def _ref_operation(tokens, i):
+    """Operation of `fn(ref(...))`, or of the first client call on the variable the ref is assigned to"""
+    if i >= 2 and tokens[i - 1].value == "(" and tokens[i - 2].value in CLIENT_FUNCTIONS:
+        return CLIENT_FUNCTIONS[tokens[i - 2].value]
+    if i >= 2 and tokens[i - 1].value == "=" and tokens[i - 2].kind == "ident":
+        name = tokens[i - 2].value
+        for j in range(i + 1, len(tokens) - 2):
+            if (tokens[j].value in CLIENT_FUNCTIONS and tokens[j + 1].value == "("
+                    and tokens[j + 2].value == name):
+                return CLIENT_FUNCTIONS[tokens[j].value]
+    return None
+
+
+def _template(tokens, arg, before, depth):
+    """(display text, segments) of a path expression; segments is None when nothing is known"""
+    if len(arg) == 1 and arg[0].kind == "ident" and depth > 0:
+        start, initializer = _initializer(tokens, arg[0].value, before)
+        if initializer:
+            return _template(tokens, initializer, start, depth - 1)
+    parts = []
+    for operand in _operands(arg):
+        if len(operand) == 1 and operand[0].kind == "template":
+            parts.extend(_template_parts(operand[0].value[1:-1]))
+        elif len(operand) == 1 and string_value(operand[0]) is not None:
+            parts.append(string_value(operand[0]))
+        else:
+            parts.append(DYNAMIC)
+    display = "".join("${...}" if part is DYNAMIC else part for part in parts)
+    if len(arg) == 1 and arg[0].kind != "string":
+        display = arg[0].value.strip("`")
+    if all(part is DYNAMIC for part in parts):
+        return display, None
+    return display, _segments(parts)
+
+
+def _operands(arg):
+    """Split a `+` concatenation at the argument's own depth"""
+    operands = [[]]
+    base = arg[0].depth if arg else 0
+    for tok in arg:
+        if tok.value == "+" and tok.depth == base:
+            operands.append([])
+        else:
+            operands[-1].append(tok)
+    return [operand for operand in operands if operand]
+
+
+def _template_parts(body):
+    """Literal text and DYNAMIC markers of a template literal body"""
+    parts = []
+    literal = []
+    i = 0
+    while i < len(body):
+        if body[i] == "\\" and i + 1 < len(body):
+            literal.append(body[i + 1])
+            i += 2
+        elif body.startswith("${", i):
+            depth = 1
+            i += 2
+            while i < len(body) and depth:
+                depth += {"{": 1, "}": -1}.get(body[i], 0)
+                i += 1
+            if literal:
+                parts.append("".join(literal))
+                literal = []
+            parts.append(DYNAMIC)
+        else:
+            literal.append(body[i])
+            i += 1
+    if literal:
+        parts.append("".join(literal))
+    return parts
+
+
+def _segments(parts):
+    """Path segments from literal text and DYNAMIC parts; a segment with any DYNAMIC part is DYNAMIC"""
+    segments = [[]]
+    for part in parts:
+        if part is DYNAMIC:
+            segments[-1].append(DYNAMIC)
+            continue
+        pieces = part.split("/")
+        segments[-1].append(pieces[0])
+        segments.extend([piece] for piece in pieces[1:])
+    result = []
+    for pieces in segments:
+        if any(piece is DYNAMIC for piece in pieces):
+            result.append(DYNAMIC)
+        elif "".join(pieces):
+            result.append("".join(pieces))
+    return result
+
+
+def _initializer(tokens, name, before):
+    """(index, tokens) of the nearest `const|let|var name = ...` initializer before index before"""
+    for i in range(min(before, len(tokens) - 1) - 1, 0, -1):
+        if (tokens[i].value == name and tokens[i].kind == "ident" and tokens[i + 1].value == "="
+                and tokens[i - 1].value in ("const", "let", "var")):
+            depth = tokens[i].depth
+            end = i + 2
+            while end < len(tokens) and tokens[end].depth >= depth:
+                if tokens[end].depth == depth and tokens[end].value in (";", ","):
+                    break
+                end += 1
+            return i + 2, tokens[i + 2:end]
+    return None, None
+
+
+def _property(tokens, key):
+    """String value of `key: '...'` among the tokens of an object literal"""
+    for i in range(len(tokens) - 2):
+        if tokens[i].value == key and tokens[i + 1].value == ":":
+            return string_value(tokens[i + 2])
+    return None
+
+
+class PathCoverage:
+    """A call-site path with the match blocks it reaches and those granting its operation"""
+
+    def __init__(self, path, matched):
+        self.path = path
+        self.matched = matched
+        self.granted = [block for block in matched if grants(block, path.operation)]
+
+    @property
+    def denied(self):
+        """A client call site no rule grants; Admin SDK calls are never denied by the rules"""
+        return self.path.client and self.path.resolved and not self.granted
+
+
+def cross_check(trie, paths):
+    """(PathCoverage per path, match blocks granting access that no path reaches)"""
+    coverage = []
+    used = set()
+    for path in paths:
+        matched = trie.match(path.segments) if path.resolved else []
+        entry = PathCoverage(path, matched)
+        used.update(id(block) for block in entry.granted)
+        coverage.append(entry)
+    unused = [
+        block for block in trie.blocks
+        if id(block) not in used and any(grants(block, operation) for operation in GRANTING_METHODS)
+    ]
+    return coverage, unused
+
+
+def format_coverage_table(coverage):
+    """Path, operation, call site and the rule granting it (or why none does)"""
+    rows = []
+    for entry in coverage:
+        if not entry.path.resolved:
+            rule = "unresolved"
+        elif entry.granted:
+            rule = ", ".join(rule_path(block) for block in entry.granted)
+        elif not entry.path.client:
+            rule = "Admin SDK (rules bypassed)"
+        elif entry.matched:
+            rule = "denied by " + ", ".join(rule_path(block) for block in entry.matched)
+        else:
+            rule = "no rule"
+        rows.append((entry.path.template, entry.path.operation, entry.path.location, rule))
+    header = ("Path", "Op", "Call site", "Rule")
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+    return ["  ".join(f"{value:<{widths[i]}}" for i, value in enumerate(row)).rstrip() for row in [header] + rows]
+
+
+def rule_path(block):
+    """A match block's path below the bucket root, e.g. /receipts/{uid}/{claimId}/{fileName}"""
+    return "/" + "/".join(object_segments(block.full_path))
@@ -0,0 +1,198 @@
+"""
+Synthetic Projects
+Generates Firebase project trees of a chosen size for benchmarking the
+validators: a firestore.rules file of roughly N lines, N TypeScript
+sources under functions/src (each exporting a callable with a Firestore
+query), a matching src/index.ts, and a compiled functions/lib/index.js
+padded to a target size. The content mirrors the shapes the checks look
+for, so every code path (rule parsing, query extraction, export
+resolution) does work proportional to the tree size.
+"""
+
+import json
+from pathlib import Path
+
+COLLECTIONS = ["users", "leaveRequests", "leaveBalances", "expenseClaims", "timesheets", "announcements",
+               "personalDocuments", "notifications", "events", "policies"]
+
+RULES_HEADER = """rules_version = '2';
+service cloud.firestore {
+  match /databases/{database}/documents {
+
+    function isAuthenticated() {
+      return request.auth != null;
+    }
+    function getUserData() {
+      return get(/databases/$(database)/documents/users/$(request.auth.uid)).data;
+    }
+    function hasRole(role) {
+      return isAuthenticated() && getUserData().role == role;
+    }
+    function isOwner(userId) {
+      return isAuthenticated() && request.auth.uid == userId;
+    }
+    function isManagerOf(userId) {
+      return isAuthenticated() && get(/databases/$(database)/documents/users/$(userId)).data.managerId == request.auth.uid;
+    }
+    function isValidNewLeaveRequest(data) {
+      return data.keys().hasAll(['userId', 'startDate', 'endDate', 'status']) && data.status == 'Pending';
+    }
+    function isValidNewExpenseClaim(data) {
+      return data.keys().hasAll(['userId', 'date', 'category', 'amount', 'description', 'receipt', 'status', 'submittedAt'])
+        && data.status == 'Pending';
+    }
+"""
+
+RULES_BLOCK = """
+    match /{collection}/{{docId}} {{
+      allow read: if isOwner(resource.data.userId) || isManagerOf(resource.data.userId) || hasRole('Admin');
+      allow create: if isOwner(request.resource.data.userId) && request.resource.data.keys().hasAll(['userId', 'createdAt']);
+      allow update: if hasRole('Admin') || (isOwner(resource.data.userId) && resource.data.status == 'Pending'
+                    && request.resource.data.status == resource.data.status);
+      allow delete: if hasRole('Admin');
+
+      match /history/{{entryId}} {{
+        allow read: if isOwner(get(/databases/$(database)/documents/{collection}/$(docId)).data.userId);
+        allow write: if false;
+      }}
+    }}
+"""
+
+STORAGE_RULES = """rules_version = '2';
+service firebase.storage {
+  match /b/{bucket}/o {
+    match /personalDocuments/{userId}/{fileName} {
+      allow write: if request.auth != null && request.auth.uid == userId;
+      allow read: if false;
+    }
+    match /receipts/{userId}/{fileName} {
+      allow write: if request.auth != null && request.auth.uid == userId;
+      allow read: if false;
+    }
+  }
+}
+"""
+
+SOURCE_TEMPLATE = """import * as functions from "firebase-functions";
+import {{ getFirestore }} from "firebase-admin/firestore";
+import {{ z }} from "zod";
+
+const db = getFirestore();
+const Payload{n} = z.object({{ status: z.string(), limit: z.number().optional() }});
+
+export const {name} = functions.https.onCall(async (data, context) => {{
+  if (!context.auth) {{
+    throw new functions.https.HttpsError("unauthenticated", "Sign in first.");
+  }}
+  const input = Payload{n}.parse(data);
+  let query = db.collection("{collection}").where("userId", "==", context.auth.uid);
+  query = query.where("status", "==", input.status);
+  const snapshot = await query.orderBy("createdAt", "desc").limit(input.limit ?? 50).get();
+  return snapshot.docs.map((doc) => ({{ id: doc.id, ...doc.data() }}));
+}});
+"""
+
+COMPILED_TEMPLATE = """const mod_{n} = require("./{module}");
+Object.defineProperty(exports, "{name}", {{ enumerable: true, get: function () {{ return mod_{n}.{name}; }} }});
+"""
+
+COMPILED_MODULE = """"use strict";
+Object.defineProperty(exports, "__esModule", {{ value: true }});
+exports.{name} = void 0;
+const functions = require("firebase-functions");
+exports.{name} = functions.https.onCall(async (data, context) => {{ return {{ ok: true }}; }});
+"""
+
+
+class SyntheticProject:
+    """A generated project tree; sizes are rules lines, TypeScript sources and lib/index.js bytes"""
+
+    def __init__(self, root, rules_lines=100, sources=10, bundle_bytes=100_000):
+        self.root = Path(root)
+        self.rules_lines = rules_lines
+        self.sources = sources
+        self.bundle_bytes = bundle_bytes
+
+    def generate(self):
+        """Write the tree under root; returns the total bytes written"""
+        names = [f"callable{n:05d}" for n in range(self.sources)]
+        modules = [f"module-{n:05d}" for n in range(self.sources)]
+        written = 0
+        written += self._write("firestore.rules", self.firestore_rules())
+        written += self._write("storage.rules", STORAGE_RULES)
+        written += self._write("firebase.json", json.dumps({
+            "firestore": {"rules": "firestore.rules", "indexes": "firestore.indexes.json"},
+            "functions": [{"source": "functions", "codebase": "default"}],
+            "storage": {"rules": "storage.rules"},
+        }, indent=2))
+        written += self._write("firestore.indexes.json", json.dumps(self.indexes(), indent=2))
+        written += self._write("package.json", json.dumps({"name": "synthetic", "private": True}))
+        written += self._write("package-lock.json", json.dumps({"name": "synthetic", "lockfileVersion": 3}))
+        written += self._write("functions/package.json", json.dumps({
+            "name": "functions", "main": "lib/index.js",
+            "dependencies": {"firebase-admin": "^12.0.0", "firebase-functions": "^5.0.0", "googleapis": "^140.0.0",
+                             "luxon": "^3.4.0", "uuid": "^9.0.0", "zod": "^3.23.0"},
+        }, indent=2))
+        written += self._write("functions/package-lock.json", json.dumps({"name": "functions", "lockfileVersion": 3}))
+        written += self._write("functions/tsconfig.json", json.dumps({"compilerOptions": {"outDir": "lib"}}))
+
+        index = []
+        for n, (name, module) in enumerate(zip(names, modules)):
+            collection = COLLECTIONS[n % len(COLLECTIONS)]
+            written += self._write(f"functions/src/{module}.ts",
+                                   SOURCE_TEMPLATE.format(n=n, name=name, collection=collection))
+            written += self._write(f"functions/lib/{module}.js", COMPILED_MODULE.format(name=name))
+            index.append(f'export {{ {name} }} from "./{module}";')
+        written += self._write("functions/src/index.ts", "\n".join(index) + "\n")
+        written += self._write("functions/lib/index.js", self.compiled_index(names, modules))
+        for collection in COLLECTIONS[:3]:
+            written += self._write(f"src/lib/firebase/get-{collection.lower()}-data.ts", SOURCE_TEMPLATE.format(
+                n=0, name=f"get{collection}", collection=collection))
+        return written
+
+    def firestore_rules(self):
+        """A rules file of about rules_lines lines, repeating per-collection match blocks"""
+        parts = [RULES_HEADER]
+        lines = RULES_HEADER.count("\n")
+        block = 0
+        while lines < self.rules_lines - 3 or block < len(COLLECTIONS):
+            collection = COLLECTIONS[block] if block < len(COLLECTIONS) else f"collection{block:05d}"
+            text = RULES_BLOCK.format(collection=collection)
+            parts.append(text)
+            lines += text.count("\n")
+            block += 1
+        parts.append("  }\n}\n")
+        return "".join(parts)
+
+    def indexes(self):
+        """Indexes covering half of the collections' (userId, status, createdAt) queries"""
+        indexes = []
+        for collection in COLLECTIONS[::2]:
+            indexes.append({"collectionGroup": collection, "queryScope": "COLLECTION", "fields": [
+                {"fieldPath": "userId", "order": "ASCENDING"},
+                {"fieldPath": "status", "order": "ASCENDING"},
+                {"fieldPath": "createdAt", "order": "DESCENDING"},
+            ]})
+        return {"indexes": indexes, "fieldOverrides": []}
+
+    def compiled_index(self, names, modules):
+        """tsc-style CommonJS entry point, padded with inert code up to bundle_bytes"""
+        parts = ['"use strict";\nObject.defineProperty(exports, "__esModule", { value: true });\n']
+        parts += [COMPILED_TEMPLATE.format(n=n, name=name, module=module)
+                  for n, (name, module) in enumerate(zip(names, modules))]
+        size = sum(len(part) for part in parts)
+        filler = 0
+        while size < self.bundle_bytes:
+            text = (f"function helper{filler}(value) {{ if (value === undefined) {{ return null; }} "
+                    f"return {{ value: value, index: {filler}, label: \"helper-{filler}\" }}; }}\n")
+            parts.append(text)
+            size += len(text)
+            filler += 1
+        return "".join(parts)
+
+    def _write(self, rel_path, text):
+        path = self.root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = text.encode("utf-8")
+        path.write_bytes(data)
+        return len(data)
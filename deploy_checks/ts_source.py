@@ -0,0 +1,245 @@
+"""
+TypeScript Source Scanner
+A lightweight tokenizer for the Cloud Functions and Next.js sources. It is
+not a TypeScript parser: it only knows enough (strings, template literals,
+comments, regex literals, bracket depth) to let the static checks walk call
+chains and top-level declarations without being fooled by text inside
+strings or comments.
+"""
+
+import re
+
+
+class TsToken:
+    __slots__ = ("kind", "value", "line", "start", "depth")
+
+    def __init__(self, kind, value, line, start, depth):
+        self.kind = kind
+        self.value = value
+        self.line = line
+        self.start = start
+        self.depth = depth
+
+    def __repr__(self):
+        return f"TsToken({self.kind}, {self.value!r}, line={self.line})"
+
+
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*")
+  | (?P<number>\d[\d_]*(?:\.\d+)?(?:[eE][-+]?\d+)?n?)
+  | (?P<ident>[A-Za-z_$][A-Za-z0-9_$]*)
+  | (?P<punct>=>|\.\.\.|\?\?=?|\?\.|===|!==|==|!=|<=|>=|&&=?|\|\|=?|\*\*|\+\+|--|[-+*/%&|^!~<>=?:.,;@#(){}\[\]])
+""", re.VERBOSE | re.DOTALL)
+
+_REGEX_RE = re.compile(r"/(?:[^/\\\n\[]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[a-z]*")
+
+# After these tokens a "/" starts a regex literal rather than a division
+_REGEX_PREFIX = set("(,=:[!&|?{};+-*%<>~^") | {"=>", "return", "typeof", "case", "of", "in", "&&", "||", "??"}
+
+_OPEN = {"(": ")", "[": "]", "{": "}"}
+_CLOSE = {")", "]", "}"}
+
+
+def tokenize_ts(text):
+    """Tokenize TypeScript/TSX source, dropping whitespace and comments"""
+    tokens = []
+    pos = 0
+    line = 1
+    depth = 0
+    length = len(text)
+    prev = None
+    while pos < length:
+        ch = text[pos]
+        if ch == "`":
+            end = _template_end(text, pos)
+            kind = "template"
+        elif ch == "/" and not text.startswith(("//", "/*"), pos) and (prev is None or prev.value in _REGEX_PREFIX):
+            m = _REGEX_RE.match(text, pos)
+            if m:
+                end, kind = m.end(), "regex"
+            else:
+                end, kind = pos + 1, "punct"
+        else:
+            m = _TOKEN_RE.match(text, pos)
+            if m is None:
+                # Stray characters (e.g. JSX text) are skipped one at a time
+                end, kind = pos + 1, "other"
+            else:
+                end, kind = m.end(), m.lastgroup
+        value = text[pos:end]
+        if kind not in ("ws", "comment"):
+            if kind == "punct" and value in _CLOSE:
+                depth = max(depth - 1, 0)
+            prev = TsToken(kind, value, line, pos, depth)
+            tokens.append(prev)
+            if kind == "punct" and value in _OPEN:
+                depth += 1
+        line += value.count("\n")
+        pos = end
+    return tokens
+
+
+def _template_end(text, pos):
+    """Index just past the template literal starting at pos (handles nested ${...})"""
+    i = pos + 1
+    length = len(text)
+    while i < length:
+        ch = text[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "`":
+            return i + 1
+        if ch == "$" and text.startswith("${", i):
+            depth = 1
+            i += 2
+            while i < length and depth:
+                if text[i] == "`":
+                    i = _template_end(text, i)
+                    continue
+                if text[i] in "'\"":
+                    quote = text[i]
+                    i += 1
+                    while i < length and text[i] != quote:
+                        i += 2 if text[i] == "\\" else 1
+                elif text[i] == "{":
+                    depth += 1
+                elif text[i] == "}":
+                    depth -= 1
+                i += 1
+            continue
+        i += 1
+    return length
+
+
+def string_value(tok):
+    """Python value of a plain string literal token, or None for anything else"""
+    if tok.kind == "string":
+        return tok.value[1:-1]
+    if tok.kind == "template" and "${" not in tok.value:
+        return tok.value[1:-1]
+    return None
+
+
+def call_args(tokens, open_index):
+    """Split the arguments of the call whose `(` is at open_index; returns (args, index after `)`)"""
+    args = []
+    current = []
+    base = tokens[open_index].depth + 1
+    i = open_index + 1
+    while i < len(tokens):
+        tok = tokens[i]
+        if tok.depth == base - 1 and tok.value == ")":
+            if current:
+                args.append(current)
+            return args, i + 1
+        if tok.depth == base and tok.value == ",":
+            args.append(current)
+            current = []
+        else:
+            current.append(tok)
+        i += 1
+    return args, len(tokens)
+
+
+def receiver_start(tokens, i):
+    """Walk back from the `.` at index i over the receiver expression (and a leading await)"""
+    while i > 0:
+        prev = tokens[i - 1]
+        if prev.kind == "ident" or prev.value in (".", "?."):
+            i -= 1
+        elif prev.value == ")":
+            depth = prev.depth
+            j = i - 2
+            while j >= 0 and not (tokens[j].value == "(" and tokens[j].depth == depth):
+                j -= 1
+            i = max(j, 0)
+        else:
+            break
+    if i > 0 and tokens[i - 1].value == "await":
+        i -= 1
+    return i
+
+
+def matching_close(tokens, open_index):
+    """Index of the bracket closing the one at open_index"""
+    depth = tokens[open_index].depth
+    close = _OPEN[tokens[open_index].value]
+    for i in range(open_index + 1, len(tokens)):
+        if tokens[i].depth == depth and tokens[i].value == close:
+            return i
+    return len(tokens) - 1
+
+
+class Declaration:
+    def __init__(self, name, kind, exported, start, end, line):
+        self.name = name
+        self.kind = kind
+        self.exported = exported
+        self.start = start
+        self.end = end
+        self.line = line
+
+    def __repr__(self):
+        return f"Declaration({'export ' if self.exported else ''}{self.kind} {self.name})"
+
+
+_DECL_KEYWORDS = {"const", "let", "var", "function", "class"}
+
+
+def declarations(tokens):
+    """Top-level const/let/function/class declarations with their token spans"""
+    result = []
+    i = 0
+    count = len(tokens)
+    while i < count:
+        tok = tokens[i]
+        if tok.depth != 0 or tok.kind != "ident":
+            i += 1
+            continue
+        exported = tok.value == "export"
+        j = i + 1 if exported else i
+        if j < count and tokens[j].value == "default":
+            j += 1
+        if j < count and tokens[j].value == "async":
+            j += 1
+        if j >= count or tokens[j].value not in _DECL_KEYWORDS:
+            i += 1
+            continue
+        kind = tokens[j].value
+        j += 1
+        if j < count and tokens[j].value == "*":
+            j += 1
+        if j >= count or tokens[j].kind != "ident":
+            i = j
+            continue
+        name = tokens[j].value
+        end = _statement_end(tokens, j + 1, kind)
+        result.append(Declaration(name, kind, exported, i, end, tok.line))
+        i = end + 1
+    return result
+
+
+def _statement_end(tokens, i, kind):
+    count = len(tokens)
+    while i < count:
+        tok = tokens[i]
+        if tok.depth == 0:
+            if tok.value == ";":
+                return i
+            if kind in ("function", "class") and tok.value == "}":
+                return i
+            if tok.value in ("export", "import") and tok.kind == "ident":
+                return i - 1
+        i += 1
+    return count - 1
+
+
+def declaration_at(decls, index):
+    """The top-level declaration whose span contains token index"""
+    for decl in decls:
+        if decl.start <= index <= decl.end:
+            return decl
+    return None
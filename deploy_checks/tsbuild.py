@@ -0,0 +1,140 @@
+"""
+TypeScript Type Check
+Incremental `tsc --noEmit` for the compile check. The .tsbuildinfo state
+lives in the result cache directory (one file per functions directory),
+so a run after a small edit only re-checks the files the edit affects
+instead of the whole program. In watch mode a long-lived `tsc --watch`
+keeps the program in memory; a check takes the first compile that started
+after the newest edit of the sources it watches, waiting for it if needed.
+"""
+
+import hashlib
+import re
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from .commands import CommandResult
+
+TSC = "node_modules/.bin/tsc"
+
+# Heap ceiling for tsc; the incremental type check needs far less than a full emit with source maps
+TSC_HEAP_MB = 2048
+
+# Files `tsc --watch` recompiles on, relative to the functions directory
+WATCH_INPUTS = ("src/**/*.ts", "tsconfig.json")
+
+CYCLE_START = re.compile(r"Starting compilation in watch mode|File change detected")
+CYCLE_DONE = re.compile(r"Found (\d+) errors?\b")
+
+
+def build_info_path(cache_dir, functions_path):
+    """Where the .tsbuildinfo of functions_path is kept under cache_dir"""
+    key = hashlib.sha256(str(Path(functions_path).resolve()).encode()).hexdigest()[:16]
+    directory = Path(cache_dir).resolve() / "tsc"
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{key}.tsbuildinfo"
+
+
+def tsc_argv(heap_mb=TSC_HEAP_MB, build_info=None, watch=False):
+    """node/tsc argv for a type check without emit, incremental when build_info is given"""
+    argv = ["node", f"--max-old-space-size={heap_mb}", TSC, "--noEmit", "--pretty", "false"]
+    if build_info is not None:
+        argv += ["--incremental", "--tsBuildInfoFile", str(build_info)]
+    if watch:
+        argv += ["--watch", "--preserveWatchOutput"]
+    return argv
+
+
+class TscWatch:
+    """A `tsc --watch` process kept alive across checks; result() returns the compile covering the latest edit"""
+
+    def __init__(self, argv, cwd):
+        self.argv = list(argv)
+        self.cwd = cwd
+        self._proc = None
+        self._cond = threading.Condition()
+        self._compiling = False
+        self._lines = []
+        # (wall-clock start of the compile, error count, output lines) of the last finished compile
+        self._last = None
+        self._started_at = 0.0
+
+    def start(self):
+        if self._proc is not None:
+            return
+        try:
+            self._proc = subprocess.Popen(self.argv, cwd=self.cwd, stdout=subprocess.PIPE,
+                                          stderr=subprocess.STDOUT, text=True)
+        except OSError as e:
+            self._last = (time.time(), None, [str(e)])
+            return
+        threading.Thread(target=self._read, name="tsc-watch", daemon=True).start()
+
+    def _read(self):
+        for line in self._proc.stdout:
+            line = line.rstrip("\n")
+            with self._cond:
+                if CYCLE_START.search(line):
+                    self._compiling = True
+                    # Wall clock, to compare with file modification times
+                    self._started_at = time.time()
+                    self._lines = []
+                    continue
+                done = CYCLE_DONE.search(line)
+                if done:
+                    self._last = (self._started_at, int(done.group(1)), self._lines)
+                    self._compiling = False
+                    self._cond.notify_all()
+                else:
+                    self._lines.append(line)
+        with self._cond:
+            self._compiling = False
+            self._cond.notify_all()
+
+    def result(self, timeout):
+        """CommandResult of the first compile started after the newest edit made before this call"""
+        self.start()
+        edited = self._newest_input()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                exited = self._proc is None or self._proc.poll() is not None
+                if exited and not self._compiling:
+                    if self._last is not None and self._last[1] is not None:
+                        return self._to_result(self._last)
+                    output = "\n".join(self._last[2] if self._last else self._lines)
+                    return CommandResult(self.argv, self.cwd, error=RuntimeError(f"tsc --watch exited: {output[-200:]}"))
+                # An older compile may have read the sources before the edit; tsc starts another for it
+                if not self._compiling and self._last is not None and self._last[0] >= edited:
+                    return self._to_result(self._last)
+                if now >= deadline:
+                    return CommandResult(self.argv, self.cwd, error=subprocess.TimeoutExpired(self.argv, timeout))
+                self._cond.wait(max(deadline - now, 0.01))
+
+    def _newest_input(self):
+        """Latest modification time of the files tsc watches (0 when none can be read)"""
+        newest = 0.0
+        root = Path(self.cwd)
+        for pattern in WATCH_INPUTS:
+            for path in root.glob(pattern):
+                try:
+                    newest = max(newest, path.stat().st_mtime)
+                except OSError:
+                    continue
+        return newest
+
+    def _to_result(self, compile):
+        _, errors, lines = compile
+        return CommandResult(self.argv, self.cwd, 0 if errors == 0 else 2, "\n".join(lines), "")
+
+    def close(self):
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+        self._proc = None
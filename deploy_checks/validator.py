@@ -0,0 +1,122 @@
+"""
+Validator Base
+Reporting and check dispatch shared by the validator scripts. Subclasses
+declare their checks as a CHECKS list of registry.Check in run order and
+implement one method per check; results go through log_test/log_warning/
+log_info so they can be recorded by the result cache and the result stream.
+"""
+
+import inspect
+import sys
+from functools import partial
+from pathlib import Path
+
+from .commands import CommandPool
+from .exports import ExportIndex
+from .registry import SUBPROCESS, affected_checks
+from .snapshot import ProjectSnapshot
+
+
+class Validator:
+    # Checks in run order, as registry.Check
+    CHECKS = []
+    # Derived from CHECKS: files each check reads (a check is replayed from the
+    # result cache while these are unchanged), the rules match paths a check reads
+    # and the checks that wait on subprocesses
+    CHECK_INPUTS = {}
+    CHECK_RULES = {}
+    SUBPROCESS_CHECKS = set()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.CHECK_INPUTS = {check.name: list(check.inputs) for check in cls.CHECKS}
+        cls.CHECK_RULES = {check.name: check.rules for check in cls.CHECKS if check.rules is not None}
+        cls.SUBPROCESS_CHECKS = {check.name for check in cls.CHECKS if check.cost == SUBPROCESS}
+
+    def __init__(self, project_path="/app", snapshot=None, commands=None, cache=None, results=None):
+        self.project_path = Path(project_path)
+        self.snapshot = snapshot or ProjectSnapshot.shared(project_path)
+        self.commands = commands or CommandPool()
+        self.cache = cache
+        self.results = results
+        self.functions_path = self.project_path / "functions"
+        self.src_path = self.functions_path / "src"
+        self.export_index = ExportIndex(self.snapshot)
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.issues = []
+        self.warnings = []
+        self._recording = None
+        self._cacheable = True
+
+    def log_test(self, name, passed, message=""):
+        """Log test result"""
+        if self._recording is not None:
+            self._recording.append(["test", name, passed, message])
+        if self.results is not None:
+            self.results.test(name, passed, message)
+        self.tests_run += 1
+        if passed:
+            self.tests_passed += 1
+            print(f"✅ {name}: PASSED")
+        else:
+            print(f"❌ {name}: FAILED - {message}")
+            self.issues.append(f"{name}: {message}")
+        if message and passed:
+            print(f"   ℹ️  {message}")
+
+    def log_warning(self, message, quiet=False):
+        """Log warning"""
+        if self._recording is not None:
+            self._recording.append(["warning", message, quiet])
+        if self.results is not None:
+            self.results.warning(message)
+        if not quiet:
+            print(f"⚠️  WARNING: {message}")
+        self.warnings.append(message)
+
+    def log_info(self, message):
+        """Log an indented detail line"""
+        if self._recording is not None:
+            self._recording.append(["info", message])
+        print(f"   {message}")
+
+    def select_checks(self, changed=None, rule_paths=None):
+        """Checks in run order reading any of the changed project-relative paths (all when None)
+
+        rule_paths ({rules file: match paths with permission changes}) narrows
+        a rules file change to the checks reading the changed blocks.
+        """
+        if changed is None or self._code_changed(changed):
+            return list(self.CHECK_INPUTS)
+        return affected_checks(self.CHECK_INPUTS, changed, self.CHECK_RULES, rule_paths)
+
+    def _code_changed(self, changed):
+        """Whether the validator script or this package is among the changed paths"""
+        module = Path(inspect.getsourcefile(sys.modules[type(self).__module__])).resolve()
+        package = Path(__file__).resolve().parent
+        root = self.project_path.resolve()
+        for rel in changed:
+            path = root / rel
+            if path == module or path.parent == package:
+                return True
+        return False
+
+    def run_check(self, name):
+        """Run one check, replaying its cached verdict when its inputs are unchanged"""
+        check = getattr(self, name) if self.cache is None else partial(self.cache.run_check, self, name)
+        if self.results is None:
+            check()
+        else:
+            self.results.run(self, name, check)
+
+    def start_subprocess_checks(self, names):
+        """Launch the subprocesses of the selected checks so they overlap with the pure-Python ones"""
+
+    def run_checks(self, names=None):
+        """Run the named checks (all when None) in CHECKS order"""
+        names = list(self.CHECK_INPUTS) if names is None else [n for n in self.CHECK_INPUTS if n in set(names)]
+        with self.commands:
+            self.start_subprocess_checks(names)
+            for name in names:
+                self.run_check(name)
@@ -0,0 +1,290 @@
+"""
+Watch Mode
+Keeps one ProjectSnapshot warm between edits and re-runs only the checks
+whose CHECK_INPUTS match the files that changed. Changes come from inotify
+(bound through ctypes, Linux only) on the directories those inputs live
+in, or from mtime polling where inotify is unavailable. Changed files are
+dropped from the snapshot so they are re-read and re-parsed; everything
+else stays parsed in memory across runs.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+from .commands import CommandPool
+
+# In-process checks should report within this after a save
+WATCH_BUDGET_MS = 100
+
+# Quiet period that ends a burst of events (editors write, rename and chmod in quick succession)
+DEBOUNCE_SECONDS = 0.05
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+# struct inotify_event header: wd, mask, cookie, len (the name follows, NUL padded)
+EVENT_HEADER = struct.Struct("iIII")
+
+# Never descend into these below a recursive watch root
+SKIP_DIRS = {"node_modules", ".git"}
+
+
+def watch_roots(patterns):
+    """{directory: recursive} that must be watched to see every file the patterns can match"""
+    roots = {}
+    for pattern in patterns:
+        parts = pattern.split("/")
+        static = []
+        for part in parts:
+            if any(ch in part for ch in "*?["):
+                break
+            static.append(part)
+        if len(static) == len(parts):
+            # Plain path: watch its directory, and the path itself in case it is a directory
+            roots.setdefault("/".join(parts[:-1]) or ".", False)
+            roots.setdefault(pattern, False)
+            continue
+        directory = "/".join(static) or "."
+        recursive = "**" in parts[len(static):] or len(parts) - len(static) > 1
+        roots[directory] = roots.get(directory, False) or recursive
+    return roots
+
+
+class InotifyWatcher:
+    """Directory watches through the Linux inotify API"""
+
+    def __init__(self, project_path, patterns):
+        self.project_path = Path(project_path)
+        self.kind = "inotify"
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._add_watch.restype = ctypes.c_int
+        init = libc.inotify_init1
+        init.argtypes = [ctypes.c_int]
+        init.restype = ctypes.c_int
+        self.fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1: {os.strerror(errno)}")
+        # wd -> (project-relative directory, recursive)
+        self._watches = {}
+        self.roots = watch_roots(patterns)
+        for directory, recursive in self.roots.items():
+            self._watch(directory, recursive)
+
+    def _watch(self, rel_dir, recursive):
+        path = self.project_path / rel_dir
+        if not path.is_dir():
+            return
+        wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_add_watch {path}: {os.strerror(errno)}")
+        self._watches[wd] = (rel_dir, recursive)
+        if recursive:
+            for child in sorted(path.iterdir()):
+                if child.is_dir() and not child.is_symlink() and child.name not in SKIP_DIRS:
+                    self._watch(_join(rel_dir, child.name), True)
+
+    def wait(self, timeout=None):
+        """Changed project-relative paths after the next burst of events ({} on timeout, None on overflow)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        overflowed = False
+        while ready:
+            overflowed |= self._drain(changed)
+            ready, _, _ = select.select([self.fd], [], [], DEBOUNCE_SECONDS)
+        return None if overflowed else changed
+
+    def _drain(self, changed):
+        """Read queued events into changed; True if the kernel queue overflowed"""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        overflowed = False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0"))
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                overflowed = True
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            if wd not in self._watches or not name:
+                continue
+            rel_dir, recursive = self._watches[wd]
+            rel = _join(rel_dir, name)
+            changed.add(rel)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                if (rel in self.roots or recursive) and name not in SKIP_DIRS:
+                    self._watch(rel, recursive or self.roots.get(rel, False))
+                    # Files may have landed before the watch existed
+                    for path in (self.project_path / rel).rglob("*"):
+                        changed.add(path.relative_to(self.project_path).as_posix())
+        return overflowed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher:
+    """Fallback that compares file mtimes and sizes every interval seconds"""
+
+    def __init__(self, project_path, patterns, interval=0.5):
+        self.project_path = Path(project_path)
+        self.kind = f"polling every {interval}s"
+        self.roots = list(patterns)
+        self.interval = interval
+        self._state = self._scan()
+
+    def _scan(self):
+        state = {}
+        for pattern in self.roots:
+            if any(ch in pattern for ch in "*?["):
+                paths = self.project_path.glob(pattern)
+            else:
+                paths = [self.project_path / pattern]
+            for path in paths:
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                state[path.relative_to(self.project_path).as_posix()] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def wait(self, timeout=None):
+        """Paths added, removed or modified since the last call ({} on timeout)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = self._scan()
+            changed = {rel for rel in state.keys() | self._state.keys() if state.get(rel) != self._state.get(rel)}
+            self._state = state
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+def open_watcher(project_path, patterns, poll_interval=None):
+    """An InotifyWatcher, or a PollingWatcher when inotify is unavailable or polling is requested"""
+    if poll_interval is None:
+        try:
+            return InotifyWatcher(project_path, patterns)
+        except (OSError, AttributeError):
+            poll_interval = 0.5
+    return PollingWatcher(project_path, patterns, poll_interval)
+
+
+class WatchSession:
+    """Re-runs affected checks of one or more validators over a shared, long-lived snapshot"""
+
+    def __init__(self, snapshot, suites, cache=None):
+        # suites: [(label, factory(snapshot, commands) -> validator)]
+        self.snapshot = snapshot
+        self.suites = suites
+        self.cache = cache
+        self.runs = 0
+
+    def patterns(self):
+        """Every input pattern of every suite"""
+        patterns = []
+        for _, factory in self.suites:
+            for inputs in factory(self.snapshot, None).CHECK_INPUTS.values():
+                patterns += [p for p in inputs if p not in patterns]
+        return patterns
+
+    def run(self, changed=None):
+        """Re-run the checks reading changed paths (all checks when None); returns the number run"""
+        if changed is None:
+            self.snapshot.forget()
+        else:
+            self.snapshot.forget(changed)
+        if self.cache is not None:
+            self.cache.invalidate()
+        self.runs += 1
+
+        count = 0
+        failures = []
+        in_process_ms = 0.0
+        for label, factory in self.suites:
+            commands = CommandPool()
+            validator = factory(self.snapshot, commands)
+            names = validator.select_checks(changed)
+            if not names:
+                continue
+            slow = [name for name in names if name in validator.SUBPROCESS_CHECKS]
+            fast = [name for name in names if name not in validator.SUBPROCESS_CHECKS]
+            print(f"\n🔁 {label}: {', '.join(_label(name) for name in names)}")
+            with commands:
+                validator.start_subprocess_checks(slow)
+                started = time.perf_counter()
+                for name in fast:
+                    validator.run_check(name)
+                in_process_ms += (time.perf_counter() - started) * 1000
+                for name in slow:
+                    validator.run_check(name)
+            count += len(names)
+            failures += validator.issues
+
+        if count:
+            status = "❌" if failures else "✅"
+            budget = "" if in_process_ms <= WATCH_BUDGET_MS else f" ⚠️ over the {WATCH_BUDGET_MS} ms budget"
+            print(f"{status} {count} checks, {len(failures)} failing; in-process checks took "
+                  f"{in_process_ms:.0f} ms{budget}")
+        return count
+
+    def loop(self, watcher):
+        """Run everything once, then re-run affected checks on every change until interrupted"""
+        self.run()
+        print(f"\n👀 Watching {len(watcher.roots)} locations ({watcher.kind}); Ctrl+C to stop")
+        try:
+            while True:
+                changed = watcher.wait()
+                if changed is None:
+                    print("\n⚠️  Missed file events; re-running every check")
+                    self.run()
+                elif changed:
+                    self.run(sorted(changed))
+        except KeyboardInterrupt:
+            print("\n👋 Stopped watching")
+        finally:
+            watcher.close()
+        return 0
+
+
+def _label(name):
+    return name.removeprefix("test_").removeprefix("check_")
+
+
+def _join(rel_dir, name):
+    return name if rel_dir == "." else f"{rel_dir}/{name}"
@@ -0,0 +1,564 @@
+"""
+Write Amplification
+Static count of the Firestore document writes each Cloud Function performs
+per invocation. Writes are set/update/delete/create calls on document
+references, add() on collection references, and the same calls on a
+WriteBatch or Transaction. Writes inside loops are scaled by the expected
+size of the query snapshot being iterated (from deploy-checks.json), and
+writes in helpers the function calls (same file, or imported by name from
+a relative module) are folded in. Writes in alternative branches are all
+counted, so the totals are upper bounds. Batches and transactions whose
+commits can exceed Firestore's per-commit write limit are reported.
+Document gets and executed queries are recorded the same way (scaled by
+loops and folded in from helpers) for the cost projection.
+"""
+
+import json
+import posixpath
+from pathlib import Path
+
+from .pagination import estimate_rows
+from .queries import Query
+from .ts_source import call_args, declarations, matching_close, receiver_start, string_value, tokenize_ts
+
+DOC_WRITES = {"set", "update", "delete", "create"}
+LOOP_METHODS = {"forEach", "map", "flatMap"}
+LOOP_KEYWORDS = {"for", "while"}
+STATEMENT_KEYWORDS = {"const", "let", "var", "return", "if", "for", "while", "await", "throw", "try", "do", "switch"}
+LEADING_KEYWORDS = {"await", "return", "yield", "void", "new", "throw", "else", "do", "case", "typeof"}
+
+
+class WriteSite:
+    """One write call; multiplier is the expected executions per invocation (None: unknown loop)"""
+
+    def __init__(self, source, line, function, method, kind, scope=None, multiplier=1, per_commit=1, loop=None,
+                 collection=None):
+        self.source = source
+        self.line = line
+        self.function = function
+        self.method = method
+        self.kind = kind
+        self.scope = scope
+        self.multiplier = multiplier
+        self.per_commit = per_commit
+        self.loop = loop
+        self.collection = collection
+
+    @property
+    def location(self):
+        return f"{self.source}:{self.line}"
+
+    def scaled(self, factor, via):
+        """This site as seen from a caller whose call site runs factor times"""
+        multiplier = None if factor is None or self.multiplier is None else self.multiplier * factor
+        site = WriteSite(self.source, self.line, self.function, self.method, self.kind, self.scope, multiplier,
+                         self.per_commit, self.loop, self.collection)
+        site.scope = f"{via}:{self.scope}" if self.scope else None
+        return site
+
+    def __repr__(self):
+        return f"WriteSite({self.kind} {self.method} @ {self.location} x{self.multiplier})"
+
+
+class ReadSite:
+    """One document get or executed query; docs is the documents it returns (None: unknown size)"""
+
+    def __init__(self, source, line, function, kind, collection, docs, multiplier=1):
+        self.source = source
+        self.line = line
+        self.function = function
+        self.kind = kind
+        self.collection = collection
+        self.docs = docs
+        self.multiplier = multiplier
+
+    @property
+    def location(self):
+        return f"{self.source}:{self.line}"
+
+    def scaled(self, factor, via):
+        multiplier = None if factor is None or self.multiplier is None else self.multiplier * factor
+        return ReadSite(self.source, self.line, self.function, self.kind, self.collection, self.docs, multiplier)
+
+    def __repr__(self):
+        return f"ReadSite({self.kind} {self.collection} @ {self.location} x{self.multiplier})"
+
+
+class FunctionWrites:
+    def __init__(self, name, source, line, exported):
+        self.name = name
+        self.source = source
+        self.line = line
+        self.exported = exported
+        self.sites = []
+        self.reads = []
+        # (callee identifier, multiplier of the call site)
+        self.calls = []
+
+
+class _Var:
+    __slots__ = ("kind", "collection", "query")
+
+    def __init__(self, kind, collection=None, query=None):
+        self.kind = kind
+        self.collection = collection
+        self.query = query
+
+
+def module_writes(source, text, config):
+    """({declaration name: FunctionWrites}, {local name: (module specifier, imported name)}) of one file"""
+    tokens = tokenize_ts(text)
+    imports = _named_imports(tokens)
+    module_vars = {}
+    functions = {}
+    for decl in declarations(tokens):
+        if decl.kind in ("const", "let", "var"):
+            var = _classify(tokens, decl.start, decl.end + 1, module_vars)
+            if var is not None:
+                module_vars[decl.name] = var
+    for decl in declarations(tokens):
+        analysis = FunctionWrites(decl.name, source, decl.line, decl.exported)
+        _collect(tokens, decl.start, decl.end, analysis, dict(module_vars), config)
+        if analysis.sites or analysis.reads or analysis.calls:
+            functions[decl.name] = analysis
+    return functions, imports
+
+
+def _named_imports(tokens):
+    imports = {}
+    for i, tok in enumerate(tokens):
+        if tok.value != "import" or tok.depth != 0 or i + 1 >= len(tokens) or tokens[i + 1].value != "{":
+            continue
+        close = matching_close(tokens, i + 1)
+        if close + 2 >= len(tokens) or tokens[close + 1].value != "from":
+            continue
+        module = string_value(tokens[close + 2])
+        if module is None or not module.startswith("."):
+            continue
+        j = i + 2
+        while j < close:
+            name = tokens[j].value
+            local = name
+            if j + 2 < close and tokens[j + 1].value == "as":
+                local = tokens[j + 2].value
+                j += 2
+            if tokens[j].kind == "ident":
+                imports[local] = (module, name)
+            j += 2 if j + 1 < close and tokens[j + 1].value == "," else 1
+    return imports
+
+
+def _classify(tokens, start, end, variables):
+    """What a declaration's initializer evaluates to: batch, docref, collection or snapshot"""
+    equals = next((k for k in range(start, end) if tokens[k].value == "=" and tokens[k].depth == tokens[start].depth),
+                  None)
+    if equals is None:
+        return None
+    init = tokens[equals + 1:end]
+    values = [t.value for t in init]
+    calls = [values[k + 1] for k in range(len(values) - 2) if values[k] in (".", "?.") and values[k + 2] == "("]
+    if "batch" in calls:
+        return _Var("batch")
+    collection = None
+    base = next((variables[t.value] for t in init if t.kind == "ident" and t.value in variables), None)
+    for k, value in enumerate(values[:-3]):
+        if value in ("collection", "collectionGroup") and values[k + 1] == "(":
+            collection = string_value(init[k + 2]) or collection
+    if collection is None and base is not None:
+        collection = base.collection
+    if calls and calls[-1] == "doc":
+        return _Var("docref", collection)
+    if calls and calls[-1] in ("collection", "collectionGroup"):
+        return _Var("collection", collection, Query(collection, False, None, init[0].line, None))
+    query_calls = {"get", "where", "orderBy", "limit", "limitToLast"}
+    if calls and calls[-1] in query_calls and (collection is not None or base is not None):
+        query = _query_from(init, base, collection)
+        # A query built up in a variable is still a collection reference until get() runs it
+        return _Var("snapshot" if "get" in calls else "collection", collection, query)
+    return None
+
+
+def _query_from(tokens, base, collection):
+    """Query of a where/limit chain in tokens, extending the query held by base"""
+    values = [t.value for t in tokens]
+    query = base.query.copy() if base is not None and base.query is not None else \
+        Query(collection or "?", False, None, tokens[0].line, None)
+    query.collection = collection or query.collection
+    for k, value in enumerate(values[:-2]):
+        if value == "where" and values[k + 1] == "(":
+            args, _ = call_args(tokens, k + 1)
+            if len(args) >= 2 and len(args[0]) == 1 and len(args[1]) == 1:
+                field, op = string_value(args[0][0]), string_value(args[1][0])
+                if field is not None and op is not None:
+                    query.filters.append((field, op))
+        elif value in ("limit", "limitToLast") and values[k + 1] == "(" and values[k + 2].isdigit():
+            query.limit = int(values[k + 2])
+    return query
+
+
+def _reference(chain, variables):
+    """(kind, collection, query) of a document or query reference expression; kind is doc, query or count"""
+    values = [t.value for t in chain]
+    if len(chain) == 1:
+        var = variables.get(values[0])
+        if var is None or var.kind not in ("docref", "collection"):
+            return None
+        return ("doc", var.collection, None) if var.kind == "docref" else ("query", var.collection, var.query)
+    calls = [values[k + 1] for k in range(len(values) - 2) if values[k] in (".", "?.") and values[k + 2] == "("]
+    base = variables.get(values[0])
+    if base is not None and base.kind not in ("docref", "collection"):
+        return None
+    collection = None
+    for k, value in enumerate(values[:-2]):
+        if value in ("collection", "collectionGroup") and values[k + 1] == "(":
+            collection = string_value(chain[k + 2]) or collection
+    if collection is None and base is not None:
+        collection = base.collection
+    if base is None and collection is None:
+        return None
+    if calls and calls[-1] == "doc":
+        return ("doc", collection, None)
+    if "count" in calls:
+        return ("count", collection, None)
+    return ("query", collection, _query_from(chain, base, collection))
+
+
+def _read_site(tokens, i, analysis, variables, config):
+    """ReadSite of the `.get(` at index i, or None when the receiver is not a Firestore reference"""
+    chain = tokens[receiver_start(tokens, i - 1):i - 1]
+    while chain and chain[0].value in LEADING_KEYWORDS:
+        chain = chain[1:]
+    if not chain:
+        return None
+    var = variables.get(chain[0].value) if len(chain) == 1 else None
+    if var is not None and var.kind == "transaction":
+        # transaction.get(ref) reads what ref points at
+        args, _ = call_args(tokens, i + 1)
+        chain = args[0] if len(args) == 1 else []
+    reference = _reference(chain, variables) if chain else None
+    if reference is None:
+        return None
+    kind, collection, query = reference
+    docs = 1
+    if kind == "query":
+        sizes = config["collections"].get(collection)
+        docs = None
+        if sizes is not None:
+            docs = estimate_rows(query, sizes)
+            if query.limit is not None:
+                docs = min(docs, query.limit)
+    return ReadSite(analysis.source, tokens[i].line, analysis.name, kind, collection, docs)
+
+
+def _initializer_end(tokens, i, limit):
+    depth = tokens[i].depth
+    line = tokens[i].line
+    while i < limit:
+        tok = tokens[i]
+        if tok.depth < depth or (tok.depth == depth and tok.value in (";", ",")):
+            return i
+        if tok.depth == depth and tok.line > line and tok.kind == "ident" and tok.value in STATEMENT_KEYWORDS:
+            return i
+        i += 1
+    return limit
+
+
+def _loop_rows(tokens, start, end, variables, config):
+    """Expected iterations of a loop over the expression tokens[start:end], or None if unknown"""
+    for tok in tokens[start:end]:
+        var = variables.get(tok.value)
+        if var is not None and var.kind == "snapshot":
+            collection = config["collections"].get(var.collection)
+            if collection is None:
+                return None, var.query.describe()
+            rows = estimate_rows(var.query, collection)
+            if var.query.limit is not None:
+                rows = min(rows, var.query.limit)
+            return max(int(round(rows)), 1), var.query.describe()
+    return None, "loop"
+
+
+def _collect(tokens, start, end, analysis, variables, config):
+    loops = []  # (first index, last index, rows or None, label)
+    scopes = {}  # batch / transaction variable -> index where it was created
+    i = start
+    while i <= end:
+        tok = tokens[i]
+        if tok.kind == "ident" and tok.value in ("const", "let", "var") and i + 1 <= end and tokens[i + 1].kind == "ident":
+            stop = _initializer_end(tokens, i + 2, end + 1)
+            var = _classify(tokens, i + 1, stop, variables)
+            if var is not None:
+                variables[tokens[i + 1].value] = var
+                if var.kind == "batch":
+                    scopes[tokens[i + 1].value] = i
+        elif tok.value == "runTransaction" and i + 1 <= end and tokens[i + 1].value == "(":
+            j = i + 2
+            if j <= end and tokens[j].value == "async":
+                j += 1
+            if j <= end and tokens[j].value == "(":
+                j += 1
+            if j <= end and tokens[j].kind == "ident":
+                variables[tokens[j].value] = _Var("transaction")
+                scopes[tokens[j].value] = i
+        elif tok.value in LOOP_KEYWORDS and i + 1 <= end and tokens[i + 1].value == "(":
+            header_end = matching_close(tokens, i + 1)
+            rows, label = _loop_rows(tokens, i + 2, header_end, variables, config) if tok.value == "for" \
+                else (None, "while loop")
+            body = header_end + 1
+            last = matching_close(tokens, body) if body <= end and tokens[body].value == "{" \
+                else _initializer_end(tokens, body, end + 1)
+            loops.append((body, last, rows, label))
+        elif (tok.value in LOOP_METHODS and i > 0 and tokens[i - 1].value in (".", "?.")
+                and i + 1 <= end and tokens[i + 1].value == "("):
+            receiver = receiver_start(tokens, i - 1)
+            rows, label = _loop_rows(tokens, receiver, i, variables, config)
+            loops.append((i + 1, matching_close(tokens, i + 1), rows, label))
+        elif (tok.value == "get" and i > 0 and tokens[i - 1].value in (".", "?.")
+                and i + 1 <= end and tokens[i + 1].value == "("):
+            site = _read_site(tokens, i, analysis, variables, config)
+            if site is not None:
+                site.multiplier, _ = _product([loop for loop in loops if loop[0] <= i <= loop[1]])
+                analysis.reads.append(site)
+        elif (tok.value in DOC_WRITES | {"add"} and i > 0 and tokens[i - 1].value in (".", "?.")
+                and i + 1 <= end and tokens[i + 1].value == "("):
+            site = _write_site(tokens, i, analysis, variables)
+            if site is not None:
+                enclosing = [loop for loop in loops if loop[0] <= i <= loop[1]]
+                site.multiplier, site.loop = _product(enclosing)
+                if site.scope is not None:
+                    created = scopes.get(site.scope, start)
+                    inner = [loop for loop in enclosing if not loop[0] <= created <= loop[1]]
+                    site.per_commit, _ = _product(inner)
+                analysis.sites.append(site)
+        elif tok.kind == "ident" and i + 1 <= end and tokens[i + 1].value == "(" and (
+                i == 0 or tokens[i - 1].value not in (".", "?.", "function")):
+            enclosing = [loop for loop in loops if loop[0] <= i <= loop[1]]
+            analysis.calls.append((tok.value, _product(enclosing)[0]))
+        i += 1
+
+
+def _product(loops):
+    multiplier = 1
+    labels = []
+    for _, _, rows, label in loops:
+        labels.append(label)
+        multiplier = None if multiplier is None or rows is None else multiplier * rows
+    return multiplier, " > ".join(labels) or None
+
+
+def _write_site(tokens, i, analysis, variables):
+    method = tokens[i].value
+    start = receiver_start(tokens, i - 1)
+    chain = tokens[start:i - 1]
+    while chain and chain[0].value in LEADING_KEYWORDS:
+        chain = chain[1:]
+    if not chain:
+        return None
+
+    def make(kind, scope=None, collection=None):
+        return WriteSite(analysis.source, tokens[i].line, analysis.name, method, kind, scope, collection=collection)
+
+    def target():
+        # batch.set(ref, ...) / transaction.update(ref, ...) write to the document ref points at
+        args, _ = call_args(tokens, i + 1)
+        reference = _reference(args[0], variables) if args and args[0] else None
+        return reference[1] if reference else None
+
+    if len(chain) == 1:
+        var = variables.get(chain[0].value)
+        if var is None:
+            return None
+        if var.kind in ("batch", "transaction") and method in DOC_WRITES:
+            return make(var.kind, chain[0].value, target())
+        if var.kind == "docref" and method in DOC_WRITES:
+            return make("direct", collection=var.collection)
+        if var.kind == "collection" and method == "add":
+            return make("direct", collection=var.collection)
+        return None
+    calls = [chain[k + 1].value for k in range(len(chain) - 2)
+             if chain[k].value in (".", "?.") and chain[k + 2].value == "("]
+    first = variables.get(chain[0].value)
+    if method in DOC_WRITES and calls and calls[-1] == "doc":
+        reference = _reference(chain, variables)
+        return make("direct", collection=reference[1] if reference else None)
+    if method == "add" and (calls and calls[-1] in ("collection", "collectionGroup")):
+        reference = _reference(chain, variables)
+        return make("direct", collection=reference[1] if reference else None)
+    if method in DOC_WRITES and first is not None and first.kind in ("batch", "transaction") and not calls:
+        return make(first.kind, chain[0].value, target())
+    return None
+
+
+class WriteProfile:
+    """Writes per invocation of one exported function, including the helpers it calls"""
+
+    def __init__(self, name, sites, limit):
+        self.name = name
+        self.sites = sites
+        self.limit = limit
+
+    @property
+    def writes(self):
+        """Expected writes per call (None when a loop has no known size)"""
+        total = 0
+        for site in self.sites:
+            if site.multiplier is None:
+                return None
+            total += site.multiplier
+        return total
+
+    @property
+    def minimum(self):
+        """Writes per call counting every loop of unknown size as one iteration"""
+        return sum(site.multiplier or 1 for site in self.sites)
+
+    def count(self, kind):
+        return sum(site.multiplier or 1 for site in self.sites if site.kind == kind)
+
+    def commits(self):
+        """{(kind, scope): writes per commit or None}"""
+        groups = {}
+        for site in self.sites:
+            if site.scope is None:
+                continue
+            key = (site.kind, site.scope)
+            current = groups.get(key, 0)
+            groups[key] = None if current is None or site.per_commit is None else current + site.per_commit
+        return groups
+
+    def over_limit(self):
+        """(kind, scope, writes or None, sites) of commits that can exceed the write limit"""
+        result = []
+        for (kind, scope), writes in self.commits().items():
+            if writes is None or writes > self.limit:
+                sites = [s for s in self.sites if s.kind == kind and s.scope == scope]
+                result.append((kind, scope, writes, sites))
+        return result
+
+    def unbatched(self):
+        """Direct writes that each cost their own round trip"""
+        return [site for site in self.sites if site.kind == "direct"]
+
+
+class WriteIndex:
+    """Write analysis of every TypeScript file under a functions source tree"""
+
+    def __init__(self, snapshot, config, source_dir="functions/src"):
+        self.snapshot = snapshot
+        self.config = config
+        self.source_path = snapshot.path(source_dir)
+        # Loop sizes come from the config, so analyses are memoized per collection sizing
+        self._kind = "writes:" + json.dumps(config.get("collections", {}), sort_keys=True)
+
+    def module(self, path):
+        """(functions, imports) of one source file, analyzed once per snapshot and config"""
+        path = self.snapshot.path(path)
+        rel = path.relative_to(self.snapshot.project_path).as_posix()
+        return self.snapshot.parsed(path, self._kind, lambda text: module_writes(rel, text, self.config))
+
+    def files(self):
+        rel = self.source_path.relative_to(self.snapshot.project_path).as_posix()
+        return self.snapshot.glob(f"{rel}/**/*.ts")
+
+    def profile(self, path, name):
+        """WriteProfile of declaration name in path, following helper calls"""
+        return WriteProfile(name, self._sites(path, name, set()), self.config.get("batch_write_limit", 500))
+
+    def reads(self, path, name):
+        """ReadSites of declaration name in path, following helper calls"""
+        return self._sites(path, name, set(), "reads")
+
+    def exported(self):
+        """(path, name) of every exported declaration that reads, writes or calls a helper"""
+        return [(path, name) for path in self.files()
+                for name, analysis in self.module(path)[0].items() if analysis.exported]
+
+    def _sites(self, path, name, seen, attr="sites"):
+        key = (path, name)
+        if key in seen:
+            return []
+        seen = seen | {key}
+        functions, imports = self.module(path)
+        analysis = functions.get(name)
+        if analysis is None:
+            return []
+        sites = list(getattr(analysis, attr))
+        for callee, factor in analysis.calls:
+            target = self._target(path, name, callee, functions, imports)
+            if target is not None:
+                sites += [site.scaled(factor, callee) for site in self._sites(target[0], target[1], seen, attr)]
+        return sites
+
+    def _target(self, path, name, callee, functions, imports):
+        """(path, name) of the declaration a call in name refers to, or None"""
+        if callee == name:
+            return None
+        if callee in functions:
+            return path, callee
+        if callee in imports:
+            module, imported = imports[callee]
+            resolved = self._resolve(path, module)
+            return (resolved, imported) if resolved is not None else None
+        return None
+
+    def callers(self):
+        """{(project-relative source, name): exported names whose calls reach that declaration}"""
+        reached = {}
+        for path, name in self.exported():
+            pending = [(path, name)]
+            seen = set()
+            while pending:
+                key = pending.pop()
+                if key in seen:
+                    continue
+                seen.add(key)
+                rel = self.snapshot.path(key[0]).relative_to(self.snapshot.project_path).as_posix()
+                reached.setdefault((rel, key[1]), []).append(name)
+                functions, imports = self.module(key[0])
+                analysis = functions.get(key[1])
+                if analysis is None:
+                    continue
+                for callee, _ in analysis.calls:
+                    target = self._target(key[0], key[1], callee, functions, imports)
+                    if target is not None:
+                        pending.append(target)
+        return reached
+
+    def _resolve(self, path, module):
+        base = Path(posixpath.normpath((path.parent / module).as_posix()))
+        for candidate in (base.with_name(base.name + ".ts"), base / "index.ts"):
+            if self.snapshot.exists(candidate):
+                return candidate
+        return None
+
+    def exported_profiles(self, names=None):
+        """WriteProfile of each exported declaration that writes (restricted to names when given)"""
+        profiles = []
+        for path in self.files():
+            functions, _ = self.module(path)
+            for name, analysis in functions.items():
+                if not analysis.exported or (names is not None and name not in names):
+                    continue
+                profile = self.profile(path, name)
+                if profile.sites:
+                    profiles.append(profile)
+        profiles.sort(key=lambda p: (-(p.minimum), p.name))
+        return profiles
+
+
+def format_write_table(profiles):
+    """Writes per call, split by direct / batched / transactional, and the largest commit"""
+    rows = []
+    for profile in profiles:
+        writes = profile.writes
+        total = f"{writes:,}" if writes is not None else f">={profile.minimum:,}"
+        commits = [w for w in profile.commits().values()]
+        largest = "-" if not commits else ("?" if None in commits else f"{max(commits):,}")
+        rows.append((profile.name, total, f"{profile.count('direct'):,}", f"{profile.count('batch'):,}",
+                     f"{profile.count('transaction'):,}", largest))
+    header = ("Function", "Writes/call", "Direct", "Batch", "Txn", "Max commit")
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+    return [
+        "  ".join(f"{value:<{widths[i]}}" if i == 0 else f"{value:>{widths[i]}}" for i, value in enumerate(row))
+        for row in [header] + rows
+    ]
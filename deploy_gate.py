@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Deploy Gate
+Runs the backend and expense-claims validators as one pre-deploy gate.
+Both suites share a ProjectSnapshot, a CommandPool and a ResultCache, so
+a file both of them check is read and parsed once and a subprocess both
+need (same command key) runs once. With --changed-since, each suite runs
+only the checks whose declared inputs differ from a git revision (for a
+rules file, only those reading a match block whose permissions changed),
+and a suite with nothing to check is skipped entirely.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from backend_test import FirebaseProjectTester
+from deploy_checks import CommandPool, ProjectSnapshot, ResultCache
+from deploy_checks.registry import GitDiffError, changed_files
+from deploy_checks.report import ResultStream
+from deploy_checks.rules_diff import changed_rule_paths
+from expense_claims_test import ExpenseClaimsValidator
+
+# (suite name, validator class, method running the suite with a list of check names)
+SUITES = [
+    ("backend", FirebaseProjectTester, "run_all_tests"),
+    ("expense-claims", ExpenseClaimsValidator, "run_validation"),
+]
+
+
+def plan(validators, changed, rule_paths=None):
+    """[(suite, validator, method, check names)] for the suites with something to run"""
+    selected = []
+    for suite, validator, method in validators:
+        names = validator.select_checks(changed, rule_paths)
+        if names:
+            selected.append((suite, validator, method, names))
+    return selected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every validator suite as one deploy gate")
+    parser.add_argument("--project", default="/app", help="project root to validate")
+    parser.add_argument("--suite", action="append", choices=[suite for suite, _, _ in SUITES],
+                        help="suite to run (repeatable; default: all)")
+    parser.add_argument("--changed-since", metavar="REV",
+                        help="only run the checks whose inputs differ from this git revision")
+    parser.add_argument("--cache-dir", help="result cache directory (default: <project>/.deploy-checks-cache)")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and do not update the result cache")
+    parser.add_argument("--ndjson", help="append one JSON line per finished check to this file")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    changed = rule_paths = None
+    if args.changed_since:
+        try:
+            changed = changed_files(args.project, args.changed_since)
+            rule_paths = changed_rule_paths(args.project, args.changed_since, changed)
+        except GitDiffError as e:
+            parser.error(str(e))
+
+    snapshot = ProjectSnapshot(args.project)
+    commands = CommandPool()
+    cache = None if args.no_cache else ResultCache(args.cache_dir or Path(args.project) / ".deploy-checks-cache")
+    streams = []
+    validators = []
+    for suite, validator_class, method in SUITES:
+        if args.suite and suite not in args.suite:
+            continue
+        results = None
+        if args.ndjson:
+            results = ResultStream(suite, args.ndjson)
+            streams.append(results)
+        validator = validator_class(args.project, snapshot=snapshot, commands=commands, cache=cache, results=results)
+        validators.append((suite, validator, method))
+
+    selected = plan(validators, changed, rule_paths)
+    if changed is not None:
+        counts = ", ".join(f"{suite} {len(names)}/{len(validator.CHECKS)}" for suite, validator, _, names in selected)
+        print(f"🔎 {len(changed)} files changed since {args.changed_since}; checks to run: {counts or 'none'}")
+
+    failed = []
+    for suite, validator, method, names in selected:
+        if not getattr(validator, method)(names):
+            failed.append(suite)
+        print()
+    for stream in streams:
+        stream.close()
+
+    elapsed = time.monotonic() - started
+    if failed:
+        print(f"❌ Deploy gate failed: {', '.join(failed)} ({elapsed:.1f}s)")
+        return 1
+    print(f"✅ Deploy gate passed ({elapsed:.1f}s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
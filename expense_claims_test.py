@@ -4,39 +4,40 @@ Expense Claims and Leaves Backend Validation Test
 Focused testing for the review request requirements
 """
 
+import argparse
 import os
 import json
-import re
 import sys
-import subprocess
 from pathlib import Path
 
-class ExpenseClaimsValidator:
-    def __init__(self, project_path="/app"):
-        self.project_path = Path(project_path)
-        self.functions_path = self.project_path / "functions"
-        self.src_path = self.functions_path / "src"
-        self.tests_run = 0
-        self.tests_passed = 0
-        self.issues = []
-        self.warnings = []
-
-    def log_test(self, name, passed, message=""):
-        """Log test result"""
-        self.tests_run += 1
-        if passed:
-            self.tests_passed += 1
-            print(f"✅ {name}: PASSED")
-        else:
-            print(f"❌ {name}: FAILED - {message}")
-            self.issues.append(f"{name}: {message}")
-        if message and passed:
-            print(f"   ℹ️  {message}")
-
-    def log_warning(self, message):
-        """Log warning"""
-        print(f"⚠️  WARNING: {message}")
-        self.warnings.append(message)
+from deploy_checks import ProjectSnapshot, ResultCache, RulesSyntaxError
+from deploy_checks.registry import SUBPROCESS, Check, GitDiffError, changed_files
+from deploy_checks.report import ResultStream, format_profile
+from deploy_checks.rules_diff import changed_rule_paths
+from deploy_checks.storage_paths import grants, load_storage_trie, object_segments, storage_paths
+from deploy_checks.tsbuild import TSC_HEAP_MB, TscWatch, build_info_path, tsc_argv
+from deploy_checks.validator import Validator
+from deploy_checks.watch import WatchSession, open_watcher
+
+class ExpenseClaimsValidator(Validator):
+    # Checks in run order, with the files each one reads
+    CHECKS = [
+        Check("test_expense_claims_firestore_rules", ["firestore.rules"], rules=["/expenseClaims/**"]),
+        Check("test_receipts_storage_rules", ["storage.rules", "functions/src/storage.ts"]),
+        Check("test_functions_build_stability", ["functions/lib/index.js", "functions/src/index.ts"]),
+        Check("test_leave_management_rules", ["firestore.rules"], rules=["/leaveRequests/**", "/leaveBalances/**"]),
+        Check("check_blocking_issues", [
+            "firebase.json", "functions/package.json", "functions/package-lock.json",
+            "functions/tsconfig.json", "functions/src/**/*.ts"
+        ], SUBPROCESS),
+    ]
+
+    def __init__(self, project_path="/app", snapshot=None, commands=None, cache=None, results=None,
+                 tsc_heap_mb=None, tsc_watch=None):
+        super().__init__(project_path, snapshot, commands, cache, results)
+        self.tsc_heap_mb = tsc_heap_mb or TSC_HEAP_MB
+        # Long-lived `tsc --watch` whose diagnostics replace a fresh compile (watch mode)
+        self.tsc_watch = tsc_watch
 
     def test_expense_claims_firestore_rules(self):
         """Test 1: Verify Firestore rules for expenseClaims collection"""
@@ -45,27 +46,33 @@ class ExpenseClaimsValidator:
             self.log_test("ExpenseClaims Firestore Rules", False, "firestore.rules not found")
             return
 
-        with open(rules_file) as f:
-            content = f.read()
+        try:
+            rules = self.snapshot.rules(rules_file)
+        except RulesSyntaxError as e:
+            self.log_test("ExpenseClaims Firestore Rules", False, f"firestore.rules does not parse: {e}")
+            return
 
         # Check if expenseClaims collection exists
-        if "match /expenseClaims/{claimId}" not in content:
+        blocks = rules.find_matches("/expenseClaims/{claimId}")
+        if not blocks:
             self.log_test("ExpenseClaims Firestore Rules", False, "expenseClaims collection rules not found")
             return
+        expense_claims = blocks[0]
 
         issues = []
         
         # 1. Check Create rules: only owner with valid payload and status Pending
-        create_rule_pattern = r"allow create: if isOwner\(request\.resource\.data\.userId\) && isValidNewExpenseClaim\(request\.resource\.data\)"
-        if not re.search(create_rule_pattern, content):
+        create_rule = "isOwner(request.resource.data.userId) && isValidNewExpenseClaim(request.resource.data)"
+        if not any(c.startswith(create_rule) for c in expense_claims.allow_conditions("create")):
             issues.append("Missing proper create rule for owner with valid payload")
         
         # Check validation function exists
-        if "function isValidNewExpenseClaim(data)" not in content:
+        validation = rules.functions.get("isValidNewExpenseClaim")
+        if validation is None or validation.params != ["data"]:
             issues.append("Missing isValidNewExpenseClaim validation function")
         else:
             # Check validation function enforces status Pending
-            validation_section = content[content.find("function isValidNewExpenseClaim"):content.find("}", content.find("function isValidNewExpenseClaim"))]
+            validation_section = validation.text
             if "data.status == 'Pending'" not in validation_section:
                 issues.append("Validation function doesn't enforce status 'Pending'")
             
@@ -76,50 +83,22 @@ class ExpenseClaimsValidator:
                     issues.append(f"Validation function missing required field: {field}")
 
         # 2. Check Read rules: owner, manager of owner, or Admin
-        read_rule_pattern = r"allow read: if isOwner\(resource\.data\.userId\) \|\| isManagerOf\(resource\.data\.userId\) \|\| hasRole\('Admin'\)"
-        if not re.search(read_rule_pattern, content):
+        read_rule = "isOwner(resource.data.userId) || isManagerOf(resource.data.userId) || hasRole('Admin')"
+        if not any(c.startswith(read_rule) for c in expense_claims.allow_conditions("read")):
             issues.append("Missing proper read rule for owner/manager/admin")
 
         # 3. Check Update rules: Admin/Manager can update; Owner only if still Pending and status unchanged
-        update_rule_found = False
-        
-        # Look for the expense claims section - use line-based approach
-        lines = content.split('\n')
-        in_expense_claims = False
-        expense_lines = []
-        
-        for line in lines:
-            if 'match /expenseClaims/{claimId}' in line:
-                in_expense_claims = True
-                expense_lines.append(line)
-            elif in_expense_claims:
-                expense_lines.append(line)
-                # Check if we've reached the end of this match block
-                if line.strip() == '}' and not line.strip().startswith('//'):
-                    # Count braces to see if this closes the match block
-                    open_braces = sum(l.count('{') for l in expense_lines)
-                    close_braces = sum(l.count('}') for l in expense_lines)
-                    if open_braces == close_braces:
-                        break
-        
-        expense_section = '\n'.join(expense_lines)
-        
-        # Check for all required components in the update rule
-        has_admin = "hasRole('Admin')" in expense_section
-        has_manager = "isManagerOf(resource.data.userId)" in expense_section  
-        has_owner_pending = "isOwner(resource.data.userId)" in expense_section and "resource.data.status == 'Pending'" in expense_section
-        has_status_unchanged = "request.resource.data.status == resource.data.status" in expense_section
-        has_update_rule = "allow update:" in expense_section
+        update_section = " || ".join(expense_claims.allow_conditions("update"))
+        has_admin = "hasRole('Admin')" in update_section
+        has_manager = "isManagerOf(resource.data.userId)" in update_section
+        has_owner_pending = "isOwner(resource.data.userId)" in update_section and "resource.data.status == 'Pending'" in update_section
+        has_status_unchanged = "request.resource.data.status == resource.data.status" in update_section
         
-        if has_update_rule and has_admin and has_manager and has_owner_pending and has_status_unchanged:
-            update_rule_found = True
-        
-        if not update_rule_found:
+        if not (update_section and has_admin and has_manager and has_owner_pending and has_status_unchanged):
             issues.append("Missing proper update rule (Admin/Manager full access, Owner only if Pending and status unchanged)")
 
         # 4. Check Delete rules: Admin only
-        delete_rule_pattern = r"allow delete: if hasRole\('Admin'\)"
-        if not re.search(delete_rule_pattern, content):
+        if not any(c.startswith("hasRole('Admin')") for c in expense_claims.allow_conditions("delete")):
             issues.append("Missing proper delete rule for Admin only")
 
         self.log_test(
@@ -135,42 +114,41 @@ class ExpenseClaimsValidator:
             self.log_test("Receipts Storage Rules", False, "storage.rules not found")
             return
 
-        with open(storage_rules) as f:
-            content = f.read()
+        try:
+            rules = self.snapshot.rules(storage_rules)
+        except RulesSyntaxError as e:
+            self.log_test("Receipts Storage Rules", False, f"storage.rules does not parse: {e}")
+            return
 
         issues = []
 
-        # Check if receipts path exists
-        if "match /receipts/{userId}/{fileName}" not in content:
+        # Resolve the rule through the path the upload URL is actually signed for
+        storage_ts = "functions/src/storage.ts"
+        uploads = []
+        if self.snapshot.exists(storage_ts):
+            paths = self.snapshot.parsed(storage_ts, "storage-paths", lambda text: storage_paths(storage_ts, text))
+            uploads = [
+                path for path in paths
+                if path.resolved and path.segments[0] == "receipts" and path.operation == "write"
+            ]
+        trie = load_storage_trie(self.snapshot, storage_rules)
+        blocks = [block for path in uploads for block in trie.match(path.segments) if grants(block, "write")]
+        if not uploads:
+            issues.append("receipts upload path not found in storage.ts")
+        elif not blocks:
             issues.append("receipts path rule not found")
         else:
-            # Use line-based approach for storage rules too
-            lines = content.split('\n')
-            in_receipts = False
-            receipts_lines = []
-            
-            for line in lines:
-                if 'match /receipts/{userId}/{fileName}' in line:
-                    in_receipts = True
-                    receipts_lines.append(line)
-                elif in_receipts:
-                    receipts_lines.append(line)
-                    # Check if we've reached the end of this match block
-                    if line.strip() == '}' and not line.strip().startswith('//'):
-                        # Count braces to see if this closes the match block
-                        open_braces = sum(l.count('{') for l in receipts_lines)
-                        close_braces = sum(l.count('}') for l in receipts_lines)
-                        if open_braces == close_braces:
-                            break
-            
-            receipts_section = '\n'.join(receipts_lines)
-            
+            receipts = blocks[0]
+            segments = object_segments(receipts.full_path)
+            owner = segments[1].strip("{}") if len(segments) > 1 else "uid"
+
             # Check owner write permission
-            if "allow write: if request.auth != null && request.auth.uid == userId" not in receipts_section:
+            owner_write = f"request.auth != null && request.auth.uid == {owner}"
+            if not any(c.startswith(owner_write) for c in receipts.allow_conditions("write")):
                 issues.append("Missing owner write permission for receipts")
-            
+
             # Check no direct read (should be false for signed URL pattern)
-            if "allow read: if false" not in receipts_section:
+            if "false" not in receipts.allow_conditions("read"):
                 issues.append("Missing read denial (should use signed URLs)")
 
         self.log_test(
@@ -186,28 +164,12 @@ class ExpenseClaimsValidator:
             self.log_test("Functions Build Stability", False, "lib/index.js not found - functions not compiled")
             return
 
-        with open(compiled_index) as f:
-            compiled_content = f.read()
+        compiled_content = self.snapshot.text(compiled_index)
 
         issues = []
 
-        # Check that all expected callable functions are still present
-        expected_callables = [
-            "getUserProfile",
-            "setUserRoleByEmail", 
-            "setManagerForEmployeeByEmail",
-            "clockIn", "clockOut",
-            "applyLeave", "approveLeave", "declineLeave", "returnToWork", "approveReturnToWork",
-            "acknowledgeAnnouncement",
-            "generatePersonalDocUploadUrl", "generatePersonalDocDownloadUrl",
-            "aiGenerate"
-        ]
-
-        missing_callables = []
-        for func in expected_callables:
-            export_pattern = f'exports.{func}'
-            if export_pattern not in compiled_content:
-                missing_callables.append(func)
+        # Check that everything src/index.ts exports is still present
+        missing_callables = self.export_index.missing_from_build()
 
         if missing_callables:
             issues.append(f"Missing callable functions after rule edits: {missing_callables}")
@@ -231,23 +193,26 @@ class ExpenseClaimsValidator:
             self.log_test("Leave Management Rules", False, "firestore.rules not found")
             return
 
-        with open(rules_file) as f:
-            content = f.read()
+        try:
+            rules = self.snapshot.rules(rules_file)
+        except RulesSyntaxError as e:
+            self.log_test("Leave Management Rules", False, f"firestore.rules does not parse: {e}")
+            return
 
         issues = []
 
         # Check leaveRequests collection still exists
-        if "match /leaveRequests/{requestId}" not in content:
+        if not rules.find_matches("/leaveRequests/{requestId}"):
             issues.append("leaveRequests collection rules missing")
 
         # Check leaveBalances collection still exists  
-        if "match /leaveBalances/{userId}" not in content:
+        if not rules.find_matches("/leaveBalances/{userId}"):
             issues.append("leaveBalances collection rules missing")
 
         # Check basic leave functions exist
         leave_functions = ["isValidNewLeaveRequest"]
         for func in leave_functions:
-            if f"function {func}" not in content:
+            if func not in rules.functions:
                 issues.append(f"Missing leave function: {func}")
 
         self.log_test(
@@ -266,27 +231,23 @@ class ExpenseClaimsValidator:
             blocking_issues.append("firebase.json missing")
         else:
             try:
-                with open(firebase_json) as f:
-                    firebase_config = json.load(f)
+                firebase_config = self.snapshot.json(firebase_json)
                 if "functions" not in firebase_config:
                     blocking_issues.append("firebase.json missing functions configuration")
             except json.JSONDecodeError:
                 blocking_issues.append("firebase.json is invalid JSON")
 
         # Check TypeScript compilation
-        try:
-            # Use increased heap size for compilation
-            result = subprocess.run(
-                ["node", "--max-old-space-size=4096", "node_modules/.bin/tsc"], 
-                cwd=self.functions_path, 
-                capture_output=True, 
-                text=True,
-                timeout=120
-            )
-            if result.returncode != 0:
-                blocking_issues.append(f"TypeScript compilation failed: {result.stderr[:200]}")
-        except (subprocess.TimeoutExpired, subprocess.SubprocessError) as e:
-            blocking_issues.append(f"Build test failed: {str(e)[:100]}")
+        if self.tsc_watch is not None:
+            result = self.tsc_watch.result(timeout=120)
+        else:
+            result = self.commands.result(*self._tsc_command())
+        if result.error is not None:
+            self._cacheable = False
+            blocking_issues.append(f"Build test failed: {str(result.error)[:100]}")
+        elif result.returncode != 0:
+            # tsc reports diagnostics on stdout
+            blocking_issues.append(f"TypeScript compilation failed: {(result.stdout or result.stderr)[:200]}")
 
         self.log_test(
             "Blocking Issues Check",
@@ -294,16 +255,36 @@ class ExpenseClaimsValidator:
             f"Blocking issues: {blocking_issues}" if blocking_issues else "No blocking deployment issues found"
         )
 
-    def run_validation(self):
-        """Run all validation tests"""
+    def _tsc_command(self):
+        """Type check backing the blocking issues check: (key, argv, cwd, timeout)"""
+        argv = tsc_argv(self.tsc_heap_mb, self.tsc_build_info())
+        return f"tsc:{self.functions_path}", argv, self.functions_path, 120
+
+    def tsc_build_info(self):
+        """Persistent .tsbuildinfo in the result cache directory (None without a cache: full check)"""
+        if self.cache is None:
+            return None
+        try:
+            return build_info_path(self.cache.cache_dir, self.functions_path)
+        except OSError:
+            return None
+
+    def start_subprocess_checks(self, names):
+        """Launch the subprocess-backed checks so they overlap with the pure-Python ones"""
+        if "check_blocking_issues" not in names or self.tsc_watch is not None:
+            return
+        if self.cache is not None and self.cache.is_cached(self, "check_blocking_issues"):
+            return
+        self.commands.submit(*self._tsc_command())
+
+    def run_validation(self, names=None):
+        """Run all validation tests (or only the named ones)"""
         print("🔍 Expense Claims and Leaves Backend Validation")
         print("=" * 55)
-        
-        self.test_expense_claims_firestore_rules()
-        self.test_receipts_storage_rules()
-        self.test_functions_build_stability()
-        self.test_leave_management_rules()
-        self.check_blocking_issues()
+        if names is not None and len(names) < len(self.CHECKS):
+            print(f"⏭️  Running {len(names)} of {len(self.CHECKS)} checks; the others read no changed files")
+
+        self.run_checks(names)
         
         print("\n" + "=" * 55)
         print(f"📊 Validation Results: {self.tests_passed}/{self.tests_run} passed")
@@ -332,8 +313,60 @@ class ExpenseClaimsValidator:
         return len(self.issues) == 0
 
 def main():
-    validator = ExpenseClaimsValidator()
-    success = validator.run_validation()
+    parser = argparse.ArgumentParser(description="Expense claims and leaves backend validation")
+    parser.add_argument("--project", default="/app", help="project root to validate")
+    parser.add_argument("--cache-dir", help="result cache directory (default: <project>/.deploy-checks-cache)")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and do not update the result cache")
+    parser.add_argument("--ndjson", help="append one JSON line per finished check to this file")
+    parser.add_argument("--junit", help="write a JUnit XML report to this file")
+    parser.add_argument("--profile", action="store_true", help="print the slowest checks")
+    parser.add_argument("--tsc-heap-mb", type=int,
+                        help=f"heap ceiling of the tsc type check (default {TSC_HEAP_MB})")
+    parser.add_argument("--changed-since", metavar="REV",
+                        help="only run the checks whose inputs differ from this git revision")
+    parser.add_argument("--watch", action="store_true", help="stay running and re-run the checks affected by each change")
+    parser.add_argument("--poll", type=float, metavar="SECONDS",
+                        help="with --watch, poll for changes at this interval instead of using inotify")
+    args = parser.parse_args()
+
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(args.cache_dir or Path(args.project) / ".deploy-checks-cache")
+    changed = rule_paths = None
+    if args.changed_since:
+        if args.watch:
+            parser.error("--watch cannot be combined with --changed-since")
+        try:
+            changed = changed_files(args.project, args.changed_since)
+            rule_paths = changed_rule_paths(args.project, args.changed_since, changed)
+        except GitDiffError as e:
+            parser.error(str(e))
+    if args.watch:
+        if args.ndjson or args.junit or args.profile:
+            parser.error("--watch cannot be combined with --ndjson, --junit or --profile")
+        # One tsc --watch serves every re-run; it re-checks changed files on its own
+        functions_path = Path(args.project) / "functions"
+        build_info = build_info_path(cache.cache_dir, functions_path) if cache is not None else None
+        tsc_watch = TscWatch(tsc_argv(args.tsc_heap_mb or TSC_HEAP_MB, build_info, watch=True), functions_path)
+        session = WatchSession(ProjectSnapshot(args.project), [("expense-claims", lambda snapshot, commands: (
+            ExpenseClaimsValidator(args.project, snapshot=snapshot, commands=commands, cache=cache,
+                                   tsc_heap_mb=args.tsc_heap_mb, tsc_watch=tsc_watch)))], cache)
+        tsc_watch.start()
+        try:
+            return session.loop(open_watcher(args.project, session.patterns(), args.poll))
+        finally:
+            tsc_watch.close()
+    results = None
+    if args.ndjson or args.junit or args.profile:
+        results = ResultStream("expense-claims", args.ndjson, args.junit)
+    validator = ExpenseClaimsValidator(args.project, cache=cache, results=results, tsc_heap_mb=args.tsc_heap_mb)
+    success = validator.run_validation(validator.select_checks(changed, rule_paths))
+    if results is not None:
+        results.close()
+        if args.profile:
+            print("\n⏱️  Slowest checks:")
+            for line in format_profile(results.records):
+                print(f"   {line}")
     return 0 if success else 1
 
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Firestore Cost Projection
+Projects daily Firestore reads, writes and security-rules get() calls, the
+resulting bill and each function's p95 latency from the code, the rules
+and the traffic profile in firestore-traffic.yaml, then sweeps the
+profile's scenarios ("double headcount", "roles in custom claims", ...)
+against the baseline.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from deploy_checks import ProjectSnapshot, RulesSyntaxError
+from deploy_checks.config import ConfigError, load_config
+from deploy_checks.projection import (
+    PROFILE_FILE,
+    CostModel,
+    ProfileError,
+    format_collection_table,
+    format_function_table,
+    format_scenario_table,
+    load_profile,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Project Firestore cost and latency from code and a traffic profile")
+    parser.add_argument("--project", default="/app", help="project root")
+    parser.add_argument("--profile", default=PROFILE_FILE, help=f"traffic profile, relative to the project (default {PROFILE_FILE})")
+    parser.add_argument("--scenario", action="append",
+                        help="scenario to print in detail (repeatable; default: the baseline only)")
+    parser.add_argument("--json", dest="json_file", help="write every scenario's projection to this JSON file")
+    args = parser.parse_args()
+
+    snapshot = ProjectSnapshot.shared(args.project)
+    started = time.perf_counter()
+    try:
+        profile = load_profile(snapshot, args.profile)
+        config = load_config(snapshot)
+        rules = snapshot.rules("firestore.rules") if snapshot.exists("firestore.rules") else None
+        model = CostModel(snapshot, config, profile, rules)
+    except (ProfileError, ConfigError, RulesSyntaxError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    unknown_scenarios = sorted(set(args.scenario or []) - set(profile["scenarios"]) - {"baseline"})
+    if unknown_scenarios:
+        parser.error(f"unknown scenario: {', '.join(unknown_scenarios)}")
+    try:
+        projections = [model.project(scenario) for scenario in model.scenarios()]
+    except (ProfileError, ConfigError) as e:
+        print(f"❌ {e}")
+        return 1
+    elapsed = (time.perf_counter() - started) * 1000
+
+    pricing = profile["pricing"]
+    detailed = set(args.scenario or ["baseline"])
+    for projection in projections:
+        if projection.scenario.name not in detailed:
+            continue
+        print(f"📈 {projection.scenario.name}: per function")
+        for line in format_function_table(projection, pricing):
+            print(f"   {line}")
+        print(f"\n🗂️  {projection.scenario.name}: per collection")
+        for line in format_collection_table(projection, pricing):
+            print(f"   {line}")
+        print()
+
+    print(f"💰 Scenarios ({len(projections)} projected in {elapsed:.0f} ms)")
+    for line in format_scenario_table(projections, pricing):
+        print(f"   {line}")
+    if not all(projection.exact for projection in projections):
+        print("   >= marks lower bounds: a loop or query in the code has no known size")
+    for name in model.unknown_functions():
+        print(f"⚠️  {args.profile}: {name} is not an exported function in functions/src")
+
+    if args.json_file:
+        report = []
+        for projection in projections:
+            reads, gets, writes = projection.totals()
+            report.append({
+                "scenario": projection.scenario.name,
+                "exact": projection.exact,
+                "reads_per_day": reads,
+                "rules_gets_per_day": gets,
+                "writes_per_day": writes,
+                "dollars_per_day": projection.price(pricing),
+                "functions": {
+                    name: {"calls_per_day": calls, "reads_per_call": cost.total_reads,
+                           "writes_per_call": cost.total_writes, "round_trips": cost.round_trips,
+                           "p95_ms": p95, "exact": cost.exact}
+                    for name, (calls, cost, p95) in projection.functions.items()
+                },
+                "collections": projection.collections,
+            })
+        with open(args.json_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Security Rules Review Diff
+Prints the permission changes in firestore.rules and storage.rules between
+a git revision and the working tree (or a second revision): per match path
+and operation, the old and new conditions, including changes that only
+come from an edited rule function. Lists the validator checks that read
+the changed blocks, which are the ones --changed-since re-runs.
+"""
+
+import argparse
+import sys
+import time
+
+from backend_test import FirebaseProjectTester
+from deploy_checks import ProjectSnapshot, RulesSyntaxError
+from deploy_checks.registry import GitDiffError, affected_checks
+from deploy_checks.rules_diff import diff_revisions, format_rule_changes
+from expense_claims_test import ExpenseClaimsValidator
+
+SUITES = [("backend", FirebaseProjectTester), ("expense-claims", ExpenseClaimsValidator)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff security rules permissions between git revisions")
+    parser.add_argument("rules", nargs="*", default=["firestore.rules", "storage.rules"], help="rules files to diff")
+    parser.add_argument("--project", default="/app", help="project root (a git checkout)")
+    parser.add_argument("--base", default="HEAD", help="revision to diff from (default HEAD)")
+    parser.add_argument("--head", help="revision to diff to (default: the working tree)")
+    args = parser.parse_args()
+
+    snapshot = ProjectSnapshot.shared(args.project)
+    target = args.head or "working tree"
+    rule_paths = {}
+    for rel in args.rules:
+        started = time.perf_counter()
+        try:
+            diff = diff_revisions(args.project, rel, args.base, args.head, snapshot)
+        except GitDiffError as e:
+            parser.error(str(e))
+        except RulesSyntaxError as e:
+            print(f"❌ {rel}: does not parse: {e}")
+            return 1
+        elapsed = (time.perf_counter() - started) * 1000
+        if not diff.changes and not diff.functions and not diff.renamed:
+            print(f"✅ {rel}: no permission changes {args.base}..{target} ({elapsed:.1f} ms)")
+            continue
+        # A changed function affects every check reading the file, not just the blocks calling it
+        rule_paths[rel] = None if diff.functions else diff.paths
+        print(f"🔐 {rel}: {len(diff.changes)} permission changes, {len(diff.functions)} rule functions changed, "
+              f"{len(diff.renamed)} match headers renamed "
+              f"{args.base}..{target} ({diff.compared} of {diff.total} blocks compared, {elapsed:.1f} ms)")
+        for line in format_rule_changes(diff):
+            print(f"   {line}")
+
+    if rule_paths:
+        print("\n🔎 Checks reading the changes:")
+        for suite, validator_class in SUITES:
+            names = affected_checks(validator_class.CHECK_INPUTS, list(rule_paths), validator_class.CHECK_RULES,
+                                    {rel: paths for rel, paths in rule_paths.items() if paths is not None})
+            print(f"   {suite}: {', '.join(names) or 'none'}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
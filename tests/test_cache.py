@@ -0,0 +1,31 @@
+"""
+Result Cache tests
+"""
+
+from deploy_checks import ProjectSnapshot
+from deploy_checks.cache import ResultCache
+
+
+def test_key_depends_on_the_salt_within_one_snapshot(tmp_path):
+    (tmp_path / "firestore.rules").write_text("rules_version = '2';\n")
+    snapshot = ProjectSnapshot(tmp_path)
+    cache = ResultCache(tmp_path / ".cache")
+    first = cache.key(snapshot, "test_rules", ["firestore.rules"], salt="budget=10")
+    assert cache.key(snapshot, "test_rules", ["firestore.rules"], salt="budget=20") != first
+    assert cache.key(snapshot, "test_rules", ["firestore.rules"], salt="budget=10") == first
+
+
+def test_key_is_the_same_across_checkouts_with_the_same_inputs(tmp_path):
+    keys = []
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "firestore.rules").write_text("rules_version = '2';\n")
+        keys.append(ResultCache(tmp_path / ".cache").key(ProjectSnapshot(tmp_path / name), "test_rules",
+                                                         ["firestore.rules", "node_modules/.package-lock.json"]))
+    assert keys[0] == keys[1]
+
+    (tmp_path / "b" / "node_modules").mkdir()
+    (tmp_path / "b" / "node_modules" / ".package-lock.json").write_text("{}")
+    installed = ResultCache(tmp_path / ".cache").key(ProjectSnapshot(tmp_path / "b"), "test_rules",
+                                                     ["firestore.rules", "node_modules/.package-lock.json"])
+    assert installed != keys[0]
@@ -0,0 +1,100 @@
+"""
+Lockfile Consistency tests: npm semver ranges and node_modules resolution
+"""
+
+import json
+
+import pytest
+
+from deploy_checks.lockfile import lockfile_drift, read_lockfile, satisfies
+
+
+@pytest.mark.parametrize("spec, version, expected", [
+    # caret
+    ("^1.2.3", "1.2.3", True),
+    ("^1.2.3", "1.9.0", True),
+    ("^1.2.3", "1.2.2", False),
+    ("^1.2.3", "2.0.0", False),
+    ("^0.2.3", "0.2.9", True),
+    ("^0.2.3", "0.3.0", False),
+    ("^0.0.3", "0.0.3", True),
+    ("^0.0.3", "0.0.4", False),
+    ("^0", "0.9.9", True),
+    ("^0", "1.0.0", False),
+    ("^0.0", "0.0.9", True),
+    ("^0.0", "0.1.0", False),
+    ("^0.x", "0.5.0", True),
+    ("^0.x", "1.0.0", False),
+    # tilde
+    ("~1.2.3", "1.2.9", True),
+    ("~1.2.3", "1.3.0", False),
+    ("~1", "1.9.0", True),
+    ("~1", "2.0.0", False),
+    ("~0.2", "0.2.5", True),
+    ("~0.2", "0.3.0", False),
+    # hyphen
+    ("1.2.3 - 2.3.4", "2.3.4", True),
+    ("1.2.3 - 2.3.4", "2.3.5", False),
+    ("1.2.3 - 2.3.4", "1.2.2", False),
+    ("1.2 - 2.3", "2.3.9", True),
+    ("1.2 - 2.3", "2.4.0", False),
+    # x-ranges
+    ("1.x", "1.9.9", True),
+    ("1.x", "2.0.0", False),
+    ("1.2.x", "1.2.7", True),
+    ("1.2.x", "1.3.0", False),
+    ("*", "3.1.4", True),
+    ("", "3.1.4", True),
+    # unions and comparators
+    ("^1.0.0 || ^3.0.0", "3.1.0", True),
+    ("^1.0.0 || ^3.0.0", "2.0.0", False),
+    (">=1.2.0 <1.4", "1.3.9", True),
+    (">= 1.2.0 < 1.4", "1.4.0", False),
+    # prereleases only match ranges naming a prerelease of the same version
+    ("^1.2.3", "1.2.4-beta.1", False),
+    ("^1.2.4-beta.0", "1.2.4-beta.1", True),
+    ("^1.2.4-beta.0", "1.2.4", True),
+    ("^1.2.4-beta.0", "1.3.0-beta.1", False),
+    ("*", "1.0.0-rc.1", False),
+])
+def test_satisfies(spec, version, expected):
+    assert satisfies(version, spec) is expected
+
+
+def test_non_semver_specs_are_not_judged():
+    assert satisfies("1.0.0", "latest") is None
+
+
+def _lock(packages, root):
+    entries = {"": {"name": "app", "dependencies": root}}
+    entries.update(packages)
+    return read_lockfile(json.dumps({"name": "app", "lockfileVersion": 3, "packages": entries}))
+
+
+def test_npm_alias_must_lock_the_aliased_package():
+    manifest = {"dependencies": {"sw": "npm:string-width@^4.2.0"}}
+    lock = _lock({"node_modules/sw": {"name": "string-width", "version": "4.2.3"}}, manifest["dependencies"])
+    assert lockfile_drift(manifest, lock) == []
+
+    wrong = _lock({"node_modules/sw": {"name": "strip-ansi", "version": "4.2.3"}}, manifest["dependencies"])
+    assert lockfile_drift(manifest, wrong) == ["sw: is locked as strip-ansi, not string-width"]
+
+    old = _lock({"node_modules/sw": {"name": "string-width", "version": "3.1.0"}}, manifest["dependencies"])
+    assert lockfile_drift(manifest, old) == ["sw: ^4.2.0 is locked at 3.1.0"]
+
+
+def test_nested_node_modules_shadow_the_hoisted_copy():
+    manifest = {"dependencies": {"a": "^1.0.0", "b": "^1.0.0"}}
+    packages = {
+        "node_modules/a": {"version": "1.0.0", "dependencies": {"b": "^2.0.0"}},
+        "node_modules/a/node_modules/b": {"version": "2.1.0"},
+        "node_modules/b": {"version": "1.0.0"},
+    }
+    lock = _lock(packages, manifest["dependencies"])
+    assert lock.resolve("node_modules/a", "b").version == "2.1.0"
+    assert lock.resolve("", "b").version == "1.0.0"
+    assert lockfile_drift(manifest, lock) == []
+
+    del packages["node_modules/a/node_modules/b"]
+    hoisted = _lock(packages, manifest["dependencies"])
+    assert lockfile_drift(manifest, hoisted) == ["node_modules/a needs b@^2.0.0: is locked at 1.0.0"]
@@ -0,0 +1,26 @@
+"""
+Message Catalog placeholder tests
+"""
+
+from deploy_checks.messages import catalog_parity, placeholders
+
+
+def test_select_branch_text_is_not_an_argument():
+    assert placeholders("{gender, select, male {He left} other {They left}}") == {"gender"}
+
+
+def test_arguments_nested_in_branches_are_collected():
+    message = "{count, plural, =0 {No items} one {# item for {owner}} other {# items}}"
+    assert placeholders(message) == {"count", "owner"}
+
+
+def test_styles_and_quoted_braces_are_skipped():
+    assert placeholders("{amount, number, ::currency/EUR} due '{never}' {date, date, short}") == {"amount", "date"}
+
+
+def test_translated_branches_keep_parity():
+    catalogs = {
+        "en": {"left": "{gender, select, male {He left} other {They left}}"},
+        "fr": {"left": "{gender, select, male {Il est parti} other {Ils sont partis}}"},
+    }
+    assert catalog_parity(catalogs) == []
@@ -0,0 +1,25 @@
+"""
+Firestore Cost Projection tests
+"""
+
+from pathlib import Path
+
+from deploy_checks.projection import Scenario, rules_gets
+from deploy_checks.rules import parse_rules
+
+RULES = parse_rules((Path(__file__).resolve().parent.parent / "firestore.rules").read_text())
+
+
+def _gets(scenario, collection, operation):
+    reads = rules_gets(RULES)[(collection, operation)]
+    return sum(1 for read, documents in reads.items() for fields in documents if not scenario.claimed(read, fields))
+
+
+def test_role_claim_keeps_manager_lookups():
+    # users read: myRole() get()s the caller's document, isMgrOf(uid) the target's managerId
+    assert _gets(Scenario("baseline"), "users", "get") == 2
+    assert _gets(Scenario("roles-in-claims", claims=["users.role"]), "users", "get") == 1
+
+
+def test_collection_claim_covers_every_field():
+    assert _gets(Scenario("everything", claims=["users"]), "users", "get") == 0
@@ -0,0 +1,26 @@
+"""
+Security Rules Parser regression tests
+"""
+
+import time
+
+import pytest
+
+from deploy_checks.rules import RulesSyntaxError, tokenize
+
+
+def test_unterminated_string_after_long_indent_fails_fast():
+    # Used to backtrack through the whitespace run, doubling with every extra space
+    text = "x ==\n\n" + " " * 5000 + "'Pending;"
+    started = time.perf_counter()
+    with pytest.raises(RulesSyntaxError) as error:
+        tokenize(text)
+    assert time.perf_counter() - started < 1
+    assert error.value.line == 3
+    assert "\"'\"" in str(error.value)
+
+
+def test_comments_and_whitespace_are_skipped():
+    tokens = tokenize("allow read: // trailing\n  /* block\n */ if true;")
+    assert [token.value for token in tokens] == ["allow", "read", ":", "if", "true", ";"]
+    assert tokens[3].line == 3
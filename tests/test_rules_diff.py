@@ -0,0 +1,31 @@
+"""
+Security Rules Diff tests
+"""
+
+from pathlib import Path
+
+from deploy_checks.registry import affected_checks
+from deploy_checks.rules import parse_rules
+from deploy_checks.rules_diff import diff_rules
+from expense_claims_test import ExpenseClaimsValidator
+
+RULES = (Path(__file__).resolve().parent.parent / "firestore.rules").read_text()
+
+
+def test_wildcard_rename_is_a_changed_path():
+    # Checks look match blocks up by header text, e.g. find_matches("/expenseClaims/{claimId}")
+    renamed = RULES.replace("match /expenseClaims/{id} {", "match /expenseClaims/{claimId} {")
+    assert renamed != RULES
+    diff = diff_rules(parse_rules(RULES), parse_rules(renamed))
+    assert diff.renamed == [("/expenseClaims/{id}", "/expenseClaims/{claimId}")]
+    assert {"/expenseClaims/{id}", "/expenseClaims/{claimId}"} <= diff.paths
+
+    names = affected_checks(ExpenseClaimsValidator.CHECK_INPUTS, ["firestore.rules"],
+                            ExpenseClaimsValidator.CHECK_RULES, {"firestore.rules": diff.paths})
+    assert "test_expense_claims_firestore_rules" in names
+
+
+def test_unchanged_rules_have_no_changed_paths():
+    diff = diff_rules(parse_rules(RULES), parse_rules(RULES))
+    assert diff.paths == set()
+    assert diff.functions == []
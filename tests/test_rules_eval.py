@@ -0,0 +1,107 @@
+"""
+Rules Evaluator tests against the project's firestore.rules
+"""
+
+from pathlib import Path
+
+import pytest
+
+from deploy_checks.rules import parse_rules
+from deploy_checks.rules_eval import DocumentStore, RulesEvaluator, auth_context
+
+RULES_TEXT = (Path(__file__).resolve().parent.parent / "firestore.rules").read_text()
+
+
+def _line(text):
+    """1-based line of the first rules line containing text"""
+    return next(i for i, line in enumerate(RULES_TEXT.splitlines(), 1) if text in line)
+
+
+@pytest.fixture
+def store():
+    return DocumentStore({
+        "users/admin": {"role": "admin"},
+        "users/hr": {"role": "hr"},
+        "users/boss": {"role": "manager"},
+        "users/emp": {"role": "employee", "managerId": "boss"},
+        "users/other": {"role": "employee", "managerId": "someone-else"},
+        "leaveRequests/draft": {"userId": "emp", "status": "draft"},
+        "leaveRequests/approved": {"userId": "emp", "status": "approved"},
+    })
+
+
+@pytest.fixture
+def evaluator(store):
+    return RulesEvaluator(parse_rules(RULES_TEXT), store)
+
+
+def test_get_reads_the_callers_role(evaluator):
+    assert evaluator.evaluate("get", "auditLogs/a1", auth_context("admin")).allowed
+    assert evaluator.evaluate("get", "auditLogs/a1", auth_context("hr")).allowed
+    assert not evaluator.evaluate("get", "auditLogs/a1", auth_context("emp")).allowed
+
+
+def test_hr_check_uses_has_only(evaluator):
+    # isHR(): ['hr','admin'].hasOnly([myRole()]) == false, so only hr and admin pass
+    assert evaluator.evaluate("create", "users/new", auth_context("hr"), {"role": "employee"}).allowed
+    assert not evaluator.evaluate("create", "users/new", auth_context("boss"), {"role": "employee"}).allowed
+
+
+def test_null_auth_is_denied_with_an_error(evaluator):
+    decision = evaluator.evaluate("get", "leaveRequests/draft", None)
+    assert not decision.allowed
+    assert decision.rule is None
+    assert decision.errors
+
+
+def test_create_checks_request_resource(evaluator):
+    assert evaluator.evaluate("create", "leaveRequests/new", auth_context("emp"), {"userId": "emp"}).allowed
+    assert not evaluator.evaluate("create", "leaveRequests/new", auth_context("emp"), {"userId": "boss"}).allowed
+
+
+def test_update_checks_stored_resource_with_in(evaluator):
+    # status in ['draft','withdrawn'] is read from resource, the stored document, not the new data
+    assert evaluator.evaluate("update", "leaveRequests/draft", auth_context("emp"),
+                              {"userId": "emp", "status": "approved"}).allowed
+    assert not evaluator.evaluate("update", "leaveRequests/approved", auth_context("emp"),
+                                  {"userId": "emp", "status": "draft"}).allowed
+
+
+def test_decision_names_the_deciding_allow(evaluator):
+    decision = evaluator.evaluate("create", "leaveRequests/new", auth_context("emp"), {"userId": "emp"})
+    line = _line("allow create: if isSignedIn() && request.resource.data.userId")
+    assert decision.allow.line == line
+    assert decision.rule == f"/databases/{{db}}/documents/leaveRequests/{{id}} allow create (line {line})"
+
+    denied = evaluator.evaluate("delete", "auditLogs/a1", auth_context("admin"))
+    assert not denied.allowed and denied.rule is None
+
+
+def test_get_calls_count_every_call_and_reads_distinct_documents(evaluator):
+    # isSelf fails; isHR() calls myRole() twice and isAdmin() once more, all on users/boss,
+    # then isMgrOf('emp') reads users/emp
+    decision = evaluator.evaluate("get", "users/emp", auth_context("boss"))
+    assert decision.allowed
+    assert decision.get_calls == 5
+    assert decision.reads == 2
+
+    assert evaluator.evaluate("get", "users/emp", auth_context("emp")).get_calls == 0
+    assert not evaluator.evaluate("get", "users/other", auth_context("boss")).allowed
+
+
+def test_exists_on_a_missing_document():
+    rules = parse_rules("""
+        rules_version = '2';
+        service cloud.firestore {
+          match /databases/{db}/documents {
+            match /teams/{team} {
+              allow read: if exists(/databases/$(db)/documents/members/$(request.auth.uid));
+            }
+          }
+        }
+    """)
+    evaluator = RulesEvaluator(rules, DocumentStore({"members/m1": {}}))
+    assert evaluator.evaluate("get", "teams/t1", auth_context("m1")).allowed
+    decision = evaluator.evaluate("get", "teams/t1", auth_context("m2"))
+    assert not decision.allowed
+    assert decision.get_calls == 1
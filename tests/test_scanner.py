@@ -0,0 +1,40 @@
+"""
+Source Pattern Scanner tests
+"""
+
+import pytest
+
+from deploy_checks import ProjectSnapshot
+from deploy_checks.scanner import SourceScanner
+
+
+@pytest.fixture
+def scanner(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "page.tsx").write_text(
+        "const [open, setOpen] = useState(false);\n"
+        "fetch('/api/items');\n"
+        "const q = query(x);\n"
+    )
+    return SourceScanner(ProjectSnapshot(tmp_path), roots=["src"])
+
+
+def test_patterns_with_groups_keep_their_names_and_groups(scanner):
+    # A '(' in a character class and a capturing group: both used to be rewritten textually
+    scanner.register("state", r"useState\(([^()]*)\)")
+    scanner.register("fetch", r"fetch[(]'([^']+)'\)")
+    scanner.register("query", "query(", literal=True)
+    matches = scanner.scan()
+    assert [(m.line, m.groups) for m in matches["state"]] == [(1, ("false",))]
+    assert [(m.line, m.groups) for m in matches["fetch"]] == [(2, ("/api/items",))]
+    assert [m.line for m in matches["query"]] == [3]
+
+
+@pytest.mark.parametrize("pattern", [r"(?P<quote>['\"]).*?(?P=quote)", r"(['\"]).*?\1", r"(a)?(?(1)b|c)"])
+def test_named_groups_and_backreferences_are_rejected(scanner, pattern):
+    with pytest.raises(ValueError):
+        scanner.register("quoted", pattern)
+
+
+def test_escaped_backslash_and_classes_are_not_backreferences(scanner):
+    scanner.register("path", r"\\\\1|[\1]x")
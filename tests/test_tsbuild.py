@@ -0,0 +1,47 @@
+"""
+TypeScript watch tests
+"""
+
+import os
+import sys
+import textwrap
+import time
+
+from deploy_checks.tsbuild import TscWatch
+
+# Stands in for `tsc --watch`: one error at first, none once src/index.ts changes
+FAKE_TSC = textwrap.dedent("""
+    import os, time
+    seen = os.stat("src/index.ts").st_mtime
+    print("Starting compilation in watch mode...", flush=True)
+    print("src/index.ts(1,1): error TS1005: ';' expected.", flush=True)
+    print("Found 1 error. Watching for file changes.", flush=True)
+    while True:
+        time.sleep(0.05)
+        if os.stat("src/index.ts").st_mtime != seen:
+            seen = os.stat("src/index.ts").st_mtime
+            print("File change detected. Starting incremental compilation...", flush=True)
+            time.sleep(0.3)
+            print("Found 0 errors. Watching for file changes.", flush=True)
+""")
+
+
+def test_result_waits_for_the_compile_after_an_edit(tmp_path):
+    (tmp_path / "src").mkdir()
+    source = tmp_path / "src" / "index.ts"
+    source.write_text("export const x = 1\n")
+    os.utime(source, (time.time() - 10, time.time() - 10))
+    (tmp_path / "fake_tsc.py").write_text(FAKE_TSC)
+    watch = TscWatch([sys.executable, "fake_tsc.py"], tmp_path)
+    try:
+        assert watch.result(timeout=10).returncode == 2
+
+        source.write_text("export const x = 1;\n")
+        now = time.time()
+        os.utime(source, (now, now))
+        # The finished compile predates the edit, so the check must wait for the next one
+        result = watch.result(timeout=10)
+        assert result.error is None
+        assert result.returncode == 0
+    finally:
+        watch.close()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Validator Scaling Benchmark
+Generates synthetic projects at increasing sizes and runs every in-process
+check of backend_test.py and expense_claims_test.py against them,
+reporting the time and peak Python memory of each check per size and its
+growth exponent relative to the project size (1.0 is linear, 2.0 is
+quadratic). With --baseline, checks that got slower or hungrier than the
+recorded baseline by more than the tolerance fail the run.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from backend_test import FirebaseProjectTester
+from deploy_checks import CommandPool, ProjectSnapshot
+from deploy_checks.synthetic import SyntheticProject
+from expense_claims_test import ExpenseClaimsValidator
+
+# (name, rules lines, TypeScript sources, lib/index.js bytes)
+SIZES = [
+    ("xs", 100, 10, 100_000),
+    ("s", 1_000, 100, 500_000),
+    ("m", 10_000, 1_000, 2_000_000),
+    ("l", 50_000, 5_000, 8_000_000),
+]
+
+VALIDATORS = [("backend", FirebaseProjectTester), ("expense-claims", ExpenseClaimsValidator)]
+
+# Differences below these are noise, whatever the relative change
+MIN_SECONDS = 0.005
+MIN_PEAK_BYTES = 256 * 1024
+
+
+def measure(validator_class, project, check, repeat):
+    """(best seconds over repeat runs, peak traced bytes) of one check on a fresh snapshot"""
+    best = None
+    for _ in range(repeat):
+        validator = validator_class(project, snapshot=ProjectSnapshot(project), commands=CommandPool())
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            validator.run_check(check)
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    validator = validator_class(project, snapshot=ProjectSnapshot(project), commands=CommandPool())
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            validator.run_check(check)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def growth(points):
+    """Least-squares slope of log(value) against log(project bytes)"""
+    points = [(math.log(x), math.log(y)) for x, y in points if x > 0 and y > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if spread == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def run_benchmark(sizes, repeat, work_dir):
+    """{"suite/check": {size: {"seconds", "peak_bytes", "project_bytes"}}}"""
+    results = {}
+    for name, rules_lines, sources, bundle_bytes in sizes:
+        project = Path(work_dir) / name
+        started = time.perf_counter()
+        project_bytes = SyntheticProject(project, rules_lines, sources, bundle_bytes).generate()
+        print(f"🏗️  {name}: {rules_lines} rules lines, {sources} sources, {bundle_bytes / 1e6:.1f} MB bundle "
+              f"({project_bytes / 1e6:.1f} MB written in {time.perf_counter() - started:.1f}s)")
+        for suite, validator_class in VALIDATORS:
+            for check in validator_class.CHECK_INPUTS:
+                # npm/tsc/node time does not measure the validators themselves
+                if check in validator_class.SUBPROCESS_CHECKS:
+                    continue
+                seconds, peak = measure(validator_class, project, check, repeat)
+                results.setdefault(f"{suite}/{check}", {})[name] = {
+                    "seconds": seconds, "peak_bytes": peak, "project_bytes": project_bytes,
+                }
+    return results
+
+
+def format_results(results, sizes):
+    """Per check: time and peak memory at each size, plus their growth exponents"""
+    names = [size[0] for size in sizes]
+    header = ["Check"] + [f"{n} ms" for n in names] + [f"{n} MiB" for n in names] + ["time ^", "mem ^"]
+    rows = []
+    for check, by_size in sorted(results.items()):
+        row = [check]
+        row += [f"{by_size[n]['seconds'] * 1000:.1f}" if n in by_size else "-" for n in names]
+        row += [f"{by_size[n]['peak_bytes'] / 2 ** 20:.1f}" if n in by_size else "-" for n in names]
+        for key in ("seconds", "peak_bytes"):
+            exponent = growth([(m["project_bytes"], m[key]) for m in by_size.values()])
+            row.append("-" if exponent is None else f"{exponent:.2f}")
+        rows.append(row)
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+    return [
+        "  ".join(f"{value:<{widths[i]}}" if i == 0 else f"{value:>{widths[i]}}" for i, value in enumerate(row))
+        for row in [header] + rows
+    ]
+
+
+def compare(results, baseline, tolerance):
+    """Regressions against a baseline of the same shape, as messages"""
+    regressions = []
+    for check, by_size in sorted(results.items()):
+        for size, measured in by_size.items():
+            expected = baseline.get(check, {}).get(size)
+            if expected is None:
+                continue
+            if measured["seconds"] - expected["seconds"] > max(MIN_SECONDS, expected["seconds"] * tolerance):
+                regressions.append(f"{check} [{size}] took {measured['seconds'] * 1000:.1f} ms "
+                                   f"(baseline {expected['seconds'] * 1000:.1f} ms)")
+            if measured["peak_bytes"] - expected["peak_bytes"] > max(MIN_PEAK_BYTES, expected["peak_bytes"] * tolerance):
+                regressions.append(f"{check} [{size}] peaked at {measured['peak_bytes'] / 2 ** 20:.1f} MiB "
+                                   f"(baseline {expected['peak_bytes'] / 2 ** 20:.1f} MiB)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark validator checks over synthetic projects of growing size")
+    parser.add_argument("--sizes", default="xs,s,m",
+                        help=f"comma-separated sizes out of {', '.join(size[0] for size in SIZES)} (default xs,s,m; "
+                             "l takes several minutes)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per check; the best one counts")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown or memory growth over the baseline (0.5 = 50%%)")
+    parser.add_argument("--work-dir", help="where to generate projects (default: a temporary directory)")
+    args = parser.parse_args()
+
+    wanted = args.sizes.split(",")
+    sizes = [size for size in SIZES if size[0] in wanted]
+    unknown = set(wanted) - {size[0] for size in sizes}
+    if unknown:
+        parser.error(f"unknown sizes: {sorted(unknown)}")
+
+    with tempfile.TemporaryDirectory(prefix="validator-benchmark-") as tmp:
+        results = run_benchmark(sizes, args.repeat, args.work_dir or tmp)
+
+    print()
+    for line in format_results(results, sizes):
+        print(f"   {line}")
+
+    if not args.baseline:
+        return 0
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"\n💾 Baseline written to {baseline_path}")
+        return 0
+    try:
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        print(f"\n❌ Could not read baseline {baseline_path}: {e}")
+        return 1
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regressions against {baseline_path}:")
+        for regression in regressions:
+            print(f"   • {regression}")
+        return 1
+    print(f"\n✅ No regressions against {baseline_path} (tolerance {args.tolerance:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())